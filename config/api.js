@@ -52,6 +52,8 @@ module.exports = {
       update: (id) => `/api/customers/${id}`,
       delete: (id) => `/api/customers/${id}`,
       stats: '/api/customers/stats',
+      bulk: '/api/customers/bulk',
+      bulkDelete: '/api/customers',
 
       // 客户关联记录
       health: (id) => `/api/customers/${id}/health`,
@@ -67,6 +69,8 @@ module.exports = {
       create: '/api/service/create',
       update: (id) => `/api/service/${id}`,
       delete: (id) => `/api/service/${id}`,
+      bulk: '/api/service/bulk',
+      bulkDelete: '/api/service/bulk-delete',
     },
 
     // 沟通记录相关API
@@ -88,11 +92,30 @@ module.exports = {
       confirm: '/api/projects/import/confirm'
     },
 
+    // 增量同步API
+    sync: '/api/sync',
+
+    // 批量请求API
+    batch: '/api/batch',
+
+    // 后台任务API
+    jobs: {
+      detail: (id) => `/api/jobs/${id}`,
+    },
+
     // Excel处理相关API
     excel: {
       preCheck: '/api/excel/import',
       import: '/api/excel/import',
       export: '/api/excel/export',
+    },
+
+    // 客户报告API
+    reports: {
+      generate: (id) => `/api/reports/generate/${id}`,
+      bulk: '/api/reports/bulk',
+      bulkArchive: '/api/reports/bulk/archive',
+      bulkReport: (id) => `/api/reports/bulk/${id}`,
     }
   }
 };
\ No newline at end of file
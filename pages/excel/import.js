@@ -12,6 +12,7 @@ Page({
     fileList: [],
     analyzing: false,
     analyzeProgress: 0,
+    analyzeStage: '', // 后台导入任务当前阶段
     importResult: null,
     errorMessage: '',
     debugMode: false, // 调试模式
@@ -212,6 +213,7 @@ Page({
     this.setData({
       uploading: true,
       uploadProgress: 0,
+      analyzeStage: '',
       errorMessage: ''
     });
 
@@ -304,6 +306,15 @@ Page({
               }
             }, 200);
 
+          } else if (res.statusCode === 202 && result.job_id) {
+            // 服务端已提交后台导入任务，轮询任务状态直到导入结束
+            logger.info('文件已上传，等待后台导入:', result.job_id);
+            this.setData({
+              analyzing: true,
+              analyzeProgress: 0
+            });
+            this._waitImportJob(result);
+
           } else {
             logger.error('文件上传失败:', result);
             this.setData({
@@ -330,6 +341,40 @@ Page({
     });
   },
 
+  // 等待后台导入任务结束并显示导入结果
+  _waitImportJob: function (upload) {
+    request.waitJob(upload.job_id, {
+      onProgress: (job) => {
+        // 任务没有总行数，进度条按阶段推进，已处理行数显示在阶段名称后
+        const stage = job.rows_processed ? `${job.stage} (${job.rows_processed}行)` : job.stage;
+        this.setData({
+          analyzeStage: stage,
+          analyzeProgress: Math.min(this.data.analyzeProgress + 10, 90)
+        });
+      }
+    }).then((job) => {
+      logger.info('后台导入完成:', job);
+      this.setData({
+        analyzeProgress: 100,
+        analyzing: false,
+        uploading: false,
+        importResult: {
+          filename: upload.filename,
+          stats: job.result && job.result.stats,
+          message: '文件上传和处理成功',
+          time: new Date().toLocaleString()
+        }
+      });
+    }).catch((err) => {
+      logger.error('后台导入失败:', err);
+      this.setData({
+        analyzing: false,
+        uploading: false,
+        errorMessage: 'Excel处理失败: ' + (err.message || '未知错误')
+      });
+    });
+  },
+
   // 查看数据预览
   viewPreview: function () {
     // 跳转到数据预览页面
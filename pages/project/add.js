@@ -1,4 +1,5 @@
 const apiConfig = require('../../config/api');
+const request = require('../../utils/request');
 
 Page({
   data: {
@@ -481,17 +482,13 @@ Page({
             mode: importMode
           },
           success: function(res) {
-            if (res.data && res.data.success) {
-              wx.showModal({
-                title: '导入成功',
-                content: res.data.message || '数据导入完成',
-                showCancel: false,
-                success: function() {
-                  // 返回上一页
-                  wx.navigateBack();
-                }
-              });
+            if (res.statusCode === 202 && res.data && res.data.success) {
+              // 服务端已提交后台导入任务，轮询任务状态直到导入结束
+              self.waitImportJob(res.data.data.job_id);
+            } else if (res.data && res.data.success) {
+              self.showImportSuccess(res.data.message);
             } else {
+              self.finishImport();
               wx.showModal({
                 title: '导入失败',
                 content: res.data.message || '导入数据失败',
@@ -501,16 +498,11 @@ Page({
           },
           fail: function(err) {
             console.error('导入数据请求失败:', err);
+            self.finishImport();
             wx.showToast({
               title: '网络错误',
               icon: 'none'
             });
-          },
-          complete: function() {
-            wx.hideLoading();
-            self.setData({
-              processing: false
-            });
           }
         });
       },
@@ -521,5 +513,50 @@ Page({
         });
       }
     });
+  },
+
+  // 等待后台导入任务结束
+  waitImportJob: function(jobId) {
+    const self = this;
+    request.waitJob(jobId, {
+      onProgress: function(job) {
+        wx.showLoading({
+          title: job.stage || '导入中...'
+        });
+      }
+    }).then(function(job) {
+      const result = job.result || {};
+      self.showImportSuccess(`数据导入完成，新增: ${result.imported}，更新: ${result.updated}，失败: ${result.errors}`);
+    }).catch(function(err) {
+      console.error('后台导入失败:', err);
+      self.finishImport();
+      wx.showModal({
+        title: '导入失败',
+        content: err.message || '导入数据失败',
+        showCancel: false
+      });
+    });
+  },
+
+  // 显示导入成功并返回上一页
+  showImportSuccess: function(message) {
+    this.finishImport();
+    wx.showModal({
+      title: '导入成功',
+      content: message || '数据导入完成',
+      showCancel: false,
+      success: function() {
+        // 返回上一页
+        wx.navigateBack();
+      }
+    });
+  },
+
+  // 结束导入状态
+  finishImport: function() {
+    wx.hideLoading();
+    this.setData({
+      processing: false
+    });
   }
 }); 
\ No newline at end of file
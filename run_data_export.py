@@ -84,6 +84,21 @@ def get_unique_key_for_communication(comm):
     key = f"{time_str}_{location}_{content}"
     return key
 
+def fetch_customer_records(customer_id):
+    """通过批量请求一次获取客户的健康档案、消费、服务和沟通记录"""
+    names = ['health', 'consumption', 'service', 'communication']
+    response = requests.post(f'{BASE_URL}/batch', json={'requests': [
+        {'id': name, 'path': f'/api/customers/{customer_id}/{name}'} for name in names
+    ]})
+    results = {item.get('id'): item for item in response.json().get('data', [])}
+    records = {}
+    for name in names:
+        item = results.get(name, {})
+        if item.get('status') != 200:
+            logger.warning(f"客户 {customer_id} 的{name}记录获取失败: {item.get('status')}")
+        records[name] = item.get('body') or []
+    return records
+
 def export_data_to_markdown():
     """从API获取数据并导出到Markdown文件"""
     logger.info("获取客户数据...")
@@ -134,10 +149,10 @@ def export_data_to_markdown():
         
         logger.info(f"处理客户数据: {customer_id} - {customer.get('name', '未知')}")
         
-        # 获取健康档案
-        logger.info(f"获取客户 {customer_id} 的健康档案...")
-        health_response = requests.get(f'{BASE_URL}/customers/{customer_id}/health')
-        health_data = health_response.json()
+        # 一次批量请求获取健康档案、消费、服务和沟通记录
+        logger.info(f"获取客户 {customer_id} 的健康档案、消费、服务和沟通记录...")
+        records = fetch_customer_records(customer_id)
+        health_data = records['health']
         
         # 处理健康档案响应
         if isinstance(health_data, str):
@@ -155,10 +170,7 @@ def export_data_to_markdown():
         else:
             health_record = {}
         
-        # 获取消费记录
-        logger.info(f"获取客户 {customer_id} 的消费记录...")
-        consumption_response = requests.get(f'{BASE_URL}/customers/{customer_id}/consumption')
-        consumption_data = consumption_response.json()
+        consumption_data = records['consumption']
         
         # 处理消费记录响应
         if isinstance(consumption_data, str):
@@ -189,10 +201,7 @@ def export_data_to_markdown():
                 seen_consumption_keys.add(key)
                 processed_consumption_records.append(consumption)
         
-        # 获取服务记录
-        logger.info(f"获取客户 {customer_id} 的服务记录...")
-        service_response = requests.get(f'{BASE_URL}/customers/{customer_id}/service')
-        service_data = service_response.json()
+        service_data = records['service']
         
         # 处理服务记录响应
         if isinstance(service_data, str):
@@ -246,10 +255,7 @@ def export_data_to_markdown():
         
         logger.info(f"客户 {customer_id} 原始服务记录数: {len(service_records)}, 处理后记录数: {len(valid_service_records)}")
         
-        # 获取沟通记录
-        logger.info(f"获取客户 {customer_id} 的沟通记录...")
-        communication_response = requests.get(f'{BASE_URL}/customers/{customer_id}/communication')
-        communication_data = communication_response.json()
+        communication_data = records['communication']
         
         # 处理沟通记录响应
         if isinstance(communication_data, str):
@@ -0,0 +1,142 @@
+"""
+批量请求API - 一次HTTP请求在进程内执行多个子请求
+
+小程序打开客户详情时要分别请求详情、健康档案、消费、服务和沟通记录，移动网络下每次往返
+都有较高延迟。POST /api/batch 把这些子请求放在一个请求里：
+- 子请求按顺序在当前应用内执行（完整的before/after_request、错误处理和响应缓存），不经过网络
+- 子请求与批量请求共用同一个应用上下文和数据库会话；只读子请求之间没有提交，
+  SQLite下看到的是同一个快照
+- 每个子请求单独返回状态码和响应体，某个子请求失败不影响其他子请求
+"""
+import logging
+from urllib.parse import parse_qsl
+
+from flask import Blueprint, jsonify, request, current_app
+from werkzeug.test import EnvironBuilder
+
+from models import db
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+batch_bp = Blueprint('batch', __name__)
+
+# 单次批量请求最多包含的子请求数
+MAX_BATCH_SIZE = 20
+
+ALLOWED_METHODS = {'GET', 'POST', 'PUT', 'DELETE'}
+
+BATCH_PATH = '/api/batch'
+
+
+class BatchError(ValueError):
+    """子请求格式错误"""
+
+
+def _parse_subrequest(spec, index):
+    if not isinstance(spec, dict):
+        raise BatchError(f"第{index + 1}个子请求格式错误，应为对象")
+    method = str(spec.get('method', 'GET')).upper()
+    if method not in ALLOWED_METHODS:
+        raise BatchError(f"第{index + 1}个子请求的method不支持: {method}")
+    path = spec.get('path')
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        raise BatchError(f"第{index + 1}个子请求的path必须以/api/开头")
+    if path.split('?', 1)[0].rstrip('/') == BATCH_PATH:
+        raise BatchError("子请求不能再调用/api/batch")
+    params = spec.get('params') or {}
+    if not isinstance(params, dict):
+        raise BatchError(f"第{index + 1}个子请求的params应为对象")
+
+    # path中的查询参数与params合并
+    path, _, query = path.partition('?')
+    args = parse_qsl(query, keep_blank_values=True)
+    for key, value in params.items():
+        values = value if isinstance(value, list) else [value]
+        args.extend((key, '' if item is None else str(item)) for item in values)
+
+    headers = {}
+    if spec.get('etag'):
+        headers['If-None-Match'] = str(spec['etag'])
+    return method, path, args, spec.get('body'), headers
+
+
+def _execute(app, method, path, args, body, headers):
+    """在当前应用上下文中执行一个子请求，返回(响应对象, 响应体)"""
+    builder = EnvironBuilder(
+        path=path,
+        method=method,
+        base_url=request.host_url,
+        query_string=args,
+        headers=headers,
+        json=body if method != 'GET' and body is not None else None,
+        environ_base={'REMOTE_ADDR': request.remote_addr},
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    # 应用上下文已存在，子请求上下文不会新建应用上下文，数据库会话随之共用
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            logger.error(f"批量子请求 {method} {path} 失败: {str(e)}")
+            # 会话可能处于失败的事务中，回滚后后续子请求才能继续使用
+            db.session.rollback()
+            response = app.make_response((jsonify({'success': False, 'message': f'子请求执行失败: {str(e)}'}), 500))
+        # 在子请求上下文内读取响应体，流式响应也能正常生成
+        data = response.get_data()
+    return response, data
+
+
+def _result(response, data):
+    result = {'status': response.status_code}
+    if response.status_code == 304:
+        result['body'] = None
+    elif response.is_json:
+        result['body'] = current_app.json.loads(data) if data else None
+    else:
+        result['body'] = data.decode('utf-8', errors='replace')
+    if 'ETag' in response.headers:
+        result['etag'] = response.headers['ETag']
+    return result
+
+
+@batch_bp.route('', methods=['POST'])
+def batch():
+    """
+    批量执行子请求
+
+    请求体:
+        {"requests": [{"id": "detail", "method": "GET", "path": "/api/customers/C001",
+                       "params": {"include": "health"}}, ...]}
+        id可选，原样返回；method默认GET；params为查询参数；非GET请求可带body(JSON)；
+        etag为上次返回的etag，数据未变化时该子请求返回304、body为null
+
+    返回:
+        data为与requests顺序一致的结果列表，每项包含id、status和body
+    """
+    payload = request.get_json(silent=True) or {}
+    specs = payload.get('requests')
+    if not isinstance(specs, list) or not specs:
+        return jsonify({'success': False, 'message': 'requests应为非空数组'}), 400
+    if len(specs) > MAX_BATCH_SIZE:
+        return jsonify({'success': False, 'message': f'单次最多{MAX_BATCH_SIZE}个子请求'}), 400
+    try:
+        subrequests = [_parse_subrequest(spec, index) for index, spec in enumerate(specs)]
+    except BatchError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    app = current_app._get_current_object()
+    results = []
+    for spec, (method, path, args, body, headers) in zip(specs, subrequests):
+        response, data = _execute(app, method, path, args, body, headers)
+        result = _result(response, data)
+        if 'id' in spec:
+            result = dict({'id': spec['id']}, **result)
+        results.append(result)
+
+    return jsonify({'success': True, 'data': results})
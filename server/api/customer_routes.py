@@ -1,11 +1,19 @@
 """
 客户信息相关的API接口
 """
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from datetime import datetime
-from models import db, Customer, HealthRecord, Consumption, Service, ServiceItem, Communication, Project
+from models import db, Customer, HealthRecord, Consumption, Service, ServiceItem, Communication, Project, DailyStoreStat
 # from flask_login import current_user  # 暂时注释掉，未安装flask_login
 from functools import wraps
+from utils.pagination import keyset_page, cached_count, wants_total, InvalidCursor
+from utils.fieldsets import parse_include, parse_fields, load_only_columns, to_partial_dict, FieldsetError
+from sqlalchemy.orm import load_only, selectinload
+from utils.response_cache import cached_response
+from utils.rollups import parse_day_range, filter_days
+from utils.serializers import get_serializer, serialize_many, nested_fields
+from utils.bulk_fetch import (parse_ids, body_args, chunked, iter_rows, group_rows, iter_services, delete_by_ids,
+                              delete_dependents, BulkRequestError)
 
 # 定义权限装饰器
 def require_role(roles):
@@ -21,6 +29,7 @@ def require_role(roles):
 customer_bp = Blueprint('customer', __name__)
 
 @customer_bp.route('/', methods=['GET'])
+@cached_response('customers')
 def get_customers():
     """获取客户列表"""
     try:
@@ -42,12 +51,26 @@ def get_customers():
         if gender:
             query = query.filter(Customer.gender == gender)
 
+        # 游标分页：传入after参数（第一页为空）时按(created_at, id)定位，不执行OFFSET和COUNT
+        if 'after' in request.args:
+            customers, next_cursor = keyset_page(query, Customer.created_at, Customer.id,
+                                                 after=request.args.get('after'), limit=per_page)
+            data = {
+                'items': serialize_many(customers, Customer),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'per_page': per_page
+            }
+            if wants_total(request.args):
+                data['total'] = cached_count(query, ('customers', name, store, gender))
+            return jsonify(data), 200
+
         # 分页查询
         paginated_customers = query.order_by(Customer.created_at.desc()).paginate(page=page, per_page=per_page)
 
         # 准备返回数据
         data = {
-            'items': [customer.to_dict() for customer in paginated_customers.items],
+            'items': serialize_many(paginated_customers.items, Customer),
             'total': paginated_customers.total,
             'pages': paginated_customers.pages,
             'page': page,
@@ -56,32 +79,62 @@ def get_customers():
 
         return jsonify(data), 200
 
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 客户详情可返回的关联数据: include名称 -> (返回字段名, 关联属性, 关联模型)
+CUSTOMER_INCLUDES = {
+    'health': ('health_records', Customer.health_records, HealthRecord),
+    'consumptions': ('consumption_records', Customer.consumption_records, Consumption),
+    'services': ('service_records', Customer.service_records, Service),
+    'communications': ('communication_records', Customer.communication_records, Communication),
+}
+
 @customer_bp.route('/<string:customer_id>', methods=['GET'])
+@cached_response('customers', 'health_records', 'consumptions', 'services', 'service_items', 'communications')
 def get_customer(customer_id):
-    """获取单个客户详情"""
-    try:
-        # 查询客户信息
-        customer = Customer.query.get_or_404(customer_id)
-        customer_data = customer.to_dict()
-
-        # 查询关联的健康档案
-        health_records = HealthRecord.query.filter_by(customer_id=customer_id).all()
-        customer_data['health_records'] = [record.to_dict() for record in health_records]
-
-        # 查询关联的消费记录
-        consumptions = Consumption.query.filter_by(customer_id=customer_id).all()
-        customer_data['consumption_records'] = [record.to_dict() for record in consumptions]
+    """获取单个客户详情
 
-        # 查询关联的服务记录
-        services = Service.query.filter_by(customer_id=customer_id).all()
-        customer_data['service_records'] = [record.to_dict() for record in services]
+    查询参数:
+        include: 返回的关联数据，如 include=health,services，未传时返回全部，传空值只返回客户信息
+        fields: 客户信息返回的字段，如 fields=id,name,store
+        fields[<include>]: 关联记录返回的字段，如 fields[services]=service_id,service_date,service_items
 
-        # 查询关联的沟通记录
-        communications = Communication.query.filter_by(customer_id=customer_id).all()
-        customer_data['communication_records'] = [record.to_dict() for record in communications]
+    关联数据通过selectinload批量加载，查询次数固定为 1 + 关联数（服务项目另加1次），
+    指定字段时未请求的列（包括Text大字段）不会被加载。
+    """
+    try:
+        include = parse_include(request.args, list(CUSTOMER_INCLUDES))
+        customer_fields = parse_fields(request.args, Customer)
+
+        options = []
+        if customer_fields is not None:
+            options.append(load_only(*load_only_columns(Customer, customer_fields)))
+
+        related_fields = {}
+        for name in include:
+            _, relationship, model = CUSTOMER_INCLUDES[name]
+            extra = nested_fields(model)
+            fields = parse_fields(request.args, model, name, extra=extra)
+            related_fields[name] = fields
+
+            loader = selectinload(relationship)
+            if fields is not None:
+                loader = loader.load_only(*load_only_columns(model, fields))
+            if model is Service and (fields is None or 'service_items' in fields):
+                loader = loader.selectinload(Service.service_items)
+            options.append(loader)
+
+        # 查询客户信息及关联数据
+        customer = Customer.query.options(*options).get_or_404(customer_id)
+        customer_data = to_partial_dict(customer, customer_fields)
+
+        for name in include:
+            key, relationship, model = CUSTOMER_INCLUDES[name]
+            serializer = get_serializer(model, related_fields[name])
+            customer_data[key] = [serializer(record) for record in getattr(customer, relationship.key)]
 
         return jsonify({
             'code': 0,
@@ -89,6 +142,8 @@ def get_customer(customer_id):
             'message': '获取客户详情成功'
         }), 200
 
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"获取客户详情失败: {str(e)}")
         return jsonify({
@@ -96,6 +151,71 @@ def get_customer(customer_id):
             'message': f'获取客户详情失败: {str(e)}'
         }), 500
 
+@customer_bp.route('/bulk', methods=['POST'])
+def get_customers_bulk():
+    """按ID批量获取客户
+
+    请求体:
+        ids: 客户ID数组，最多50000个
+        include: 一并返回的关联数据，如 ["health", "services"]，未传时只返回客户信息
+        fields / fields[<include>]: 返回的字段，与详情接口的fields参数相同
+
+    ID按批查询，每批每张表一次查询；响应逐个客户流式输出，顺序与ids一致，
+    关联记录按主键排序，不存在的ID在missing中返回。
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        ids = parse_ids(payload.get('ids'))
+        args = body_args(payload, ('include', 'fields'))
+        include = parse_include(args, list(CUSTOMER_INCLUDES)) if 'include' in args else []
+        customer_fields = parse_fields(args, Customer)
+        related_fields = {name: parse_fields(args, CUSTOMER_INCLUDES[name][2], name,
+                                             extra=nested_fields(CUSTOMER_INCLUDES[name][2]))
+                          for name in include}
+    except (BulkRequestError, FieldsetError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    def related(name, chunk):
+        _, _, model = CUSTOMER_INCLUDES[name]
+        fields = related_fields[name]
+        if model is Service:
+            groups = {}
+            for customer_id, data in iter_services(Service.customer_id, chunk, fields, order_by=(Service.service_id,)):
+                groups.setdefault(customer_id, []).append(data)
+            return groups
+        return group_rows(model, model.customer_id, chunk, fields, order_by=(model.id,))
+
+    def generate():
+        missing = []
+        count = 0
+        error = None
+        # 结果状态写在响应末尾：响应头已发出后出错时，客户端据此判断数据不完整
+        yield '{"data":{"items":['
+        try:
+            for chunk in chunked(ids):
+                customers = {key: data for (key,), data in iter_rows(Customer, Customer.id, chunk, customer_fields)}
+                groups = {name: related(name, chunk) for name in include}
+                for customer_id in chunk:
+                    data = customers.get(customer_id)
+                    if data is None:
+                        missing.append(customer_id)
+                        continue
+                    for name in include:
+                        data[CUSTOMER_INCLUDES[name][0]] = groups[name].get(customer_id, [])
+                    yield (',' if count else '') + current_app.json.dumps(data)
+                    count += 1
+        except Exception as e:
+            # 响应头已发出，结束数组并在末尾标记数据不完整
+            current_app.logger.error(f"批量获取客户失败: {str(e)}")
+            error = f"批量获取客户失败: {str(e)}"
+        yield '],"missing":' + current_app.json.dumps(missing) + '}'
+        if error:
+            yield ',"truncated":true,"error":' + current_app.json.dumps(error) + '}'
+        else:
+            yield ',"code":0,"message":"批量获取客户成功"}'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
 @customer_bp.route('/', methods=['POST'])
 def create_customer():
     """创建新客户"""
@@ -149,27 +269,9 @@ def delete_customer(customer_id):
     try:
         # 查询客户
         customer = Customer.query.get_or_404(customer_id)
-        
-        # 查询所有关联的服务记录
-        services = Service.query.filter_by(customer_id=customer_id).all()
-        
-        # 先删除关联的服务项目记录
-        for service in services:
-            ServiceItem.query.filter_by(service_id=service.service_id).delete()
-        
-        # 删除关联的服务记录
-        Service.query.filter_by(customer_id=customer_id).delete()
-        
-        # 删除关联的健康档案
-        HealthRecord.query.filter_by(customer_id=customer_id).delete()
 
-        # 删除关联的消费记录
-        Consumption.query.filter_by(customer_id=customer_id).delete()
-
-        # 删除关联的沟通记录
-        Communication.query.filter_by(customer_id=customer_id).delete()
-
-        # 删除客户
+        # 健康档案、消费、服务记录（含服务项目）和沟通记录每张表一条DELETE一并删除
+        delete_dependents(Customer, [customer_id])
         db.session.delete(customer)
         db.session.commit()
 
@@ -180,6 +282,42 @@ def delete_customer(customer_id):
         current_app.logger.error(f"删除客户失败: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@customer_bp.route('', methods=['DELETE'])
+@customer_bp.route('/', methods=['DELETE'])
+def delete_customers():
+    """批量删除客户
+
+    客户ID通过查询参数 ids=C001,C002 传入，ID较多时也可放在请求体 {"ids": [...]} 中。
+    关联记录一并删除，每500个客户每张表一条DELETE语句，与历史记录多少无关。
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        if 'ids' in payload:
+            values = payload['ids']
+        else:
+            values = [value for arg in request.args.getlist('ids') for value in arg.split(',') if value.strip()]
+        ids = parse_ids([value.strip() if isinstance(value, str) else value for value in values])
+    except BulkRequestError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        deleted = delete_by_ids(Customer, Customer.id, ids)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"批量删除客户失败: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    deleted_ids = set(deleted)
+    return jsonify({
+        'code': 0,
+        'data': {
+            'deleted': len(deleted),
+            'missing': [customer_id for customer_id in ids if customer_id not in deleted_ids]
+        },
+        'message': f'已删除{len(deleted)}个客户'
+    }), 200
+
 @customer_bp.route('/<string:customer_id>/health', methods=['POST', 'GET'])
 def manage_health_record(customer_id):
     """添加或获取健康档案"""
@@ -405,9 +543,12 @@ def manage_single_communication(comm_id):
             return jsonify({'error': str(e)}), 500
 
 @customer_bp.route('/stats', methods=['GET'])
+@cached_response('customers', 'projects', 'consumptions', 'daily_store_stats')
 def get_stats():
-    """获取客户统计信息"""
+    """获取客户统计信息，消费总额从门店日汇总表求和，可按start_date/end_date筛选"""
     try:
+        start_date, end_date = parse_day_range(request.args)
+
         # 获取客户总数
         customer_count = Customer.query.count()
         
@@ -431,9 +572,10 @@ def get_stats():
         store_distribution = {store: count for store, count in store_query}
         
         # 计算消费总额
-        consumption_sum = db.session.query(
-            db.func.sum(Consumption.amount)
+        consumption_sum = filter_days(
+            db.session.query(db.func.sum(DailyStoreStat.revenue)), DailyStoreStat, start_date, end_date
         ).scalar() or 0
+        consumption_sum = round(consumption_sum, 2)
         
         # 构建响应数据
         response = {
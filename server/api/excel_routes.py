@@ -6,14 +6,16 @@ import logging
 import tempfile
 import pandas as pd
 import json
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 from werkzeug.utils import secure_filename
-import uuid
 
 from utils.excel_processor import ExcelProcessor
-# 修复导入路径问题，直接从models模块导入
-from models import Customer, HealthRecord, Consumption, Service, Communication, ServiceItem
+from utils.bulk_writer import bulk_import_batches
+from utils.job_runner import submit_job, run_job_inline
+from utils.bulk_fetch import parse_ids, BulkRequestError
+from utils.export_engine import export_data, parse_sections, parse_format, output_type, section_tables, ExportError
+from utils.export_cache import (artifact_key, get_export_cache, send_artifact, pending_job, release_pending)
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -69,29 +71,59 @@ def import_excel():
     
     logger.info(f"文件已保存: {filepath}")
     
+    # sync=true时保持原来的同步导入行为，默认提交后台任务立即返回任务ID
+    if request.form.get('sync') == 'true':
+        try:
+            stats = run_job_inline(run_excel_import, filepath)
+            return jsonify(dict(stats, filename=filename, message='文件上传和处理成功')), 200
+        except Exception as e:
+            logger.exception(f"Excel处理失败: {str(e)}")
+            return jsonify({'error': f'Excel处理失败: {str(e)}'}), 500
+
     try:
-        # 处理Excel文件
-        processor = ExcelProcessor()
-        result = processor.process_file(filepath)
-        
-        # 导入数据到数据库
-        import_result = import_to_database(result)
-        
+        job = submit_job('excel_import', run_excel_import, filepath, filename=filename)
         return jsonify({
             'filename': filename,
-            'message': '文件上传和处理成功',
-            'stats': {
-                'customers': len(result['customers']),
-                'health_records': len(result['health_records']),
-                'consumptions': len(result['consumptions']),
-                'services': len(result['services']),
-                'communications': len(result['communications']),
-            }
-        }), 200
-    
+            'message': '文件已上传，正在后台导入',
+            'job_id': job.id,
+            'status_url': f"/api/jobs/{job.id}",
+        }), 202
+
     except Exception as e:
-        logger.exception(f"Excel处理失败: {str(e)}")
-        return jsonify({'error': f'Excel处理失败: {str(e)}'}), 500
+        logger.exception(f"创建导入任务失败: {str(e)}")
+        return jsonify({'error': f'创建导入任务失败: {str(e)}'}), 500
+
+def run_excel_import(reporter, filepath):
+    """
+    解析Excel并写入数据库，作为后台任务执行
+
+    Args:
+        reporter: 任务进度上报器
+        filepath: 已保存的Excel文件路径
+
+    Returns:
+        dict: 各类数据的条数、写库统计和日期解析统计
+    """
+    processor = ExcelProcessor()
+    stats = {key: 0 for key in ('customers', 'health_records', 'consumptions', 'services', 'communications')}
+
+    def batches():
+        for key, records in processor.iter_file(filepath):
+            stats[key] += len(records)
+            yield key, records
+
+    # 边解析边写库，每批记录写入后即可释放，内存占用与文件大小无关；
+    # 每批提交后再上报进度，进度写入不会等待导入事务的写锁
+    reporter.stage('解析并写入数据库')
+    import_result = import_to_database(batches(), progress=lambda key, rows: reporter.advance(rows))
+    for message in import_result.get('errors', []):
+        reporter.error(message)
+
+    return {
+        'stats': stats,
+        'import_result': import_result,
+        'parse_stats': processor.date_parser.get_stats(),
+    }
 
 def precheck_excel(file):
     """
@@ -187,7 +219,15 @@ def precheck_excel(file):
 @excel_bp.route('/export', methods=['POST'])
 def export_excel():
     """
-    导出Excel文件
+    导出客户数据
+
+    请求体:
+        customer_ids: 客户ID数组
+        sections: 导出的部分，默认全部（customer/health/consumption/service/communication）
+        format: xlsx(默认)/csv/jsonl/parquet；非xlsx格式导出多个部分时返回zip，每个部分一个文件
+        sync: 为true时同步生成并直接返回文件；默认提交后台任务，完成后从download_url下载
+
+    相同的客户、部分和格式在数据未修改时复用已生成的文件，直接返回下载地址（sync时直接返回文件）。
     """
     logger.info("接收到Excel导出请求")
     
@@ -199,615 +239,98 @@ def export_excel():
         return jsonify({'error': '请求数据缺失'}), 400
     
     customer_ids = data.get('customer_ids', [])
-    sections = data.get('sections', ['customer', 'health', 'consumption', 'service', 'communication'])
     
     if not customer_ids:
         logger.warning("未提供客户ID")
         return jsonify({'error': '未提供客户ID'}), 400
-    
     try:
-        # 创建临时目录
-        export_folder = os.path.join(current_app.config['EXPORT_FOLDER'])
-        
-        if not os.path.exists(export_folder):
-            logger.info(f"创建导出目录: {export_folder}")
-            os.makedirs(export_folder)
-        
-        # 生成导出文件名
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        export_filename = f"客户数据导出_{timestamp}.xlsx"
-        export_filepath = os.path.join(export_folder, export_filename)
-        
-        # 创建Excel写入器
-        writer = pd.ExcelWriter(export_filepath, engine='xlsxwriter')
-        
-        # 导出数据
-        export_data = {}
-        
-        # 导出客户信息
-        if 'customer' in sections:
-            customers_df = export_customers(customer_ids)
-            customers_df.to_excel(writer, sheet_name='客户基础信息', index=False)
-            export_data['customers'] = len(customers_df)
-        
-        # 导出健康档案
-        if 'health' in sections:
-            health_df = export_health_records(customer_ids)
-            health_df.to_excel(writer, sheet_name='健康与皮肤数据', index=False)
-            export_data['health_records'] = len(health_df)
-        
-        # 导出消费记录
-        if 'consumption' in sections:
-            consumption_df = export_consumptions(customer_ids)
-            consumption_df.to_excel(writer, sheet_name='消费行为记录', index=False)
-            export_data['consumptions'] = len(consumption_df)
-        
-        # 导出服务记录
-        if 'service' in sections:
-            service_df = export_services(customer_ids)
-            service_df.to_excel(writer, sheet_name='消耗行为记录', index=False)
-            export_data['services'] = len(service_df)
-        
-        # 导出沟通记录
-        if 'communication' in sections:
-            communication_df = export_communications(customer_ids)
-            communication_df.to_excel(writer, sheet_name='客户沟通记录', index=False)
-            export_data['communications'] = len(communication_df)
-        
-        # 保存Excel文件
-        writer.close()
-        
-        logger.info(f"Excel导出成功: {export_filepath}")
-        
-        # 返回文件
-        return send_file(
-            export_filepath,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=export_filename
-        )
+        # 去重并排序，相同的客户集合对应同一个缓存文件；超过SQLite绑定变量上限的ID列表由bulk_fetch分批查询
+        customer_ids = sorted(parse_ids(customer_ids, 'customer_ids'))
+        sections = parse_sections(data.get('sections'))
+        export_format = parse_format(data.get('format'))
+    except (BulkRequestError, ExportError) as e:
+        return jsonify({'error': str(e)}), 400
     
+    try:
+        cache = get_export_cache()
+        key = artifact_key('excel_export', [customer_ids, sections, export_format], section_tables(sections))
+        artifact = cache.get(key)
+        sync = data.get('sync') is True or data.get('sync') == 'true'
+        
+        if artifact is None and sync:
+            artifact = build_export(key, customer_ids, sections, export_format)
+        if artifact is not None:
+            logger.info(f"导出文件已就绪: {artifact.path}")
+            if sync:
+                return send_artifact(artifact)
+            return jsonify({
+                'message': '导出文件已生成',
+                'artifact_id': key,
+                'download_url': f"/api/excel/exports/{key}",
+                'size': artifact.size,
+                'result': artifact.result,
+            }), 200
+        
+        job, submitted = pending_job(key, lambda: submit_job(
+            'excel_export', run_export, key, customer_ids, sections, export_format))
+        return jsonify({
+            'message': '正在后台导出' if submitted else '相同的导出正在进行中',
+            'job_id': job.id,
+            'status_url': f"/api/jobs/{job.id}",
+            'artifact_id': key,
+            'download_url': f"/api/excel/exports/{key}",
+        }), 202
+    
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.exception(f"Excel导出失败: {str(e)}")
         return jsonify({'error': f'Excel导出失败: {str(e)}'}), 500
 
-# 辅助函数：导入数据到数据库
-def import_to_database(data):
-    """将处理后的数据导入到数据库"""
-    from models import db, Customer, HealthRecord, Consumption, Service, Communication, ServiceItem
-    import inspect
-    
-    result = {
-        'customers': 0,
-        'health_records': 0,
-        'consumptions': 0,
-        'services': 0,
-        'communications': 0,
-        'service_items': 0,
-        'skipped': {
-            'customers': 0,
-            'health_records': 0,
-            'consumptions': 0,
-            'services': 0,
-            'communications': 0,
-            'service_items': 0
-        },
-        'errors': []
-    }
-    
-    try:
-        # 获取各个模型的字段名称
-        customer_fields = [column.key for column in Customer.__table__.columns]
-        health_record_fields = [column.key for column in HealthRecord.__table__.columns]
-        consumption_fields = [column.key for column in Consumption.__table__.columns]
-        service_fields = [column.key for column in Service.__table__.columns]
-        communication_fields = [column.key for column in Communication.__table__.columns]
-        service_item_fields = [column.key for column in ServiceItem.__table__.columns]
-        
-        logger.info(f"Customer字段: {customer_fields}")
-        logger.info(f"HealthRecord字段: {health_record_fields}")
-        logger.info(f"Consumption字段: {consumption_fields}")
-        logger.info(f"Service字段: {service_fields}")
-        logger.info(f"ServiceItem字段: {service_item_fields}")
-        logger.info(f"Communication字段: {communication_fields}")
-        
-        # 导入客户数据
-        for customer_data in data['customers']:
-            # 跳过标题行（如果存在）
-            if isinstance(customer_data.get('id'), str) and customer_data.get('id') in ['客户ID', 'ID']:
-                continue
-                
-            if not customer_data.get('id'):
-                result['skipped']['customers'] += 1
-                continue
-            
-            # 过滤字段 - 仅保留模型中存在的字段
-            filtered_data = {k: v for k, v in customer_data.items() if k in customer_fields}
-            logger.info(f"过滤后的客户数据: {filtered_data.keys()}")
-                
-            # 检查客户是否已存在
-            customer = Customer.query.filter_by(id=filtered_data['id']).first()
-            
-            if customer:
-                # 更新现有客户
-                for key, value in filtered_data.items():
-                    if hasattr(customer, key) and value is not None:
-                        setattr(customer, key, value)
-            else:
-                # 创建新客户
-                customer = Customer(**filtered_data)
-                db.session.add(customer)
-            
-            result['customers'] += 1
-        
-        # 导入健康档案
-        for health_data in data['health_records']:
-            # 跳过标题行或无效数据
-            if not health_data.get('customer_id') or health_data.get('customer_id') in ['客户ID', 'ID']:
-                result['skipped']['health_records'] += 1
-                continue
-            
-            # 过滤字段 - 仅保留模型中存在的字段
-            filtered_data = {k: v for k, v in health_data.items() if k in health_record_fields}
-            logger.info(f"过滤后的健康档案数据: {filtered_data.keys()}")
-            
-            # 检查健康档案是否已存在
-            health_record = HealthRecord.query.filter_by(customer_id=filtered_data['customer_id']).first()
-            
-            if health_record:
-                # 更新现有健康档案
-                for key, value in filtered_data.items():
-                    if hasattr(health_record, key) and value is not None:
-                        setattr(health_record, key, value)
-            else:
-                # 创建新健康档案
-                health_record = HealthRecord(**filtered_data)
-                db.session.add(health_record)
-            
-            result['health_records'] += 1
-        
-        # 导入消费记录
-        for consumption_data in data['consumptions']:
-            # 跳过标题行或无效数据
-            if not consumption_data.get('customer_id') or consumption_data.get('customer_id') in ['客户ID', 'ID']:
-                result['skipped']['consumptions'] += 1
-                continue
-            
-            # 过滤字段 - 仅保留模型中存在的字段
-            filtered_data = {k: v for k, v in consumption_data.items() if k in consumption_fields}
-            logger.info(f"过滤后的消费记录数据: {filtered_data.keys()}")
-            
-            # 检查必填字段
-            if not filtered_data.get('date'):
-                logger.warning(f"跳过缺少date的消费记录: {filtered_data}")
-                result['skipped']['consumptions'] += 1
-                continue
-            
-            try:
-                # 检查是否已存在相同的消费记录
-                existing_consumption = Consumption.query.filter_by(
-                    customer_id=filtered_data['customer_id'],
-                    date=filtered_data['date'],
-                    project_name=filtered_data.get('project_name', '')
-                ).first()
-                
-                if existing_consumption:
-                    # 如果存在，更新记录
-                    for key, value in filtered_data.items():
-                        if hasattr(existing_consumption, key) and value is not None:
-                            setattr(existing_consumption, key, value)
-                    logger.info(f"更新已存在的消费记录: {filtered_data.get('customer_id')} - {filtered_data.get('date')} - {filtered_data.get('project_name')}")
-                else:
-                    # 创建新消费记录
-                    consumption = Consumption(**filtered_data)
-                    db.session.add(consumption)
-                    logger.info(f"创建新消费记录: {filtered_data.get('customer_id')} - {filtered_data.get('date')} - {filtered_data.get('project_name')}")
-                
-                result['consumptions'] += 1
-            except Exception as e:
-                logger.error(f"导入消费记录时出错: {str(e)}")
-                result['errors'].append(f"消费记录错误: {str(e)}")
-                result['skipped']['consumptions'] += 1
-        
-        # 导入服务记录
-        for service_data in data['services']:
-            try:
-                # 跳过标题行或无效数据
-                if not service_data.get('customer_id') or service_data.get('customer_id') in ['客户ID', 'ID']:
-                    result['skipped']['services'] += 1
-                    continue
-                
-                # 提取服务项目列表
-                service_items_list = service_data.pop('service_items', []) if isinstance(service_data.get('service_items'), list) else []
-                
-                # 记录服务项目数据
-                logger.info(f"服务项目列表大小: {len(service_items_list)}")
-                if service_items_list:
-                    logger.info(f"服务项目样例: {service_items_list[0]}")
-                
-                # 过滤服务记录主表字段
-                filtered_data = {k: v for k, v in service_data.items() if k in service_fields}
-                logger.info(f"过滤后的服务记录数据: {filtered_data.keys()}")
-                
-                # 如果service_date为空，使用当前时间作为替代
-                if not filtered_data.get('service_date'):
-                    logger.warning(f"服务记录缺少service_date字段，使用当前时间: {filtered_data}")
-                    filtered_data['service_date'] = datetime.now()
-                
-                # 检查是否已存在相同服务记录（相同客户、相同日期）
-                existing_service = Service.query.filter_by(
-                    customer_id=filtered_data['customer_id'],
-                    service_date=filtered_data['service_date']
-                ).first()
-                
-                service_record = None
-                if existing_service:
-                    logger.info(f"发现已存在的服务记录: {existing_service.service_id}")
-                    
-                    # 更新现有服务记录
-                    for key, value in filtered_data.items():
-                        if hasattr(existing_service, key) and value is not None:
-                            setattr(existing_service, key, value)
-                    
-                    service_record = existing_service
-                    logger.info(f"更新服务记录: ID={existing_service.service_id}")
-                else:
-                    # 生成服务记录ID (如果没有提供)
-                    if 'service_id' not in filtered_data or not filtered_data['service_id']:
-                        service_id = f"S{uuid.uuid4().hex[:10].upper()}"
-                        filtered_data['service_id'] = service_id
-                    
-                    # 复制客户姓名到service记录
-                    if 'name' in service_data and not filtered_data.get('customer_name'):
-                        filtered_data['customer_name'] = service_data['name']
-                    
-                    # 创建新服务记录
-                    service_record = Service(**filtered_data)
-                    db.session.add(service_record)
-                    db.session.flush()  # 确保获取到新ID
-                    logger.info(f"创建新服务记录: ID={service_record.service_id}")
-                
-                result['services'] += 1
-                
-                # 处理服务项目 - 无论是更新还是创建服务记录
-                if service_items_list and service_record:
-                    # 获取现有服务项目
-                    existing_items = {}
-                    if service_record.service_id:
-                        for item in ServiceItem.query.filter_by(service_id=service_record.service_id).all():
-                            key = (item.project_name, item.beautician_name)
-                            existing_items[key] = item
-                    
-                    # 处理每个服务项目
-                    for item_idx, item_data in enumerate(service_items_list):
-                        try:
-                            # 确保所有必要字段存在
-                            if 'project_name' not in item_data or not item_data.get('project_name'):
-                                logger.warning(f"服务项目 {item_idx+1} 缺少project_name字段，跳过: {item_data}")
-                                result['skipped']['service_items'] += 1
-                                continue
-                            
-                            # 准备服务项目数据
-                            service_item_data = {
-                                'service_id': service_record.service_id,
-                                'project_name': item_data['project_name'].strip(),
-                                'beautician_name': item_data.get('beautician_name', '').strip(),
-                                'unit_price': float(item_data.get('unit_price', 0)),
-                                'is_specified': bool(item_data.get('is_specified', False))
-                            }
-                            
-                            # 创建查找键
-                            item_key = (service_item_data['project_name'], service_item_data['beautician_name'])
-                            
-                            # 检查是否已存在相同服务项目
-                            if item_key in existing_items:
-                                # 更新已存在的项目
-                                existing_item = existing_items[item_key]
-                                for key, value in service_item_data.items():
-                                    if hasattr(existing_item, key) and value is not None:
-                                        setattr(existing_item, key, value)
-                                logger.info(f"更新服务项目: {item_key}")
-                            else:
-                                # 创建新的服务项目
-                                service_item = ServiceItem(**service_item_data)
-                                db.session.add(service_item)
-                                logger.info(f"创建新服务项目: {item_key}")
-                            
-                            result['service_items'] += 1
-                        except Exception as e:
-                            logger.error(f"处理服务项目 {item_idx+1} 时出错: {str(e)}")
-                            logger.error(f"项目数据: {item_data}")
-                            result['errors'].append(f"服务项目错误: {str(e)}")
-                            result['skipped']['service_items'] += 1
-                    
-                    # 更新服务记录的总项目数
-                    if service_record:
-                        # 重新查询关联的服务项目
-                        items_count = ServiceItem.query.filter_by(service_id=service_record.service_id).count()
-                        if items_count > 0 and (not service_record.total_sessions or service_record.total_sessions < items_count):
-                            service_record.total_sessions = items_count
-                            logger.info(f"更新服务记录总项目数: {items_count}")
-            except Exception as e:
-                logger.error(f"处理服务记录时出错: {str(e)}")
-                result['errors'].append(f"服务记录错误: {str(e)}")
-                result['skipped']['services'] += 1
-        
-        # 导入沟通记录
-        for communication_data in data['communications']:
-            try:
-                # 跳过标题行或无效数据
-                if not communication_data.get('customer_id') or communication_data.get('customer_id') in ['客户ID', 'ID']:
-                    result['skipped']['communications'] += 1
-                    continue
-                
-                # 过滤字段 - 仅保留模型中存在的字段
-                filtered_data = {k: v for k, v in communication_data.items() if k in communication_fields}
-                logger.info(f"过滤后的沟通记录数据: {filtered_data.keys()}")
-                
-                # 检查必填字段
-                if not filtered_data.get('communication_date'):
-                    logger.warning(f"跳过缺少communication_date的沟通记录: {filtered_data}")
-                    result['skipped']['communications'] += 1
-                    continue
-                
-                # 检查是否已存在相同的沟通记录
-                existing_comm = Communication.query.filter_by(
-                    customer_id=filtered_data['customer_id'],
-                    communication_date=filtered_data['communication_date'],
-                    communication_content=filtered_data.get('communication_content', '')
-                ).first()
-                
-                if existing_comm:
-                    # 如果存在，更新记录
-                    for key, value in filtered_data.items():
-                        if hasattr(existing_comm, key) and value is not None:
-                            setattr(existing_comm, key, value)
-                    logger.info(f"更新已存在的沟通记录: {filtered_data.get('customer_id')} - {filtered_data.get('communication_date')}")
-                else:
-                    # 创建新沟通记录
-                    communication = Communication(**filtered_data)
-                    db.session.add(communication)
-                    logger.info(f"创建新沟通记录: {filtered_data.get('customer_id')} - {filtered_data.get('communication_date')}")
-                
-                result['communications'] += 1
-            except Exception as e:
-                logger.error(f"导入沟通记录时出错: {str(e)}")
-                result['errors'].append(f"沟通记录错误: {str(e)}")
-                result['skipped']['communications'] += 1
-        
-        # 提交所有更改
-        db.session.commit()
-        
-        logger.info(f"数据库导入完成: {json.dumps(result)}")
-        return result
-    
-    except Exception as e:
-        db.session.rollback()
-        logger.exception(f"数据库导入失败: {str(e)}")
-        result['errors'].append(f"数据库错误: {str(e)}")
-        raise e
+def build_export(key, customer_ids, sections, export_format):
+    """生成导出文件并写入导出缓存，返回Artifact"""
+    extension, mimetype = output_type(export_format, sections)
+    download_name = f"客户数据导出_{datetime.now().strftime('%Y%m%d%H%M%S')}.{extension}"
+    return get_export_cache().put(
+        key, extension, mimetype, download_name,
+        lambda path: export_data(customer_ids, sections, export_format, path)
+    )
 
-# 辅助函数：导出客户数据
-def export_customers(customer_ids):
-    """导出客户数据"""
-    customers = Customer.query.filter(Customer.id.in_(customer_ids)).all()
-    
-    # 将客户数据转换为DataFrame
-    data = []
-    for customer in customers:
-        data.append(customer.to_dict())
-    
-    # 创建DataFrame
-    df = pd.DataFrame(data)
-    
-    # 重命名列（英文列名转为中文）
-    column_mapping = {
-        'id': '客户ID',
-        'name': '姓名',
-        'gender': '性别',
-        'age': '年龄',
-        'store': '门店归属',
-        'hometown': '籍贯',
-        'residence': '现居地',
-        'residence_years': '居住时长',
-        'family_structure': '家庭成员构成',
-        'family_age_distribution': '家庭人员年龄分布',
-        'living_condition': '家庭居住情况',
-        'personality_tags': '性格类型标签',
-        'consumption_decision': '消费决策主导',
-        'risk_sensitivity': '风险敏感度',
-        'hobbies': '兴趣爱好',
-        'routine': '作息规律',
-        'diet_preference': '饮食偏好',
-        'menstrual_record': '生理期记录',
-        'family_medical_history': '家族遗传病史',
-        'occupation': '职业',
-        'work_unit_type': '单位性质',
-        'annual_income': '年收入'
-    }
-    
-    df = df.rename(columns=column_mapping)
-    
-    return df
+def run_export(reporter, key, customer_ids, sections, export_format):
+    """
+    生成导出文件，作为后台任务执行
 
-# 辅助函数：导出健康档案
-def export_health_records(customer_ids):
-    """导出健康档案"""
-    health_records = HealthRecord.query.filter(HealthRecord.customer_id.in_(customer_ids)).all()
-    
-    # 获取相关客户信息
-    customer_dict = {}
-    customers = Customer.query.filter(Customer.id.in_(customer_ids)).all()
-    for customer in customers:
-        customer_dict[customer.id] = customer.name
-    
-    # 将健康档案数据转换为DataFrame
-    data = []
-    for record in health_records:
-        record_dict = record.to_dict()
-        record_dict['姓名'] = customer_dict.get(record.customer_id, '')
-        data.append(record_dict)
-    
-    # 创建DataFrame
-    df = pd.DataFrame(data)
-    
-    # 重命名列（英文列名转为中文）
-    column_mapping = {
-        'customer_id': '客户ID',
-        'skin_type': '肤质类型',
-        'oil_water_balance': '水油情况',
-        'pores_blackheads': '毛孔与黑头',
-        'wrinkles_texture': '皱纹与纹理',
-        'pigmentation': '色素沉着',
-        'photoaging_inflammation': '光老化与炎症',
-        'tcm_constitution': '中医体质类型',
-        'tongue_features': '舌象特征',
-        'pulse_data': '脉象数据',
-        'sleep_routine': '作息规律',
-        'exercise_pattern': '运动频率及类型',
-        'diet_restrictions': '饮食禁忌/偏好',
-        'care_time_flexibility': '护理时间灵活度',
-        'massage_pressure_preference': '手法力度偏好',
-        'environment_requirements': '环境氛围要求',
-        'short_term_beauty_goal': '短期美丽目标',
-        'long_term_beauty_goal': '长期美丽目标',
-        'short_term_health_goal': '短期健康目标',
-        'long_term_health_goal': '长期健康目标',
-        'medical_cosmetic_history': '医美操作史',
-        'wellness_service_history': '大健康服务史',
-        'major_disease_history': '重大疾病历史',
-        'allergies': '过敏史'
+    Returns:
+        dict: 下载地址、文件大小和各表导出行数
+    """
+    try:
+        reporter.stage('导出数据')
+        artifact = build_export(key, customer_ids, sections, export_format)
+        reporter.advance(sum(artifact.result.values()))
+    finally:
+        release_pending(key)
+    return {
+        'artifact_id': key,
+        'download_url': f"/api/excel/exports/{key}",
+        'filename': artifact.download_name,
+        'size': artifact.size,
+        'counts': artifact.result,
     }
-    
-    df = df.rename(columns=column_mapping)
-    
-    # 调整列顺序，将客户ID和姓名放在最前面
-    cols = ['客户ID', '姓名'] + [col for col in df.columns if col not in ['客户ID', '姓名']]
-    df = df[cols]
-    
-    return df
 
-# 辅助函数：导出消费记录
-def export_consumptions(customer_ids):
-    """导出消费记录"""
-    consumptions = Consumption.query.filter(Consumption.customer_id.in_(customer_ids)).all()
-    
-    # 获取相关客户信息
-    customer_dict = {}
-    customers = Customer.query.filter(Customer.id.in_(customer_ids)).all()
-    for customer in customers:
-        customer_dict[customer.id] = customer.name
-    
-    # 将消费记录数据转换为DataFrame
-    data = []
-    for consumption in consumptions:
-        consumption_dict = consumption.to_dict()
-        consumption_dict['姓名'] = customer_dict.get(consumption.customer_id, '')
-        data.append(consumption_dict)
-    
-    # 创建DataFrame
-    df = pd.DataFrame(data)
-    
-    # 重命名列（英文列名转为中文）
-    column_mapping = {
-        'customer_id': '客户ID',
-        'date': '消费时间',
-        'project_name': '项目名称',
-        'amount': '消费金额',
-        'payment_method': '支付方式',
-        'total_sessions': '总次数',
-        'completion_date': '耗卡完成时间',
-        'satisfaction': '项目满意度'
-    }
-    
-    df = df.rename(columns=column_mapping)
-    
-    # 调整列顺序，将客户ID和姓名放在最前面
-    cols = ['客户ID', '姓名'] + [col for col in df.columns if col not in ['客户ID', '姓名']]
-    df = df[cols]
-    
-    return df
+@excel_bp.route('/exports/<artifact_id>', methods=['GET'])
+def download_export(artifact_id):
+    """下载已生成的导出文件，支持Range断点续传和If-None-Match"""
+    artifact = get_export_cache().get(artifact_id)
+    if artifact is None:
+        return jsonify({'error': '导出文件不存在或已过期，请重新导出'}), 404
+    return send_artifact(artifact)
 
-# 辅助函数：导出服务记录
-def export_services(customer_ids):
-    """导出服务记录"""
-    services = Service.query.filter(Service.customer_id.in_(customer_ids)).all()
-    
-    # 获取相关客户信息
-    customer_dict = {}
-    customers = Customer.query.filter(Customer.id.in_(customer_ids)).all()
-    for customer in customers:
-        customer_dict[customer.id] = customer.name
-    
-    # 将服务记录数据转换为DataFrame
-    data = []
-    for service in services:
-        service_dict = service.to_dict()
-        service_dict['姓名'] = customer_dict.get(service.customer_id, '')
-        data.append(service_dict)
-    
-    # 创建DataFrame
-    df = pd.DataFrame(data)
-    
-    # 重命名列（英文列名转为中文）
-    column_mapping = {
-        'customer_id': '客户ID',
-        'service_date': '到店时间',
-        'departure_time': '离店时间',
-        'total_amount': '总耗卡金额',
-        'satisfaction': '服务满意度',
-        'service_items': '消耗项目',
-        'item_content': '项目内容',
-        'beautician': '操作美容师',
-        'service_amount': '耗卡金额',
-        'is_specified': '是否指定'
-    }
-    
-    df = df.rename(columns=column_mapping)
-    
-    # 调整列顺序，将客户ID和姓名放在最前面
-    cols = ['客户ID', '姓名'] + [col for col in df.columns if col not in ['客户ID', '姓名']]
-    df = df[cols]
-    
-    return df
+# 辅助函数：导入数据到数据库
+def import_to_database(batches, progress=None):
+    """将ExcelProcessor.iter_file逐批产出的数据导入到数据库
 
-# 辅助函数：导出沟通记录
-def export_communications(customer_ids):
-    """导出沟通记录"""
-    communications = Communication.query.filter(Communication.customer_id.in_(customer_ids)).all()
-    
-    # 获取相关客户信息
-    customer_dict = {}
-    customers = Customer.query.filter(Customer.id.in_(customer_ids)).all()
-    for customer in customers:
-        customer_dict[customer.id] = customer.name
-    
-    # 将沟通记录数据转换为DataFrame
-    data = []
-    for communication in communications:
-        communication_dict = communication.to_dict()
-        communication_dict['姓名'] = customer_dict.get(communication.customer_id, '')
-        data.append(communication_dict)
-    
-    # 创建DataFrame
-    df = pd.DataFrame(data)
-    
-    # 重命名列（英文列名转为中文）
-    column_mapping = {
-        'customer_id': '客户ID',
-        'communication_date': '沟通时间',
-        'communication_type': '沟通方式',
-        'communication_location': '沟通地点',
-        'staff_name': '员工',
-        'communication_content': '沟通内容',
-        'customer_feedback': '客户反馈',
-        'follow_up_action': '后续跟进'
-    }
-    
-    df = df.rename(columns=column_mapping)
-    
-    # 调整列顺序，将客户ID和姓名放在最前面
-    cols = ['客户ID', '姓名'] + [col for col in df.columns if col not in ['客户ID', '姓名']]
-    df = df[cols]
-    
-    return df
\ No newline at end of file
+    按表集合式合并写入，每批提交一次，详见utils.bulk_writer
+    """
+    result = bulk_import_batches(batches, progress)
+    logger.info(f"数据库导入完成: {json.dumps(result, ensure_ascii=False)}")
+    return result
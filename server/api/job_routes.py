@@ -0,0 +1,36 @@
+"""
+后台任务API - 查询Excel导入等后台任务的执行进度
+"""
+import logging
+from flask import Blueprint, jsonify, request
+
+from models import Job
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+job_bp = Blueprint('job', __name__)
+
+@job_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """获取任务状态：阶段、已处理行数、吞吐量和错误信息"""
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': '任务不存在'}), 404
+    return jsonify({'success': True, 'data': job.to_dict()})
+
+@job_bp.route('/', methods=['GET'])
+def list_jobs():
+    """获取最近的任务列表，可按状态和类型过滤"""
+    query = Job.query
+    status = request.args.get('status')
+    if status:
+        query = query.filter_by(status=status)
+    job_type = request.args.get('type')
+    if job_type:
+        query = query.filter_by(job_type=job_type)
+
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    jobs = query.order_by(Job.created_at.desc()).limit(limit).all()
+    return jsonify({'success': True, 'data': [job.to_dict() for job in jobs]})
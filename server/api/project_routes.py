@@ -7,14 +7,20 @@ import uuid
 from datetime import datetime
 from flask import Blueprint, jsonify, request, current_app
 from werkzeug.utils import secure_filename
-from models import db, Project
+from models import db, Project, DailyProjectStat
 from utils.project_excel_processor import ProjectExcelProcessor
+from utils.job_runner import submit_job, run_job_inline, commit_batches
+from utils.pagination import keyset_page, cached_count, wants_total, InvalidCursor
+from utils.response_cache import cached_response
+from utils.rollups import parse_day_range, filter_days
+from utils.serializers import serialize_many
 
 # 创建蓝图
 project_bp = Blueprint('project', __name__)
 
 # 获取所有项目
 @project_bp.route('/', methods=['GET'])
+@cached_response('projects')
 def get_all_projects():
     """获取所有项目"""
     try:
@@ -37,13 +43,30 @@ def get_all_projects():
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 20))
         
+        # 游标分页：传入after参数（第一页为空）时按(created_at, id)定位，不执行OFFSET和COUNT
+        if 'after' in request.args:
+            projects, next_cursor = keyset_page(query, Project.created_at, Project.id,
+                                                after=request.args.get('after'), limit=page_size)
+            pagination = {
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'per_page': page_size
+            }
+            if wants_total(request.args):
+                pagination['total'] = cached_count(query, ('projects', category, status, search))
+            return jsonify({
+                'success': True,
+                'data': serialize_many(projects, Project),
+                'pagination': pagination
+            })
+
         # 执行查询
         paginated = query.order_by(Project.created_at.desc()).paginate(page=page, per_page=page_size)
         
         # 构建响应
         response = {
             'success': True,
-            'data': [project.to_dict() for project in paginated.items],
+            'data': serialize_many(paginated.items, Project),
             'pagination': {
                 'total': paginated.total,
                 'pages': paginated.pages,
@@ -54,12 +77,15 @@ def get_all_projects():
         
         return jsonify(response)
     
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"获取项目列表失败: {str(e)}")
         return jsonify({'success': False, 'message': f"获取项目列表失败: {str(e)}"}), 500
 
 # 获取项目类别列表
 @project_bp.route('/categories', methods=['GET'])
+@cached_response('projects')
 def get_project_categories():
     """获取所有项目类别"""
     try:
@@ -274,19 +300,58 @@ def confirm_import():
         if not file_path or not os.path.exists(file_path):
             return jsonify({'success': False, 'message': '文件不存在或已被删除'}), 400
         
-        # 处理Excel文件
-        processor = ProjectExcelProcessor(file_path)
-        if not processor.load_excel():
-            return jsonify({'success': False, 'message': '无法加载Excel文件', 'errors': processor.get_errors()}), 400
-        
-        # 清洗数据
-        cleaned_data = processor.clean_data()
-        if not cleaned_data:
-            return jsonify({'success': False, 'message': '没有有效数据可导入', 'errors': processor.get_errors()}), 400
-        
         # 导入模式
         import_mode = data.get('mode', 'add_only')  # add_only, update_existing, replace_all
-        
+
+        # sync=true时保持原来的同步导入行为，默认提交后台任务立即返回任务ID
+        if data.get('sync'):
+            result = run_job_inline(run_project_import, file_path, import_mode)
+            return jsonify({
+                'success': True,
+                'message': f"数据导入完成，新增: {result['imported']}，更新: {result['updated']}，失败: {result['errors']}",
+                'data': result
+            })
+
+        job = submit_job('project_import', run_project_import, file_path, import_mode,
+                         filename=os.path.basename(file_path))
+        return jsonify({
+            'success': True,
+            'message': '已开始后台导入项目数据',
+            'data': {
+                'job_id': job.id,
+                'status_url': f"/api/jobs/{job.id}"
+            }
+        }), 202
+    
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"确认导入项目数据失败: {str(e)}")
+        return jsonify({'success': False, 'message': f"确认导入项目数据失败: {str(e)}"}), 500
+
+def run_project_import(reporter, file_path, import_mode):
+    """
+    清洗项目Excel并写入项目表，作为后台任务执行
+
+    Args:
+        reporter: 任务进度上报器
+        file_path: 已上传的Excel文件路径
+        import_mode: 导入模式(add_only/update_existing/replace_all)
+
+    Returns:
+        dict: 新增、更新、失败条数及错误信息
+    """
+    reporter.stage('解析Excel')
+    processor = ProjectExcelProcessor(file_path)
+    if not processor.load_excel():
+        raise ValueError(f"无法加载Excel文件: {'; '.join(processor.get_errors())}")
+    
+    # 清洗数据
+    cleaned_data = processor.clean_data()
+    if not cleaned_data:
+        raise ValueError(f"没有有效数据可导入: {'; '.join(processor.get_errors())}")
+
+    reporter.stage('写入数据库')
+    try:
         # 如果是替换全部模式，先删除所有项目
         if import_mode == 'replace_all':
             Project.query.delete()
@@ -296,7 +361,8 @@ def confirm_import():
         updated_count = 0
         error_count = 0
         
-        for project_data in cleaned_data:
+        # 每批记录处理完后提交并上报进度
+        for project_data in commit_batches(reporter, cleaned_data):
             try:
                 # 检查项目是否已存在 (按名称匹配)
                 existing_project = Project.query.filter_by(name=project_data['name']).first()
@@ -318,70 +384,83 @@ def confirm_import():
                 error_count += 1
                 current_app.logger.error(f"导入项目数据出错: {str(e)}")
                 processor.errors.append(f"导入数据出错: {str(e)}")
-        
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'数据导入完成，新增: {imported_count}，更新: {updated_count}，失败: {error_count}',
-            'data': {
-                'imported': imported_count,
-                'updated': updated_count,
-                'errors': error_count,
-                'error_messages': processor.get_errors()
-            }
-        })
-    
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        current_app.logger.error(f"确认导入项目数据失败: {str(e)}")
-        return jsonify({'success': False, 'message': f"确认导入项目数据失败: {str(e)}"}), 500
+        raise
+
+    for message in processor.get_errors():
+        reporter.error(message)
+
+    return {
+        'imported': imported_count,
+        'updated': updated_count,
+        'errors': error_count,
+        'error_messages': processor.get_errors()
+    }
+
+# 价格区间(名称, 下限, 上限)，上限为None表示不封顶
+PRICE_RANGES = [
+    ('0-1000', 0, 1000),
+    ('1000-2000', 1000, 2000),
+    ('2000-3000', 2000, 3000),
+    ('3000-5000', 3000, 5000),
+    ('5000+', 5000, None),
+]
 
 # 获取项目统计信息
 @project_bp.route('/stats', methods=['GET'])
+@cached_response('projects', 'daily_project_stats')
 def get_project_stats():
-    """获取项目统计信息"""
+    """
+    获取项目统计信息
+
+    项目总数、分类分布和价格区间分布由一次分组查询得到；
+    usage_ranking从项目日汇总表求和，可按start_date/end_date（含当天）筛选。
+    """
     try:
-        # 获取项目总数
-        total_projects = Project.query.count()
-        
-        # 获取各类别项目数量
+        start_date, end_date = parse_day_range(request.args)
+
+        # 按分类分组，同时用CASE统计各价格区间的项目数
+        price_columns = []
+        for range_name, min_price, max_price in PRICE_RANGES:
+            condition = Project.price >= min_price
+            if max_price is not None:
+                condition = db.and_(condition, Project.price < max_price)
+            price_columns.append(db.func.sum(db.case((condition, 1), else_=0)))
+
         category_stats = db.session.query(
-            Project.category, db.func.count(Project.id)
+            Project.category, db.func.count(Project.id), *price_columns
         ).group_by(Project.category).all()
-        
-        category_distribution = {category: count for category, count in category_stats}
-        
-        # 获取价格区间分布
-        price_ranges = [
-            ('0-1000', db.func.count(Project.id.distinct())),
-            ('1000-2000', db.func.count(Project.id.distinct())),
-            ('2000-3000', db.func.count(Project.id.distinct())),
-            ('3000-5000', db.func.count(Project.id.distinct())),
-            ('5000+', db.func.count(Project.id.distinct()))
+
+        total_projects = 0
+        category_distribution = {}
+        price_stats = {range_name: 0 for range_name, _, _ in PRICE_RANGES}
+        for category, count, *price_counts in category_stats:
+            total_projects += count
+            category_distribution[category] = count
+            for (range_name, _, _), range_count in zip(PRICE_RANGES, price_counts):
+                price_stats[range_name] += range_count or 0
+
+        # 项目使用排行
+        usage_count = db.func.sum(DailyProjectStat.item_count)
+        usage_stats = filter_days(db.session.query(
+            DailyProjectStat.project_name, usage_count, db.func.sum(DailyProjectStat.amount)
+        ), DailyProjectStat, start_date, end_date).group_by(DailyProjectStat.project_name).having(
+            usage_count > 0
+        ).order_by(usage_count.desc()).limit(10).all()
+
+        usage_ranking = [
+            {'project_name': project_name, 'count': count, 'total_amount': round(amount or 0, 2)}
+            for project_name, count, amount in usage_stats
         ]
-        
-        price_stats = {}
-        for range_name, _ in price_ranges:
-            min_price, max_price = 0, float('inf')
-            if range_name != '5000+':
-                min_price, max_price = map(int, range_name.split('-'))
-            else:
-                min_price = 5000
-            
-            count = Project.query.filter(
-                Project.price >= min_price,
-                Project.price < max_price if max_price != float('inf') else True
-            ).count()
-            
-            price_stats[range_name] = count
-        
+
         return jsonify({
             'success': True,
             'data': {
                 'total_projects': total_projects,
                 'category_distribution': category_distribution,
-                'price_distribution': price_stats
+                'price_distribution': price_stats,
+                'usage_ranking': usage_ranking
             }
         })
     
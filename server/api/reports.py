@@ -1,16 +1,23 @@
 """
 报告生成API路由
 """
-from flask import Blueprint, request, jsonify, current_app
 import os
-import sys
-import subprocess
-from pathlib import Path
-from server.models import db, Customer
+import logging
+from flask import Blueprint, jsonify, request, current_app, send_file
+from models import Customer
+from utils.report_engine import generate_report as generate_customer_report
+from utils.bulk_reports import generate_bulk_reports, read_manifest, is_running, BulkReportRunning, ARCHIVE_NAME
+from utils.export_cache import pending_job, release_pending
+from utils.job_runner import submit_job
 
-bp = Blueprint('reports', __name__)
+logger = logging.getLogger(__name__)
 
-@bp.route('/generate/<customer_id>', methods=['GET'])
+report_bp = Blueprint('reports', __name__)
+
+# 本进程内的批量报告任务去重键；跨进程的互斥由generate_bulk_reports对输出目录加锁保证
+BULK_REPORT_KEY = 'bulk_report'
+
+@report_bp.route('/generate/<customer_id>', methods=['GET'])
 def generate_report(customer_id):
     """生成客户报告"""
     # 检查客户是否存在
@@ -22,47 +29,15 @@ def generate_report(customer_id):
         }), 404
     
     try:
-        # 项目根目录
-        root_dir = Path(current_app.root_path).parent
-        
-        # 报告生成脚本路径
-        report_script = os.path.join(root_dir, 'md_report_generator.py')
-        
-        # 运行报告生成脚本
-        result = subprocess.run(
-            [sys.executable, report_script, customer_id],
-            capture_output=True,
-            text=True,
-            cwd=root_dir
-        )
-        
-        if result.returncode != 0:
-            return jsonify({
-                'code': 1,
-                'message': f'报告生成失败: {result.stderr}'
-            }), 500
-        
-        # 报告文件路径
-        report_file = os.path.join(root_dir, f"{customer_id}_customer_report.md")
-        
-        # 检查报告是否已生成
-        if not os.path.exists(report_file):
-            return jsonify({
-                'code': 1,
-                'message': f'报告文件未生成'
-            }), 500
-        
-        # 返回报告文件路径或内容
-        with open(report_file, 'r', encoding='utf-8') as f:
-            report_content = f.read()
-        
+        # 在进程内生成报告，不再启动子进程、不写报告文件
+        report_content = generate_customer_report(customer_id)
+
         return jsonify({
             'code': 0,
             'data': {
                 'customer_id': customer_id,
                 'customer_name': customer.name,
-                'report_content': report_content,
-                'report_file': f"{customer_id}_customer_report.md"
+                'report_content': report_content
             }
         })
         
@@ -70,4 +45,89 @@ def generate_report(customer_id):
         return jsonify({
             'code': 1,
             'message': f'报告生成出错: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+def _flag(data, name):
+    return data.get(name) is True or data.get(name) == 'true'
+
+def run_bulk_reports(reporter, archive, full):
+    """后台任务：增量生成全部客户的报告"""
+    try:
+        return generate_bulk_reports(current_app.config['REPORT_FOLDER'], archive=archive, full=full,
+                                     workers=current_app.config['REPORT_WORKERS'], reporter=reporter)
+    finally:
+        release_pending(BULK_REPORT_KEY)
+
+@report_bp.route('/bulk', methods=['POST'])
+def bulk_reports():
+    """
+    批量生成全部客户的报告
+
+    请求体:
+        archive: 为true时另外打包为zip，从 /api/reports/bulk/archive 下载
+        full: 为true时忽略清单全部重新生成；默认只重新生成数据有变化的客户
+        sync: 为true时同步生成并返回结果；默认提交后台任务
+    """
+    data = request.get_json(silent=True) or {}
+    archive = _flag(data, 'archive')
+    full = _flag(data, 'full')
+    folder = current_app.config['REPORT_FOLDER']
+
+    try:
+        if _flag(data, 'sync'):
+            result = generate_bulk_reports(folder, archive=archive, full=full,
+                                           workers=current_app.config['REPORT_WORKERS'])
+            return jsonify({'code': 0, 'data': result})
+
+        # 其他worker或实例正在生成时不再提交任务；提交后仍被抢先时任务以BulkReportRunning失败
+        if is_running(folder):
+            raise BulkReportRunning('批量报告正在生成中，请稍后再试')
+
+        job, submitted = pending_job(BULK_REPORT_KEY, lambda: submit_job(
+            'bulk_report', run_bulk_reports, archive, full))
+        return jsonify({
+            'code': 0,
+            'message': '正在后台生成报告' if submitted else '批量报告正在生成中',
+            'data': {
+                'job_id': job.id,
+                'status_url': f"/api/jobs/{job.id}"
+            }
+        }), 202
+
+    except BulkReportRunning as e:
+        return jsonify({
+            'code': 1,
+            'message': str(e)
+        }), 409
+    except Exception as e:
+        logger.exception(f"批量报告生成失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'message': f'批量报告生成出错: {str(e)}'
+        }), 500
+
+@report_bp.route('/bulk/archive', methods=['GET'])
+def download_bulk_archive():
+    """下载批量报告压缩包，支持Range断点续传"""
+    path = os.path.join(current_app.config['REPORT_FOLDER'], ARCHIVE_NAME)
+    if not os.path.exists(path):
+        return jsonify({
+            'code': 1,
+            'message': '报告压缩包不存在，请先以archive=true批量生成'
+        }), 404
+    return send_file(path, mimetype='application/zip', as_attachment=True,
+                     download_name='客户报告.zip', conditional=True)
+
+@report_bp.route('/bulk/<customer_id>', methods=['GET'])
+def download_bulk_report(customer_id):
+    """下载批量生成的单个客户报告"""
+    folder = current_app.config['REPORT_FOLDER']
+    entry = read_manifest(folder)['customers'].get(customer_id)
+    if entry is None:
+        return jsonify({
+            'code': 1,
+            'message': f'客户 {customer_id} 的报告尚未生成'
+        }), 404
+    return send_file(os.path.join(folder, entry['file']), mimetype='text/markdown', as_attachment=True,
+                     download_name=f"{customer_id}_customer_report.md", conditional=True)
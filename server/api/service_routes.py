@@ -8,11 +8,22 @@ import json
 import pandas as pd
 import traceback
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app, send_file
-from models import db, Service, ServiceItem, Customer, Project
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
+from models import db, Service, ServiceItem, Customer, DailyStoreStat, DailyProjectStat, DailyBeauticianStat
 from utils.consumption_excel_processor import ConsumptionExcelProcessor
 from sqlalchemy import func, exc
 from werkzeug.utils import secure_filename
+from utils.job_runner import submit_job, run_job_inline, commit_batches
+from utils.pagination import keyset_page, cached_count, wants_total, InvalidCursor
+from utils.response_cache import cached_response
+from utils.rollups import parse_day_range, filter_days, next_day
+from utils.project_catalog import get_project_catalog
+from utils.serializers import serialize_many, nested_fields
+from utils.export_cache import artifact_key, get_export_cache, send_artifact
+from utils.fieldsets import parse_fields, FieldsetError
+from utils.bulk_fetch import (parse_ids, body_args, chunked, iter_services, delete_by_ids, delete_dependents,
+                              BulkRequestError)
+from sqlalchemy.orm import selectinload
 
 # 创建蓝图
 service_bp = Blueprint('service', __name__)
@@ -125,8 +136,8 @@ def get_services():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        # 构建查询
-        query = Service.query
+        # 构建查询，服务项目一次批量加载
+        query = Service.query.options(selectinload(Service.service_items))
         
         # 应用筛选条件
         if customer_id:
@@ -146,22 +157,34 @@ def get_services():
             except ValueError:
                 logger.warning(f"无效的结束日期格式: {end_date}")
         
-        # 获取总记录数
-        total = query.count()
-        
-        # 获取分页数据
+        # 游标分页：传入after参数（第一页为空）时按(service_date, service_id)定位，不执行OFFSET和COUNT
+        if 'after' in request.args:
+            services, next_cursor = keyset_page(query, Service.service_date, Service.service_id,
+                                                after=request.args.get('after'), limit=per_page)
+            data = {
+                'items': serialize_many(services, Service),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'limit': per_page
+            }
+            if wants_total(request.args):
+                data['total'] = cached_count(query, ('services', customer_id, start_date, end_date))
+            return jsonify({
+                'success': True,
+                'data': data,
+                'message': '获取服务记录成功'
+            })
+
+        # 获取分页数据，总记录数由paginate一并计算
         services = query.order_by(Service.service_date.desc()).paginate(page=page, per_page=per_page)
         
         # 格式化返回数据
-        result = []
-        for service in services.items:
-            service_dict = service.to_dict()
-            result.append(service_dict)
+        result = serialize_many(services.items, Service)
             
         return jsonify({
             'success': True,
             'data': {
-                'total': total,
+                'total': services.total,
                 'items': result,
                 'page': page,
                 'limit': per_page
@@ -169,6 +192,11 @@ def get_services():
             'message': '获取服务记录成功'
         })
         
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"获取服务记录列表出错: {str(e)}")
         return jsonify({
@@ -229,6 +257,64 @@ def get_service(service_id):
             'message': error_msg
         })
 
+@service_bp.route('/bulk', methods=['POST'])
+def get_services_bulk():
+    """按ID批量获取服务记录
+
+    请求体（ids与customer_ids二选一）:
+        ids: 服务记录ID数组，最多50000个
+        customer_ids: 客户ID数组，返回这些客户的全部服务记录（按服务日期倒序）
+        fields / fields[service_items]: 返回的服务记录和服务项目字段
+
+    每批ID一次查询服务记录、一次查询服务项目，响应流式输出。按ids查询时顺序与ids一致，
+    不存在的ID在missing中返回；按customer_ids查询时没有服务记录的客户ID在missing中返回。
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        if ('ids' in payload) == ('customer_ids' in payload):
+            raise BulkRequestError("ids与customer_ids需要且只能传一个")
+        by_customer = 'customer_ids' in payload
+        keys = parse_ids(payload['customer_ids'] if by_customer else payload['ids'],
+                         'customer_ids' if by_customer else 'ids')
+        args = body_args(payload, ('fields',))
+        fields = parse_fields(args, Service, extra=nested_fields(Service))
+        item_fields = parse_fields(args, ServiceItem, 'service_items')
+    except (BulkRequestError, FieldsetError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    key_column = Service.customer_id if by_customer else Service.service_id
+    order_by = (Service.service_date.desc(),) if by_customer else ()
+
+    def generate():
+        missing = []
+        count = 0
+        error = None
+        # 结果状态写在响应末尾：响应头已发出后出错时，客户端据此判断数据不完整
+        yield '{"data":{"items":['
+        try:
+            for chunk in chunked(keys):
+                groups = {}
+                for key, data in iter_services(key_column, chunk, fields, order_by, item_fields):
+                    groups.setdefault(key, []).append(data)
+                for key in chunk:
+                    if key not in groups:
+                        missing.append(key)
+                        continue
+                    for data in groups[key]:
+                        yield (',' if count else '') + current_app.json.dumps(data)
+                        count += 1
+        except Exception as e:
+            # 响应头已发出，结束数组并在末尾标记数据不完整
+            logger.error(f"批量获取服务记录失败: {str(e)}")
+            error = f"批量获取服务记录失败: {str(e)}"
+        yield '],"missing":' + current_app.json.dumps(missing) + '}'
+        if error:
+            yield ',"truncated":true,"success":false,"message":' + current_app.json.dumps(error) + '}'
+        else:
+            yield ',"success":true,"message":"批量获取服务记录成功"}'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
 @service_bp.route('/create', methods=['POST'])
 def create_service():
     """创建新的服务记录"""
@@ -295,18 +381,17 @@ def create_service():
         
         # 处理服务项目
         service_items_data = data.get('service_items', [])
+        # 未指定项目ID的服务项目按名称批量解析
+        project_ids, unresolved_projects = get_project_catalog().resolve(
+            item.get('project_name') for item in service_items_data if not item.get('project_id')
+        )
         for item_data in service_items_data:
             project_name = item_data.get('project_name')
             if not project_name:
                 continue
             
             # 查找项目ID
-            project_id = item_data.get('project_id')
-            if not project_id and item_data.get('project_name'):
-                # 尝试通过名称查找项目
-                project = Project.query.filter_by(name=item_data.get('project_name')).first()
-                if project:
-                    project_id = project.id
+            project_id = item_data.get('project_id') or project_ids.get(project_name)
                 
             # 创建服务项目记录
             service_item = ServiceItem(
@@ -332,6 +417,7 @@ def create_service():
                 'service_id': service.service_id,
                 'service': service.to_dict()
             },
+            'unresolved_projects': unresolved_projects,
             'message': '创建服务记录成功'
         })
         
@@ -386,23 +472,25 @@ def update_service(service_id):
             service.remark = data.get('remark')
             
         # 处理服务项目更新
+        unresolved_projects = []
         if 'service_items' in data:
             # 删除现有服务项目
             ServiceItem.query.filter_by(service_id=service_id).delete()
             
+            # 未指定项目ID的服务项目按名称批量解析
+            service_items_data = data.get('service_items', [])
+            project_ids, unresolved_projects = get_project_catalog().resolve(
+                item.get('project_name') for item in service_items_data if not item.get('project_id')
+            )
+            
             # 添加新的服务项目
-            for item_data in data.get('service_items', []):
+            for item_data in service_items_data:
                 project_name = item_data.get('project_name')
                 if not project_name:
                     continue
                     
                 # 查找项目ID
-                project_id = item_data.get('project_id')
-                if not project_id and item_data.get('project_name'):
-                    # 尝试通过名称查找项目
-                    project = Project.query.filter_by(name=item_data.get('project_name')).first()
-                    if project:
-                        project_id = project.id
+                project_id = item_data.get('project_id') or project_ids.get(project_name)
                     
                 # 创建服务项目记录
                 service_item = ServiceItem(
@@ -425,6 +513,7 @@ def update_service(service_id):
         return jsonify({
             'success': True,
             'data': service.to_dict(),
+            'unresolved_projects': unresolved_projects,
             'message': '更新服务记录成功'
         })
         
@@ -448,10 +537,8 @@ def delete_service(service_id):
                 'message': f'服务记录 {service_id} 不存在'
             })
             
-        # 删除关联的服务项目
-        ServiceItem.query.filter_by(service_id=service_id).delete()
-        
-        # 删除服务记录
+        # 删除服务记录及其服务项目
+        delete_dependents(Service, [service_id])
         db.session.delete(service)
         db.session.commit()
         
@@ -468,6 +555,42 @@ def delete_service(service_id):
             'message': f'删除服务记录失败: {str(e)}'
         })
 
+@service_bp.route('/bulk-delete', methods=['POST'])
+def delete_services_bulk():
+    """批量删除服务记录
+
+    请求体:
+        ids: 服务记录ID数组，最多50000个
+
+    服务项目一并删除，每500条服务记录两条DELETE语句。
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        ids = parse_ids(payload.get('ids'))
+    except BulkRequestError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        deleted = delete_by_ids(Service, Service.service_id, ids)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"批量删除服务记录出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'批量删除服务记录失败: {str(e)}'
+        }), 500
+
+    deleted_ids = set(deleted)
+    return jsonify({
+        'success': True,
+        'data': {
+            'deleted': len(deleted),
+            'missing': [service_id for service_id in ids if service_id not in deleted_ids]
+        },
+        'message': f'已删除{len(deleted)}条服务记录'
+    })
+
 @service_bp.route('/import-consumption', methods=['POST'])
 def import_consumption_excel():
     """从Excel导入消耗记录"""
@@ -506,30 +629,77 @@ def import_consumption_excel():
         file.save(file_path)
         
         logger.info(f"成功上传文件: {file_path}")
-        
-        # 创建Excel处理器并处理文件
-        processor = ConsumptionExcelProcessor()
-        result = processor.process_file(file_path, import_mode=import_mode)
-        
-        if not result['success']:
-            return jsonify(result)
-            
-        # 处理数据导入
-        records = result['records']
-        stats = result['stats']
-        
+
+        # sync=true时保持原来的同步导入行为，默认提交后台任务立即返回任务ID
+        if request.form.get('sync') == 'true':
+            data = run_job_inline(run_consumption_import, file_path, import_mode)
+            return jsonify({
+                'success': True,
+                'data': data,
+                'message': f"成功导入 {data['success_count']} 条消耗记录，失败 {data['error_count']} 条"
+            })
+
+        job = submit_job('consumption_import', run_consumption_import, file_path, import_mode, filename=filename)
+        return jsonify({
+            'success': True,
+            'data': {
+                'job_id': job.id,
+                'status_url': f"/api/jobs/{job.id}"
+            },
+            'message': '文件已上传，正在后台导入消耗记录'
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"导入消耗记录出错: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({
+            'success': False,
+            'message': f'导入消耗记录失败: {str(e)}'
+        })
+
+def run_consumption_import(reporter, file_path, import_mode):
+    """
+    解析消耗Excel并写入服务记录，作为后台任务执行
+
+    Args:
+        reporter: 任务进度上报器
+        file_path: 已保存的Excel文件路径
+        import_mode: 导入模式(add/update/replace)
+
+    Returns:
+        dict: 处理条数、成功和失败条数及解析统计
+    """
+    reporter.stage('解析Excel')
+    processor = ConsumptionExcelProcessor()
+    result = processor.process_file(file_path, import_mode=import_mode)
+
+    if not result['success']:
+        raise ValueError(result.get('message', '消耗Excel解析失败'))
+
+    # 处理数据导入
+    records = result['records']
+    stats = result['stats']
+
+    reporter.stage('写入数据库')
+    try:
         # 根据导入模式处理数据
         if import_mode == 'replace':
-            # 先清空所有服务记录
+            # 先清空所有服务项目和服务记录
             ServiceItem.query.delete()
             Service.query.delete()
             db.session.commit()
-            
+
+        # 所有服务项目的项目名称一次性解析
+        project_ids, unresolved_projects = get_project_catalog().resolve(
+            item.get('project_name') for record in records for item in record.get('items', [])
+        )
+
         # 添加新记录
         success_count = 0
         error_count = 0
-        
-        for record in records:
+
+        # 每批记录处理完后提交并上报进度
+        for record in commit_batches(reporter, records):
             try:
                 # 检查客户是否存在
                 customer_id = record.get('customer_id')
@@ -604,10 +774,7 @@ def import_consumption_excel():
                         continue
                     
                     # 查找项目ID
-                    project_id = None
-                    project = Project.query.filter_by(name=project_name).first()
-                    if project:
-                        project_id = project.id
+                    project_id = project_ids.get(project_name)
                     
                     # 创建服务项目记录
                     service_item = ServiceItem(
@@ -628,29 +795,29 @@ def import_consumption_excel():
                 
             except Exception as e:
                 logger.error(f"处理记录时出错: {str(e)}\n{traceback.format_exc()}")
+                reporter.error(f"客户 {record.get('customer_id')}: {str(e)}")
                 error_count += 1
-        
-        # 提交事务
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'processed_count': len(records),
-                'success_count': success_count,
-                'error_count': error_count,
-                'stats': stats
-            },
-            'message': f'成功导入 {success_count} 条消耗记录，失败 {error_count} 条'
-        })
-        
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        logger.error(f"导入消耗记录出错: {str(e)}\n{traceback.format_exc()}")
-        return jsonify({
-            'success': False,
-            'message': f'导入消耗记录失败: {str(e)}'
-        })
+        raise
+
+    return {
+        'processed_count': len(records),
+        'success_count': success_count,
+        'error_count': error_count,
+        'stats': stats,
+        'unresolved_projects': unresolved_projects
+    }
+
+# 服务记录报告依赖的表
+REPORT_TABLES = ('customers', 'services', 'service_items')
+
+
+def _write_service_report(customer_id, path):
+    result = generate_service_report(customer_id, path)
+    if not result['success']:
+        raise ValueError(result['message'])
+
 
 @service_bp.route('/report/<customer_id>', methods=['GET'])
 def get_service_report(customer_id):
@@ -659,22 +826,21 @@ def get_service_report(customer_id):
         format_type = request.args.get('format', 'json')
         
         if format_type == 'md':
-            # 生成Markdown报告并下载
-            export_folder = current_app.config['EXPORT_FOLDER']
-            file_name = f"{customer_id}_services_{datetime.now().strftime('%Y%m%d%H%M%S')}.md"
-            export_path = os.path.join(export_folder, file_name)
-            
-            result = generate_service_report(customer_id, export_path)
-            
-            if not result['success']:
-                return jsonify(result)
+            # 生成Markdown报告并下载；客户及服务记录未修改时复用已生成的报告
+            cache = get_export_cache()
+            key = artifact_key('service_report', [customer_id], REPORT_TABLES)
+            artifact = cache.get(key)
+            if artifact is None:
+                if not Customer.query.get(customer_id):
+                    return jsonify({
+                        'success': False,
+                        'message': f'客户 {customer_id} 不存在'
+                    })
+                file_name = f"{customer_id}_services_{datetime.now().strftime('%Y%m%d%H%M%S')}.md"
+                artifact = cache.put(key, 'md', 'text/markdown', file_name,
+                                     lambda path: _write_service_report(customer_id, path))
                 
-            return send_file(
-                export_path,
-                mimetype='text/markdown',
-                as_attachment=True,
-                download_name=file_name
-            )
+            return send_artifact(artifact)
         else:
             # 返回JSON格式的报告内容
             result = generate_service_report(customer_id)
@@ -687,72 +853,191 @@ def get_service_report(customer_id):
             'message': f'生成服务记录报告失败: {str(e)}'
         })
 
+# 客户排行的排序方式
+LEADERBOARD_ORDERS = ('amount', 'count')
+
+# 客户排行top参数上限
+MAX_LEADERBOARD_TOP = 1000
+
+# 流式输出客户排行时每次从数据库读取的行数
+LEADERBOARD_FETCH_SIZE = 1000
+
+
+def parse_leaderboard_args(args):
+    """
+    解析客户排行参数
+
+    Returns:
+        dict: start_date, end_date, store, order, top（未传top时为None，表示不限条数）
+
+    Raises:
+        ValueError: top或order不合法
+    """
+    start_date, end_date = parse_day_range(args)
+    order = args.get('order', 'amount')
+    if order not in LEADERBOARD_ORDERS:
+        raise ValueError(f"order只能是{'/'.join(LEADERBOARD_ORDERS)}")
+    top = args.get('top')
+    if top is not None:
+        try:
+            top = int(top)
+        except ValueError:
+            raise ValueError('top必须是整数')
+        if not 1 <= top <= MAX_LEADERBOARD_TOP:
+            raise ValueError(f"top取值范围为1-{MAX_LEADERBOARD_TOP}")
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'store': args.get('store') or None,
+        'order': order,
+        'top': top,
+    }
+
+
+def customer_leaderboard_query(start_date=None, end_date=None, store=None, order='amount', top=None):
+    """按客户汇总服务次数和金额，关联客户表取姓名，在SQL中完成排序和截取"""
+    service_count = func.count(Service.service_id).label('service_count')
+    total_amount = func.coalesce(func.sum(Service.total_amount), 0).label('total_amount')
+    query = db.session.query(
+        Service.customer_id, Customer.name, service_count, total_amount
+    ).join(Customer, Customer.id == Service.customer_id).group_by(Service.customer_id, Customer.name)
+
+    if start_date:
+        query = query.filter(Service.service_date >= datetime.strptime(start_date, '%Y-%m-%d'))
+    if end_date:
+        query = query.filter(Service.service_date < datetime.strptime(next_day(end_date), '%Y-%m-%d'))
+    if store:
+        query = query.filter(Customer.store == store)
+
+    if order == 'count':
+        query = query.order_by(service_count.desc(), total_amount.desc(), Service.customer_id)
+    else:
+        query = query.order_by(total_amount.desc(), service_count.desc(), Service.customer_id)
+    if top:
+        query = query.limit(top)
+    return query
+
+
+def leaderboard_item(row):
+    customer_id, customer_name, service_count, total_amount = row
+    return {
+        'customer_id': customer_id,
+        'customer_name': customer_name,
+        'service_count': service_count,
+        'total_amount': float(total_amount) if total_amount else 0
+    }
+
+
+@service_bp.route('/stats/customers', methods=['GET'])
+@cached_response('services', 'customers')
+def get_customer_leaderboard():
+    """
+    客户服务排行
+
+    参数: top(条数), order(amount/count), start_date/end_date(含当天), store(门店)
+    传top时返回普通JSON；不传top时返回全部客户，逐行流式输出，不在内存中拼接整个响应。
+    """
+    try:
+        params = parse_leaderboard_args(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    query = customer_leaderboard_query(**params)
+    if params['top']:
+        return jsonify({
+            'success': True,
+            'data': [leaderboard_item(row) for row in query.all()],
+            'message': '获取客户排行成功'
+        })
+
+    def generate():
+        error = None
+        # 结果状态写在响应末尾：响应头已发出后出错时，客户端据此判断数据不完整
+        yield '{"data":['
+        try:
+            for index, row in enumerate(query.yield_per(LEADERBOARD_FETCH_SIZE)):
+                yield (',' if index else '') + current_app.json.dumps(leaderboard_item(row))
+        except Exception as e:
+            # 响应头已发出，结束数组并在末尾标记数据不完整
+            logger.error(f"流式输出客户排行出错: {str(e)}")
+            error = f"获取客户排行失败: {str(e)}"
+        yield ']'
+        if error:
+            yield ',"truncated":true,"success":false,"message":' + current_app.json.dumps(error) + '}'
+        else:
+            yield ',"success":true,"message":"获取客户排行成功"}'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+
 @service_bp.route('/stats', methods=['GET'])
+@cached_response('services', 'service_items', 'customers',
+                 'daily_store_stats', 'daily_project_stats', 'daily_beautician_stats')
 def get_service_stats():
-    """获取服务统计信息"""
+    """
+    获取服务统计信息
+
+    服务总数和项目、美容师、门店分布从按天汇总表求和，start_date/end_date（含当天）
+    只累加范围内的分桶。customer_stats为客户排行，支持top/order/store参数，
+    未传top时返回全部客户，客户较多时建议使用 /stats/customers 流式获取。
+    """
     try:
-        # 获取时间范围
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        
-        # 构建查询
-        query = db.session.query(
-            Service.customer_id,
-            func.count(Service.service_id).label('service_count'),
-            func.sum(Service.total_amount).label('total_amount')
-        ).group_by(Service.customer_id)
+        try:
+            params = parse_leaderboard_args(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        start_date, end_date = params['start_date'], params['end_date']
         
-        # 应用时间筛选
-        if start_date:
-            try:
-                start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
-                query = query.filter(Service.service_date >= start_datetime)
-            except ValueError:
-                logger.warning(f"无效的开始日期格式: {start_date}")
+        # 客户排行，一次关联查询
+        stats = [leaderboard_item(row) for row in customer_leaderboard_query(**params).all()]
                 
-        if end_date:
-            try:
-                end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
-                query = query.filter(Service.service_date <= end_datetime)
-            except ValueError:
-                logger.warning(f"无效的结束日期格式: {end_date}")
+        # 服务记录总数及门店分布
+        store_stats = filter_days(db.session.query(
+            DailyStoreStat.store,
+            func.sum(DailyStoreStat.visit_count),
+            func.sum(DailyStoreStat.service_amount)
+        ), DailyStoreStat, start_date, end_date).group_by(DailyStoreStat.store).all()
         
-        # 执行查询
-        results = query.all()
-        
-        # 格式化结果
-        stats = []
-        for customer_id, service_count, total_amount in results:
-            # 获取客户信息
-            customer = Customer.query.get(customer_id)
-            if customer:
-                stats.append({
-                    'customer_id': customer_id,
-                    'customer_name': customer.name,
-                    'service_count': service_count,
-                    'total_amount': float(total_amount) if total_amount else 0
-                })
-                
-        # 获取服务记录总数
-        total_services = Service.query.count()
+        store_distribution = [
+            {'store': store or '未知', 'service_count': count, 'total_amount': round(amount or 0, 2)}
+            for store, count, amount in store_stats if count
+        ]
+        total_services = sum(item['service_count'] for item in store_distribution)
         
         # 获取项目分布
-        project_stats = db.session.query(
-            ServiceItem.project_name,
-            func.count(ServiceItem.id).label('count')
-        ).group_by(ServiceItem.project_name).order_by(func.count(ServiceItem.id).desc()).limit(10).all()
+        project_count = func.sum(DailyProjectStat.item_count)
+        project_stats = filter_days(db.session.query(
+            DailyProjectStat.project_name, project_count
+        ), DailyProjectStat, start_date, end_date).group_by(DailyProjectStat.project_name).having(
+            project_count > 0
+        ).order_by(project_count.desc()).limit(10).all()
         
         project_distribution = [
             {'project_name': project_name, 'count': count}
             for project_name, count in project_stats
         ]
         
+        # 获取美容师分布
+        beautician_count = func.sum(DailyBeauticianStat.item_count)
+        beautician_stats = filter_days(db.session.query(
+            DailyBeauticianStat.beautician_name, beautician_count, func.sum(DailyBeauticianStat.amount)
+        ), DailyBeauticianStat, start_date, end_date).group_by(DailyBeauticianStat.beautician_name).having(
+            beautician_count > 0
+        ).order_by(beautician_count.desc()).limit(10).all()
+        
+        beautician_distribution = [
+            {'beautician_name': name or '未记录', 'count': count, 'total_amount': round(amount or 0, 2)}
+            for name, count, amount in beautician_stats
+        ]
+        
         return jsonify({
             'success': True,
             'data': {
                 'total_services': total_services,
                 'customer_stats': stats,
-                'project_distribution': project_distribution
+                'project_distribution': project_distribution,
+                'beautician_distribution': beautician_distribution,
+                'store_distribution': store_distribution
             },
             'message': '获取服务统计成功'
         })
@@ -0,0 +1,43 @@
+"""
+增量同步API - 客户端只拉取上次同步之后变化和删除的记录
+"""
+import logging
+from flask import Blueprint, jsonify, request
+
+from utils.sync import (sync_page, parse_tables, InvalidSyncToken, SyncTokenExpired,
+                        DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+sync_bp = Blueprint('sync', __name__)
+
+@sync_bp.route('', methods=['GET'])
+def sync():
+    """
+    获取一页增量数据
+
+    查询参数:
+        since: 上次返回的next_token，为空时从头同步
+        tables: 要同步的表，如 tables=customers,consumptions，默认全部
+        limit: 每页最多返回的记录数，默认500，最大2000
+
+    has_more为true时用next_token立即请求下一页；为false时保存next_token，下次同步时传入。
+    客户端按主键覆盖changes中的记录，删除deleted中的记录。令牌过期时返回410，需清空本地数据后重新同步。
+    """
+    try:
+        tables = parse_tables(request.args.get('tables', ''))
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit取值范围为1-{MAX_PAGE_SIZE}")
+        data = sync_page(request.args.get('since') or None, tables, limit)
+    except SyncTokenExpired as e:
+        return jsonify({'success': False, 'message': str(e)}), 410
+    except (InvalidSyncToken, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"增量同步失败: {str(e)}")
+        return jsonify({'success': False, 'message': f'增量同步失败: {str(e)}'}), 500
+
+    return jsonify({'success': True, 'data': data})
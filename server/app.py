@@ -8,13 +8,26 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from flask import Flask, jsonify
 from flask_cors import CORS
+from sqlalchemy import inspect
+from sqlalchemy.exc import OperationalError
 from datetime import datetime
 
 from models import db
+from utils.db_engine import configure_engine_options, apply_engine_profile
+from utils.response_cache import init_response_cache
+from utils.serializers import init_json_provider
+from utils.compression import init_compression
+from utils.rollups import install_rollup_triggers, rebuild_rollups, ROLLUP_TABLES
+from utils.sync import install_sync_triggers
+from utils.job_runner import recover_stale_jobs
 from api.customer_routes import customer_bp
 from api.excel_routes import excel_bp
 from api.project_routes import project_bp
 from api.service_routes import service_bp
+from api.job_routes import job_bp
+from api.sync_routes import sync_bp
+from api.batch_routes import batch_bp
+from api.reports import report_bp
 
 def create_app(config=None):
     """创建Flask应用实例"""
@@ -29,22 +42,52 @@ def create_app(config=None):
         SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URI', 'sqlite:///beauty_crm.db'),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
         UPLOAD_FOLDER=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'),
-        EXPORT_FOLDER=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports'),
-        MAX_CONTENT_LENGTH=16 * 1024 * 1024  # 最大16MB上传
+        EXPORT_FOLDER=os.environ.get('EXPORT_FOLDER') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports'),
+        EXPORT_CACHE_MAX_BYTES=int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024)),  # 导出文件缓存容量(字节)
+        EXPORT_CACHE_MAX_FILES=int(os.environ.get('EXPORT_CACHE_MAX_FILES', 500)),  # 导出文件缓存最多文件数
+        REPORT_FOLDER=os.environ.get('REPORT_FOLDER') or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'exports', 'reports'),  # 批量客户报告输出目录
+        REPORT_WORKERS=int(os.environ.get('REPORT_WORKERS', 0)) or None,  # 批量报告渲染进程数，默认为CPU核数
+        MAX_CONTENT_LENGTH=16 * 1024 * 1024,  # 最大16MB上传
+        JOB_WORKERS=int(os.environ.get('JOB_WORKERS', 2)),  # 后台导入任务线程数
+        JOB_STALE_SECONDS=int(os.environ.get('JOB_STALE_SECONDS', 300)),  # 超过该秒数没有心跳的未结束任务在启动时标记为失败
+        SQLITE_PROFILE=os.environ.get('SQLITE_PROFILE', 'wal'),  # SQLite引擎配置档(wal/legacy)
+        RESPONSE_CACHE_ENABLED=os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true',  # 读接口响应缓存
+        RESPONSE_CACHE_MAX_BYTES=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),  # 响应缓存容量(字节)
+        JSON_BACKEND=os.environ.get('JSON_BACKEND', 'orjson'),  # JSON编码(orjson/stdlib)，未安装orjson时使用标准库
+        ETAG_ENABLED=os.environ.get('ETAG_ENABLED', 'true').lower() == 'true',  # 读接口ETag/304
+        COMPRESS_ENABLED=os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true',  # gzip/brotli响应压缩
+        COMPRESS_MIN_SIZE=int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # 小于该字节数的响应不压缩
     )
 
     # 应用自定义配置
     if config:
         app.config.update(config)
 
-    # 初始化数据库
+    # 初始化数据库，SQLite连接在建立时按配置档设置PRAGMA
+    configure_engine_options(app)
     db.init_app(app)
+    with app.app_context():
+        apply_engine_profile(app, db.engine)
+
+    # JSON响应使用orjson编码
+    init_json_provider(app)
+
+    # 读接口响应缓存，表数据修改提交后自动失效
+    response_cache = init_response_cache(app)
+
+    # 较大的响应按Accept-Encoding压缩
+    init_compression(app)
 
     # 注册蓝图
     app.register_blueprint(customer_bp, url_prefix='/api/customers')
     app.register_blueprint(excel_bp, url_prefix='/api/excel')
     app.register_blueprint(project_bp, url_prefix='/api/projects')
     app.register_blueprint(service_bp, url_prefix='/api/service')
+    app.register_blueprint(job_bp, url_prefix='/api/jobs')
+    app.register_blueprint(sync_bp, url_prefix='/api/sync')
+    app.register_blueprint(batch_bp, url_prefix='/api/batch')
+    app.register_blueprint(report_bp, url_prefix='/api/reports')
 
     # 创建文件夹
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -59,6 +102,14 @@ def create_app(config=None):
     def server_error(error):
         return jsonify({'error': '服务器内部错误'}), 500
 
+    # 响应缓存命中统计
+    @app.route('/api/cache/stats', methods=['GET'])
+    def cache_stats():
+        return jsonify({
+            'success': True,
+            'data': response_cache.get_stats()
+        })
+
     # 健康检查端点
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -77,6 +128,9 @@ def create_app(config=None):
             # 强制删除并重建数据库表
             db.drop_all()
             db.create_all()
+            with db.engine.begin() as connection:
+                install_rollup_triggers(connection)
+                install_sync_triggers(connection)
             
             # 创建测试数据
             try:
@@ -177,7 +231,20 @@ def create_app(config=None):
                 print(f"测试数据创建失败: {str(e)}")
         else:
             # 确保表存在但不清除数据
+            missing_rollups = [name for name in ROLLUP_TABLES if not inspect(db.engine).has_table(name)]
             db.create_all()
+            # 统计汇总表由触发器维护，首次创建汇总表时从已有明细回填；删除日志同样由触发器写入
+            with db.engine.begin() as connection:
+                install_rollup_triggers(connection)
+                install_sync_triggers(connection)
+                if missing_rollups:
+                    rebuild_rollups(connection)
+            # 上次退出时被中断的后台任务标记为失败
+            try:
+                recover_stale_jobs(app.config['JOB_STALE_SECONDS'])
+            except OperationalError as e:
+                # 其他worker的导入事务持有写锁时跳过，不影响启动，下次启动时再处理
+                app.logger.warning(f"中断任务恢复失败，跳过: {str(e)}")
 
     return app
 
@@ -15,4 +15,4 @@ pip install -r requirements.txt
 python update_db.py
 
 # 启动Gunicorn服务器
-gunicorn -c gunicorn.conf.py app:app
\ No newline at end of file
+GUNICORN_PROFILE=production gunicorn -c gunicorn.conf.py wsgi:app
\ No newline at end of file
@@ -1,34 +1,81 @@
 """
 Gunicorn配置文件 - BeautyCRM服务器配置
+
+按环境变量GUNICORN_PROFILE选择配置档:
+- dev(默认): 开发配置，sync worker、代码修改后热重载、debug日志
+- production: 生产配置
+    - preload_app: 主进程导入应用（pandas/numpy等）后再fork，worker按写时复制共享已导入的模块，
+      不再各自导入一遍；fork前冻结GC，避免worker中的GC扫描把共享的内存页写脏
+    - fork后在post_fork中丢弃继承自主进程的数据库连接池，每个worker重新建立连接
+    - gthread worker: 接口以SQLite读写和网络I/O为主，每个worker多个线程，
+      一个慢请求只占用一个线程而不是整个进程
+- heavy: 导入、导出和批量报告等耗时接口单独的进程池，线程少、超时长，其余与production相同；
+  以第二个gunicorn实例运行（默认端口5001），由前端代理按路径转发，不与普通接口争抢worker:
+
+      # nginx
+      location ~ ^/api/(excel/(import|export)|reports/bulk|service/import-consumption|projects/import|customers/bulk|service/bulk) {
+          proxy_pass http://127.0.0.1:5001;
+          proxy_read_timeout 600s;
+      }
+      location /api/ {
+          proxy_pass http://127.0.0.1:5000;
+      }
+
+worker数、线程数、超时和监听地址可用GUNICORN_WORKERS、GUNICORN_THREADS、GUNICORN_TIMEOUT、
+GUNICORN_BIND覆盖。
 """
+import gc
 import os
 import multiprocessing
 
+PROFILE = os.environ.get('GUNICORN_PROFILE', 'dev')
+if PROFILE not in ('dev', 'production', 'heavy'):
+    raise ValueError(f"未知的GUNICORN_PROFILE: {PROFILE}，可选值: dev, production, heavy")
+
 # 服务器套接字配置
-bind = "0.0.0.0:5000"
+bind = os.environ.get('GUNICORN_BIND', "0.0.0.0:5001" if PROFILE == 'heavy' else "0.0.0.0:5000")
 backlog = 2048
 
 # 工作进程配置
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+if PROFILE == 'dev':
+    workers = multiprocessing.cpu_count() * 2 + 1
+    worker_class = "sync"
+    threads = 1
+    timeout = 120
+elif PROFILE == 'production':
+    # 线程处理I/O等待，进程数与CPU核数相同即可
+    workers = multiprocessing.cpu_count()
+    worker_class = "gthread"
+    threads = 8
+    timeout = 30
+else:
+    workers = 2
+    worker_class = "gthread"
+    threads = 2
+    timeout = 600
+workers = int(os.environ.get('GUNICORN_WORKERS', workers))
+threads = int(os.environ.get('GUNICORN_THREADS', threads))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', timeout))
 worker_connections = 1000
-timeout = 120
-keepalive = 2
+keepalive = 2 if PROFILE == 'dev' else 5
+
+# 生产配置在主进程中预加载应用
+preload_app = PROFILE != 'dev'
 
 # 日志配置
 accesslog = "logs/access.log"
 errorlog = "logs/error.log"
-loglevel = "debug"
-capture_output = True
+loglevel = "debug" if PROFILE == 'dev' else "info"
+capture_output = PROFILE == 'dev'
 enable_stdio_inheritance = True
 access_log_format = '%({x-real-ip}i)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
 
 # 进程名称
-proc_name = "beauty-crm"
+proc_name = "beauty-crm" if PROFILE != 'heavy' else "beauty-crm-heavy"
 
 # 进程管理
 daemon = False  # 暂时关闭守护进程模式
-pidfile = "beauty-crm.pid"
+pidfile = "beauty-crm.pid" if PROFILE != 'heavy' else "beauty-crm-heavy.pid"
 umask = 0
 user = None
 group = None
@@ -45,8 +92,8 @@ limit_request_line = 4096
 limit_request_fields = 100
 limit_request_field_size = 8190
 
-# 热重载
-reload = True
+# 热重载（仅开发配置，与preload_app不兼容）
+reload = PROFILE == 'dev'
 reload_engine = "auto"
 reload_extra_files = [
     "app.py",
@@ -56,5 +103,29 @@ reload_extra_files = [
     "api/excel_routes.py",
     "api/project_routes.py",
     "api/service_routes.py",
+    "api/job_routes.py",
     "utils/excel_processor.py"
-]
\ No newline at end of file
+]
+
+
+def pre_fork(server, worker):
+    """fork前把主进程中已有的对象移出GC跟踪范围，worker中的GC不再访问（写脏）这些共享页"""
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """
+    丢弃从主进程继承的数据库连接池
+
+    预加载时主进程在create_app中已经连接过数据库，fork后父子进程共用同一个连接会互相破坏状态。
+    dispose(close=False)只丢弃连接池而不关闭连接，不影响主进程持有的连接
+    """
+    if not preload_app:
+        return
+    from models import db
+    app = worker.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    server.log.info(f"worker {worker.pid} 已重建数据库连接池")
@@ -0,0 +1,44 @@
+"""Add customer_id/date lookup indexes
+
+Revision ID: 7f4d2c8e1a93
+Revises: 3c1e7a9d2b40
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f4d2c8e1a93'
+down_revision: Union[str, None] = '3c1e7a9d2b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (索引名, 表名, 列) - 客户详情/服务记录/报告生成都按customer_id查询并按日期倒序
+INDEXES = [
+    ('ix_customers_created_at', 'customers', ['created_at']),
+    ('ix_health_records_customer_id', 'health_records', ['customer_id']),
+    ('ix_consumptions_customer_date', 'consumptions', ['customer_id', 'date']),
+    ('ix_services_customer_date', 'services', ['customer_id', 'service_date']),
+    ('ix_services_service_date', 'services', ['service_date']),
+    ('ix_service_items_service_id', 'service_items', ['service_id']),
+    ('ix_communications_customer_date', 'communications', ['customer_id', 'communication_date']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+    # 更新统计信息，让SQLite查询规划器选用新索引
+    op.execute('ANALYZE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,37 @@
+"""Replace single-column list indexes with (sort, id) keyset indexes
+
+Revision ID: a51b93e0c6d7
+Revises: 7f4d2c8e1a93
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a51b93e0c6d7'
+down_revision: Union[str, None] = '7f4d2c8e1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 游标分页按(排序时间, 主键)倒序，复合索引可以同时满足排序和游标定位
+    op.drop_index('ix_customers_created_at', table_name='customers')
+    op.create_index('ix_customers_created_id', 'customers', ['created_at', 'id'], unique=False)
+    op.drop_index('ix_services_service_date', table_name='services')
+    op.create_index('ix_services_date_id', 'services', ['service_date', 'service_id'], unique=False)
+    op.create_index('ix_projects_created_id', 'projects', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_projects_created_id', table_name='projects')
+    op.drop_index('ix_services_date_id', table_name='services')
+    op.create_index('ix_services_service_date', 'services', ['service_date'], unique=False)
+    op.drop_index('ix_customers_created_id', table_name='customers')
+    op.create_index('ix_customers_created_at', 'customers', ['created_at'], unique=False)
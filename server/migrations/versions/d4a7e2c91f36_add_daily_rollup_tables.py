@@ -0,0 +1,60 @@
+"""Add daily rollup tables and their maintenance triggers
+
+Revision ID: d4a7e2c91f36
+Revises: c2e8f41d7b05
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.rollups import install_rollup_triggers, drop_rollup_triggers, rebuild_rollups
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7e2c91f36'
+down_revision: Union[str, None] = 'c2e8f41d7b05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_store_stats',
+    sa.Column('day', sa.String(length=10), nullable=False),
+    sa.Column('store', sa.String(length=64), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('consumption_count', sa.Integer(), nullable=False),
+    sa.Column('visit_count', sa.Integer(), nullable=False),
+    sa.Column('service_amount', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'store')
+    )
+    op.create_table('daily_project_stats',
+    sa.Column('day', sa.String(length=10), nullable=False),
+    sa.Column('project_name', sa.String(length=128), nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'project_name')
+    )
+    op.create_table('daily_beautician_stats',
+    sa.Column('day', sa.String(length=10), nullable=False),
+    sa.Column('beautician_name', sa.String(length=64), nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'beautician_name')
+    )
+
+    # 先建触发器再回填，两者在同一事务内，期间的写入不会遗漏
+    connection = op.get_bind()
+    install_rollup_triggers(connection)
+    rebuild_rollups(connection)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_rollup_triggers(op.get_bind())
+    op.drop_table('daily_beautician_stats')
+    op.drop_table('daily_project_stats')
+    op.drop_table('daily_store_stats')
@@ -0,0 +1,54 @@
+"""Add the sync delete log and (updated_at, id) indexes for delta sync
+
+Revision ID: e6c1b84f2a57
+Revises: d4a7e2c91f36
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.sync import SYNC_TABLES, install_sync_triggers, drop_sync_triggers
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6c1b84f2a57'
+down_revision: Union[str, None] = 'd4a7e2c91f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sync_tombstones',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('row_id', sa.String(length=64), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    op.create_index('ix_sync_tombstones_deleted_at', 'sync_tombstones', ['deleted_at'], unique=False)
+
+    # 增量同步按(updated_at, 主键)顺序读取；没有updated_at的历史数据用created_at补齐，否则首次同步后不会再被读到
+    now = datetime.now()
+    for table, (_, pk) in SYNC_TABLES.items():
+        op.get_bind().execute(
+            sa.text(f"UPDATE {table} SET updated_at = COALESCE(created_at, :now) WHERE updated_at IS NULL"),
+            {'now': now}
+        )
+        op.create_index(f'ix_{table}_updated_id', table, ['updated_at', pk], unique=False)
+
+    install_sync_triggers(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_sync_triggers(op.get_bind())
+    for table in reversed(SYNC_TABLES):
+        op.drop_index(f'ix_{table}_updated_id', table_name=table)
+    op.drop_index('ix_sync_tombstones_deleted_at', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
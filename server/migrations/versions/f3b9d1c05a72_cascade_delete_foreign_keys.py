@@ -0,0 +1,81 @@
+"""Recreate child foreign keys with ON DELETE CASCADE
+
+Revision ID: f3b9d1c05a72
+Revises: e6c1b84f2a57
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.rollups import install_rollup_triggers, drop_rollup_triggers
+from utils.sync import install_sync_triggers, drop_sync_triggers
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d1c05a72'
+down_revision: Union[str, None] = 'e6c1b84f2a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# SQLite不能修改外键，需要重建表；原外键未命名，按命名约定在重建时识别
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+# (表, 外键列, 被引用表, 被引用列)；服务记录先于服务项目重建
+FOREIGN_KEYS = [
+    ('health_records', 'customer_id', 'customers', 'id'),
+    ('consumptions', 'customer_id', 'customers', 'id'),
+    ('services', 'customer_id', 'customers', 'id'),
+    ('service_items', 'service_id', 'services', 'service_id'),
+    ('communications', 'customer_id', 'customers', 'id'),
+]
+
+
+def _fk_name(table, column, referred_table):
+    return NAMING_CONVENTION['fk'] % {
+        'table_name': table, 'column_0_name': column, 'referred_table_name': referred_table,
+    }
+
+
+def _disable_foreign_keys(bind):
+    # 迁移连接不经过应用的PRAGMA设置，外键约束默认关闭；这里再显式关闭一次（须在事务中第一条写语句之前），
+    # 重建表时DROP TABLE不能触发外键检查或级联删除
+    bind.exec_driver_sql('PRAGMA foreign_keys=OFF')
+
+
+def _recreate_foreign_keys(ondelete):
+    bind = op.get_bind()
+    # 触发器引用被重建的表，重命名临时表时会校验触发器，先删除后重建
+    drop_rollup_triggers(bind)
+    drop_sync_triggers(bind)
+
+    for table, column, referred_table, referred_column in FOREIGN_KEYS:
+        name = _fk_name(table, column, referred_table)
+        with op.batch_alter_table(table, recreate='always', naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred_table, [column], [referred_column], ondelete=ondelete)
+
+    install_rollup_triggers(bind)
+    install_sync_triggers(bind)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 外键开启后孤立的关联记录会使约束检查失败，且在接口中已无法访问，按依赖顺序清理
+    bind = op.get_bind()
+    _disable_foreign_keys(bind)
+    for table, column, referred_table, referred_column in FOREIGN_KEYS:
+        bind.execute(sa.text(
+            f"DELETE FROM {table} WHERE {column} NOT IN (SELECT {referred_column} FROM {referred_table})"
+        ))
+    _recreate_foreign_keys('CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _disable_foreign_keys(op.get_bind())
+    _recreate_foreign_keys(None)
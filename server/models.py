@@ -2,6 +2,7 @@
 数据库模型定义 - 美容客户管理系统
 """
 
+import json
 import uuid
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
@@ -21,6 +22,10 @@ def generate_service_id():
     """生成服务记录ID"""
     return f"S{uuid.uuid4().hex[:10].upper()}"
 
+def generate_job_id():
+    """生成后台任务ID"""
+    return f"J{uuid.uuid4().hex[:16].upper()}"
+
 class Customer(db.Model):
     """客户基础信息表"""
     __tablename__ = 'customers'
@@ -60,12 +65,19 @@ class Customer(db.Model):
     # 记录时间戳
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    # 客户列表按(created_at, id)排序及游标分页
+    __table_args__ = (
+        db.Index('ix_customers_created_id', 'created_at', 'id'),
+        db.Index('ix_customers_updated_id', 'updated_at', 'id'),  # 增量同步
+    )
     
-    # 关联
-    health_records = db.relationship('HealthRecord', backref='customer', lazy=True)
-    consumption_records = db.relationship('Consumption', backref='customer', lazy=True)
-    service_records = db.relationship('Service', backref='customer', lazy=True)
-    communication_records = db.relationship('Communication', backref='customer', lazy=True)
+    # 关联；删除客户时关联记录由接口每张表一条DELETE显式删除（见utils.bulk_fetch.delete_dependents），
+    # ORM不逐条加载；执行过迁移的库外键另有ON DELETE CASCADE，仅作兜底
+    health_records = db.relationship('HealthRecord', backref='customer', lazy=True, cascade='all', passive_deletes=True)
+    consumption_records = db.relationship('Consumption', backref='customer', lazy=True, cascade='all', passive_deletes=True)
+    service_records = db.relationship('Service', backref='customer', lazy=True, cascade='all', passive_deletes=True)
+    communication_records = db.relationship('Communication', backref='customer', lazy=True, cascade='all', passive_deletes=True)
     
     def to_dict(self):
         return {
@@ -101,7 +113,7 @@ class HealthRecord(db.Model):
     __tablename__ = 'health_records'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    customer_id = db.Column(db.String(32), db.ForeignKey('customers.id'), nullable=False)
+    customer_id = db.Column(db.String(32), db.ForeignKey('customers.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # 皮肤类型与特点 - 根据模拟-客户信息档案.xlsx中的"健康档案"表格
     skin_type = db.Column(db.String(32), nullable=True)  # 肤质类型
@@ -141,6 +153,10 @@ class HealthRecord(db.Model):
     # 记录时间戳
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_health_records_updated_id', 'updated_at', 'id'),  # 增量同步
+    )
     
     def to_dict(self):
         return {
@@ -179,7 +195,7 @@ class Consumption(db.Model):
     __tablename__ = 'consumptions'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    customer_id = db.Column(db.String(32), db.ForeignKey('customers.id'), nullable=False)
+    customer_id = db.Column(db.String(32), db.ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
     
     date = db.Column(db.DateTime, nullable=False)  # 消费时间
     project_name = db.Column(db.String(128), nullable=True)  # 项目名称
@@ -196,6 +212,8 @@ class Consumption(db.Model):
     # 添加唯一性约束，防止重复记录
     __table_args__ = (
         db.UniqueConstraint('customer_id', 'date', 'project_name', 'amount', name='uix_consumption_record'),
+        db.Index('ix_consumptions_customer_date', 'customer_id', 'date'),
+        db.Index('ix_consumptions_updated_id', 'updated_at', 'id'),  # 增量同步
     )
     
     def to_dict(self):
@@ -219,7 +237,7 @@ class Service(db.Model):
     __tablename__ = 'services'
     
     service_id = db.Column(db.String(50), primary_key=True, default=generate_service_id)
-    customer_id = db.Column(db.String(32), db.ForeignKey('customers.id'), nullable=False)
+    customer_id = db.Column(db.String(32), db.ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
     customer_name = db.Column(db.String(64), nullable=True)  # 冗余客户姓名
     
     service_date = db.Column(db.DateTime, nullable=False, default=datetime.now)  # 服务日期（到店时间）
@@ -232,7 +250,8 @@ class Service(db.Model):
     satisfaction = db.Column(db.String(32), nullable=True)  # 服务满意度
     
     # 关联服务项目
-    service_items = db.relationship('ServiceItem', backref='service', lazy=True, cascade="all, delete-orphan")
+    service_items = db.relationship('ServiceItem', backref='service', lazy=True, cascade="all, delete-orphan",
+                                    passive_deletes=True)
     
     # 记录时间戳
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -241,6 +260,9 @@ class Service(db.Model):
     # 添加更完善的唯一性约束，防止重复记录
     __table_args__ = (
         db.UniqueConstraint('customer_id', 'service_date', 'operator', 'total_amount', name='uix_service_record'),
+        db.Index('ix_services_customer_date', 'customer_id', 'service_date'),
+        db.Index('ix_services_date_id', 'service_date', 'service_id'),
+        db.Index('ix_services_updated_id', 'updated_at', 'service_id'),  # 增量同步
     )
     
     def to_dict(self):
@@ -267,7 +289,7 @@ class ServiceItem(db.Model):
     __tablename__ = 'service_items'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    service_id = db.Column(db.String(50), db.ForeignKey('services.service_id'), nullable=False)
+    service_id = db.Column(db.String(50), db.ForeignKey('services.service_id', ondelete='CASCADE'), nullable=False, index=True)
     
     project_id = db.Column(db.String(50), nullable=True)  # 项目ID，可为空（历史数据或自定义项目）
     project_name = db.Column(db.String(128), nullable=False)  # 项目名称
@@ -282,6 +304,10 @@ class ServiceItem(db.Model):
     # 记录时间戳
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_service_items_updated_id', 'updated_at', 'id'),  # 增量同步
+    )
     
     def to_dict(self):
         return {
@@ -306,7 +332,7 @@ class Communication(db.Model):
     __tablename__ = 'communications'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    customer_id = db.Column(db.String(32), db.ForeignKey('customers.id'), nullable=False)
+    customer_id = db.Column(db.String(32), db.ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
     
     communication_date = db.Column(db.DateTime, nullable=False)  # 沟通时间
     communication_type = db.Column(db.String(32), nullable=True)  # 沟通方式
@@ -323,6 +349,8 @@ class Communication(db.Model):
     # 添加唯一性约束，防止重复记录
     __table_args__ = (
         db.UniqueConstraint('customer_id', 'communication_date', 'communication_content', name='uix_communication_record'),
+        db.Index('ix_communications_customer_date', 'customer_id', 'communication_date'),
+        db.Index('ix_communications_updated_id', 'updated_at', 'id'),  # 增量同步
     )
     
     def to_dict(self):
@@ -360,6 +388,12 @@ class Project(db.Model):
     # 记录时间戳
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    # 项目列表按(created_at, id)排序及游标分页
+    __table_args__ = (
+        db.Index('ix_projects_created_id', 'created_at', 'id'),
+        db.Index('ix_projects_updated_id', 'updated_at', 'id'),  # 增量同步
+    )
     
     def to_dict(self):
         return {
@@ -376,4 +410,109 @@ class Project(db.Model):
             'status': self.status,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+class Job(db.Model):
+    """后台任务表 - 记录Excel导入等耗时任务的执行进度"""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(32), primary_key=True, default=generate_job_id)
+    job_type = db.Column(db.String(32), nullable=False)  # 任务类型(excel_import/consumption_import/project_import)
+    status = db.Column(db.String(16), nullable=False, default='pending')  # 状态(pending/running/succeeded/failed)
+    stage = db.Column(db.String(64), nullable=True)  # 当前阶段
+    filename = db.Column(db.String(256), nullable=True)  # 导入的文件名
+    rows_processed = db.Column(db.Integer, default=0)  # 已处理行数
+    result = db.Column(db.Text, nullable=True)  # 执行结果(JSON)
+    errors = db.Column(db.Text, nullable=True)  # 错误信息(JSON数组)
+
+    started_at = db.Column(db.DateTime, nullable=True)  # 开始执行时间
+    finished_at = db.Column(db.DateTime, nullable=True)  # 结束时间
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_jobs_status_created', 'status', 'created_at'),
+    )
+
+    def to_dict(self):
+        # 吞吐量按已处理行数除以已执行时长计算
+        elapsed = None
+        throughput = None
+        if self.started_at:
+            end = self.finished_at or datetime.now()
+            elapsed = round((end - self.started_at).total_seconds(), 3)
+            if elapsed > 0 and self.rows_processed:
+                throughput = round(self.rows_processed / elapsed, 1)
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'stage': self.stage,
+            'filename': self.filename,
+            'rows_processed': self.rows_processed or 0,
+            'elapsed_seconds': elapsed,
+            'rows_per_second': throughput,
+            'result': json.loads(self.result) if self.result else None,
+            'errors': json.loads(self.errors) if self.errors else [],
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
+        }
+
+
+class CacheGeneration(db.Model):
+    """缓存代数表 - 每张业务表一行，表数据提交修改时代数加1，各worker据此判断本地缓存是否过期"""
+    __tablename__ = 'cache_generations'
+
+    table_name = db.Column(db.String(64), primary_key=True)  # 业务表名
+    generation = db.Column(db.Integer, nullable=False, default=0)  # 修改代数
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class DailyStoreStat(db.Model):
+    """门店日汇总 - 按(日期, 门店)累计消费金额和到店服务，由rollup触发器增量维护"""
+    __tablename__ = 'daily_store_stats'
+
+    day = db.Column(db.String(10), primary_key=True)  # 日期(YYYY-MM-DD)
+    store = db.Column(db.String(64), primary_key=True)  # 客户所属门店，未填写为空字符串
+    revenue = db.Column(db.Float, nullable=False, default=0)  # 消费金额合计
+    consumption_count = db.Column(db.Integer, nullable=False, default=0)  # 消费笔数
+    visit_count = db.Column(db.Integer, nullable=False, default=0)  # 到店服务次数
+    service_amount = db.Column(db.Float, nullable=False, default=0)  # 服务总金额合计
+
+
+class DailyProjectStat(db.Model):
+    """项目日汇总 - 按(日期, 项目名称)累计服务项目数量和金额"""
+    __tablename__ = 'daily_project_stats'
+
+    day = db.Column(db.String(10), primary_key=True)  # 服务日期(YYYY-MM-DD)
+    project_name = db.Column(db.String(128), primary_key=True)  # 项目名称
+    item_count = db.Column(db.Integer, nullable=False, default=0)  # 服务项目条数
+    amount = db.Column(db.Float, nullable=False, default=0)  # 单价×数量合计
+
+
+class DailyBeauticianStat(db.Model):
+    """美容师日汇总 - 按(日期, 美容师)累计服务项目数量和金额"""
+    __tablename__ = 'daily_beautician_stats'
+
+    day = db.Column(db.String(10), primary_key=True)  # 服务日期(YYYY-MM-DD)
+    beautician_name = db.Column(db.String(64), primary_key=True)  # 操作美容师，未填写为空字符串
+    item_count = db.Column(db.Integer, nullable=False, default=0)  # 服务项目条数
+    amount = db.Column(db.Float, nullable=False, default=0)  # 单价×数量合计
+
+
+class SyncTombstone(db.Model):
+    """删除日志 - 业务表删除行时由触发器写入，增量同步据此通知客户端删除本地数据"""
+    __tablename__ = 'sync_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)  # 自增id，按提交顺序递增
+    table_name = db.Column(db.String(64), nullable=False)  # 业务表名
+    row_id = db.Column(db.String(64), nullable=False)  # 被删除行的主键
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.now)  # 删除时间
+
+    # AUTOINCREMENT保证id不会复用，清理旧记录后仍能判断令牌是否过期
+    __table_args__ = (
+        db.Index('ix_sync_tombstones_deleted_at', 'deleted_at'),
+        {'sqlite_autoincrement': True},
+    )
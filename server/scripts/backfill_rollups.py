@@ -0,0 +1,51 @@
+"""
+回填统计汇总表
+
+用法:
+    python scripts/backfill_rollups.py [起始日期] [结束日期]
+
+从consumptions/services/service_items明细重建daily_store_stats、daily_project_stats、
+daily_beautician_stats。日期格式为YYYY-MM-DD，两端都包含；不传日期时重建全部数据。
+重建在一个写事务内完成，同时确保汇总表触发器已创建。
+"""
+
+import os
+import sys
+import time
+import logging
+
+# 添加父目录到路径，以便导入models等模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+from utils.rollups import install_rollup_triggers, rebuild_rollups, parse_day
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    start = parse_day(sys.argv[1]) if len(sys.argv) > 1 else None
+    end = parse_day(sys.argv[2]) if len(sys.argv) > 2 else None
+    if (len(sys.argv) > 1 and start is None) or (len(sys.argv) > 2 and end is None):
+        logger.error("日期格式应为YYYY-MM-DD")
+        sys.exit(1)
+
+    app = create_app()
+    with app.app_context():
+        begin = time.perf_counter()
+        with db.engine.begin() as connection:
+            install_rollup_triggers(connection)
+            counts = rebuild_rollups(connection, start, end)
+        logger.info(f"汇总表回填完成({start or '最早'} ~ {end or '最新'})，耗时{time.perf_counter() - begin:.2f}s")
+        for table, count in counts.items():
+            logger.info(f"- {table}: {count}个分桶")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Excel处理器性能基准
+
+用法:
+    python scripts/bench_excel_processor.py [行数]
+
+1. 客户表: 生成合成的客户基础信息Sheet页（默认5万行），分别用原逐行iterrows实现
+   和当前按列实现处理，输出每秒处理行数。
+2. 消耗表: 生成2倍行数、每行5个项目组的合成消耗Sheet页，输出按列解析的耗时。
+"""
+
+import os
+import sys
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+# 添加父目录到路径，以便导入utils等模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.excel_processor import ExcelProcessor
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def build_customer_sheet(rows):
+    """生成合成客户表"""
+    rng = np.random.default_rng(42)
+    processor = ExcelProcessor()
+    data = {}
+    for excel_field in processor.customer_fields:
+        if excel_field == '客户ID':
+            data[excel_field] = [f"C{i:06d}" for i in range(rows)]
+        elif excel_field == '年龄':
+            ages = rng.integers(18, 70, rows).astype(float)
+            ages[rng.random(rows) < 0.05] = np.nan
+            data[excel_field] = ages
+        else:
+            values = np.array([f" 值{i % 97} " for i in range(rows)], dtype=object)
+            values[rng.random(rows) < 0.1] = None
+            data[excel_field] = values
+    return pd.DataFrame(data)
+
+
+def build_service_sheet(rows, groups=5):
+    """生成合成消耗表，每行包含groups个(项目内容, 操作美容师, 耗卡金额, 是否指定)项目组"""
+    rng = np.random.default_rng(7)
+    arrival = pd.Timestamp('2023-01-01 09:00') + pd.to_timedelta(rng.integers(0, 500 * 24 * 60, rows), unit='m')
+    data = {
+        '客户ID': [f"C{i % 20000:06d}" for i in range(rows)],
+        '姓名': [f"客户{i % 20000}" for i in range(rows)],
+        '到店时间': arrival.strftime('%Y/%m/%d %H:%M'),
+        '离店时间': (arrival + pd.Timedelta(hours=2)).strftime('%Y/%m/%d %H:%M'),
+        '总消耗项目数': rng.integers(1, groups + 1, rows),
+        '总耗卡金额': rng.integers(100, 3000, rows).astype(float),
+        '服务满意度': ['4.8/5'] * rows,
+    }
+    frame = pd.DataFrame(data)
+    for group in range(groups):
+        filled = rng.random(rows) < 0.6
+        suffix = f".{group}" if group else ''
+        frame[f"项目内容{suffix}"] = np.where(filled, f"项目{group}", None)
+        frame[f"操作美容师{suffix}"] = np.where(filled, f"美容师{group}", None)
+        frame[f"耗卡金额{suffix}"] = np.where(filled, 200.0, np.nan)
+        frame[f"是否指定{suffix}"] = np.where(filled & (rng.random(rows) < 0.5), '✓', None)
+    return frame
+
+
+def legacy_process_customers(processor, df):
+    """原逐行实现：每行对每个字段扫描全部列"""
+    customers = []
+    for i, row in df.iterrows():
+        customer = {}
+        customer_id = row.get('客户ID')
+        if customer_id is None or pd.isna(customer_id) or (isinstance(customer_id, str) and customer_id.strip() in ['客户ID', 'ID', '']):
+            continue
+        for excel_field, db_field in processor.customer_fields.items():
+            for col in df.columns:
+                if excel_field in str(col):
+                    value = row.get(col)
+                    if value is None or pd.isna(value):
+                        customer[db_field] = None
+                        continue
+                    if db_field == 'age':
+                        try:
+                            customer[db_field] = int(value)
+                        except (ValueError, TypeError):
+                            customer[db_field] = None
+                    else:
+                        customer[db_field] = str(value).strip()
+                    break
+        customers.append(customer)
+    return customers
+
+
+def timed(label, rows, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.3f}s  {rows / elapsed:12,.0f} 行/秒")
+    return result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    df = build_customer_sheet(rows)
+    processor = ExcelProcessor()
+    print(f"合成客户表: {rows}行 x {df.shape[1]}列")
+
+    before = timed('逐行', rows, lambda: legacy_process_customers(processor, df))
+    after = timed('按列', rows, lambda: processor._process_customers(df))
+
+    assert len(before) == len(after), "两种实现输出的记录数不一致"
+    assert before[:100] == after[:100], "两种实现输出的记录内容不一致"
+
+    visits = rows * 2
+    service_df = build_service_sheet(visits)
+    print(f"合成消耗表: {visits}行 x {service_df.shape[1]}列")
+    services = timed('消耗按列', visits, lambda: processor._process_services(service_df))
+    print(f"解析出服务记录{len(services)}条, 服务项目{sum(len(s['service_items']) for s in services)}个")
+
+
+if __name__ == '__main__':
+    main()
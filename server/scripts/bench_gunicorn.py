@@ -0,0 +1,219 @@
+"""
+Gunicorn配置档负载测试
+
+用法:
+    python scripts/bench_gunicorn.py [并发数] [持续秒数] [客户数]
+
+在临时SQLite数据库中生成客户数据（同bench_http.py），依次用dev（原配置）和production配置档
+启动gunicorn，用并发线程持续请求客户列表、客户详情、服务记录列表和客户报告，
+同时用一个线程反复同步导出随机的300个客户（每次都不命中导出缓存），模拟耗时接口占用worker。
+每个配置档输出：
+- 启动耗时: 从启动到第一个请求成功
+- 吞吐量(请求/秒)、p50/p99延迟和错误数（不含导出请求）
+- 主进程和全部worker的RSS合计，以及PSS合计（按共享进程数分摊共享内存页，
+  预加载后写时复制共享的内存在RSS中会被重复计算）
+worker数、线程数可以用GUNICORN_WORKERS、GUNICORN_THREADS环境变量统一覆盖。
+"""
+
+import os
+import sys
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import http.client
+
+# 添加父目录到路径，以便导入models和utils
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVER_DIR)
+
+from app import create_app
+from models import db
+from bench_http import seed
+
+PROFILES = ['dev', 'production']
+
+HOST = '127.0.0.1'
+PORT = 5099
+
+# 同步导出请求包含的客户数
+EXPORT_CUSTOMERS = 300
+
+# 等待服务启动的最长时间(秒)
+STARTUP_TIMEOUT = 120
+
+
+def light_request(rng, customers):
+    """随机选择一个普通接口"""
+    customer_id = f"C{rng.randrange(customers):06d}"
+    return rng.choice([
+        ('GET', f"/api/customers/?page={rng.randint(1, 20)}&per_page=50", None),
+        ('GET', f"/api/customers/{customer_id}", None),
+        ('GET', f"/api/service/list?customer_id={customer_id}", None),
+        ('GET', f"/api/reports/generate/{customer_id}", None),
+    ])
+
+
+def send(connection, method, path, body=None):
+    """发送请求并读完响应；服务端关闭了空闲的keep-alive连接时重新连接重试一次"""
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    for attempt in range(2):
+        try:
+            connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (ConnectionError, http.client.RemoteDisconnected, http.client.BadStatusLine):
+            connection.close()
+            if attempt:
+                raise
+
+
+def wait_ready(process):
+    begin = time.perf_counter()
+    while time.perf_counter() - begin < STARTUP_TIMEOUT:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn启动失败，退出码 {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(HOST, PORT, timeout=5)
+            if send(connection, 'GET', '/api/customers/?per_page=1') == 200:
+                return time.perf_counter() - begin
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError('gunicorn启动超时')
+
+
+def process_tree(pid):
+    """主进程及其全部子进程的PID"""
+    children = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(name))
+    pids = [pid]
+    for current in pids:
+        pids.extend(children.get(current, []))
+    return pids
+
+
+def memory_kb(pids):
+    """返回(RSS合计, PSS合计)，单位KB"""
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith('Rss:'):
+                        rss += int(line.split()[1])
+                    elif line.startswith('Pss:'):
+                        pss += int(line.split()[1])
+        except OSError:
+            continue
+    return rss, pss
+
+
+def run_load(customers, concurrency, duration):
+    latencies = []
+    errors = [0]
+    exports = []
+    stop = time.perf_counter() + duration
+    lock = threading.Lock()
+
+    def client(index):
+        rng = random.Random(index)
+        connection = http.client.HTTPConnection(HOST, PORT, timeout=120)
+        local = []
+        while time.perf_counter() < stop:
+            method, path, body = light_request(rng, customers)
+            begin = time.perf_counter()
+            try:
+                status = send(connection, method, path, body)
+            except (OSError, http.client.HTTPException):
+                status = None
+                connection = http.client.HTTPConnection(HOST, PORT, timeout=120)
+            local.append(time.perf_counter() - begin)
+            if status != 200:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    def exporter():
+        rng = random.Random(-1)
+        connection = http.client.HTTPConnection(HOST, PORT, timeout=600)
+        while time.perf_counter() < stop:
+            ids = [f"C{i:06d}" for i in rng.sample(range(customers), EXPORT_CUSTOMERS)]
+            begin = time.perf_counter()
+            try:
+                send(connection, 'POST', '/api/excel/export', {'customer_ids': ids, 'sync': True})
+            except (OSError, http.client.HTTPException):
+                continue
+            exports.append(time.perf_counter() - begin)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    threads.append(threading.Thread(target=exporter))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], exports
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def bench_profile(profile, database_uri, export_folder, customers, concurrency, duration):
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, GUNICORN_PROFILE=profile, DATABASE_URI=database_uri, EXPORT_FOLDER=export_folder)
+    process = subprocess.Popen(
+        ['gunicorn', '-c', 'gunicorn.conf.py', '--bind', f"{HOST}:{PORT}",
+         '--access-logfile', '/dev/null', '--error-logfile', os.path.join(workdir, 'error.log'),
+         '--pid', os.path.join(workdir, 'gunicorn.pid'), 'wsgi:app'],
+        cwd=SERVER_DIR, env=env,
+    )
+    try:
+        startup = wait_ready(process)
+        latencies, errors, exports = run_load(customers, concurrency, duration)
+        pids = process_tree(process.pid)
+        rss, pss = memory_kb(pids)
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"{profile}: 启动 {startup:.1f}s, 进程 {len(pids)}个")
+    print(f"  吞吐量 {len(latencies) / duration:8.1f} 请求/秒  错误 {errors}")
+    print(f"  p50 {statistics.median(latencies) * 1000:8.1f}ms  p99 {percentile(latencies, 0.99) * 1000:8.1f}ms")
+    print(f"  导出 {len(exports)}次, 中位数 {statistics.median(exports) * 1000 if exports else 0:.0f}ms")
+    print(f"  RSS合计 {rss / 1024:8.1f}MB  PSS合计 {pss / 1024:8.1f}MB")
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    duration = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    customers = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+
+    workdir = tempfile.mkdtemp()
+    database_uri = f"sqlite:///{os.path.join(workdir, 'bench_gunicorn.db')}"
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_uri})
+    with app.app_context():
+        seed(customers)
+        db.engine.dispose()
+    print(f"{customers}个客户, 并发{concurrency}, 每个配置档{duration}秒, CPU {os.cpu_count()}核")
+
+    for profile in PROFILES:
+        bench_profile(profile, database_uri, os.path.join(workdir, 'exports'), customers, concurrency, duration)
+
+
+if __name__ == '__main__':
+    main()
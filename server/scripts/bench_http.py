@@ -0,0 +1,114 @@
+"""
+响应压缩与条件请求基准
+
+用法:
+    python scripts/bench_http.py [客户数]
+
+在临时SQLite数据库中生成客户（每个客户3条服务记录、每条2个服务项目、2条沟通记录），
+用测试客户端请求客户列表和客户详情，统计每次请求传输的字节数和服务端CPU时间
+（process_time，毫秒，取中位数）：
+- 冷请求: 每次请求前清空响应缓存
+- 缓存命中: 响应体和压缩结果都来自缓存
+- 304: 带上次的ETag重新验证，数据未变化
+"""
+
+import os
+import random
+import sys
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 添加父目录到路径，以便导入models和utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+from utils.compression import supported_encodings
+
+REPEAT = 15
+
+ENDPOINTS = [
+    ('客户列表(500条)', '/api/customers/?per_page=500'),
+    ('客户详情(全部关联)', '/api/customers/C000001'),
+]
+
+HOBBIES = ['瑜伽', '阅读', '旅行', '烘焙', '游泳', '插花', '摄影', '跑步', '茶艺', '追剧']
+CITIES = ['浙江杭州', '江苏苏州', '上海浦东', '安徽合肥', '四川成都', '湖南长沙', '广东深圳', '福建厦门']
+
+
+def seed(customers):
+    rng = random.Random(42)
+    start = datetime(2023, 1, 1, 9, 30)
+    table = db.metadata.tables
+    db.session.execute(table['customers'].insert(), [
+        {'id': f"C{i:06d}", 'name': f"客户{i}", 'gender': '女', 'age': 20 + i % 40, 'store': f"门店{i % 5}",
+         'hometown': rng.choice(CITIES), 'residence': rng.choice(CITIES), 'residence_years': rng.randint(1, 30),
+         'hobbies': '、'.join(rng.sample(HOBBIES, 3)),
+         'created_at': start + timedelta(minutes=rng.randint(0, 10 ** 6)),
+         'updated_at': start + timedelta(seconds=rng.randint(0, 10 ** 7))}
+        for i in range(customers)
+    ])
+    services = [
+        {'service_id': f"S{i:08d}", 'customer_id': f"C{i % customers:06d}", 'customer_name': f"客户{i % customers}",
+         'service_date': start + timedelta(minutes=rng.randint(0, 10 ** 6)),
+         'total_amount': float(rng.randrange(100, 5000)), 'payment_method': '消费卡',
+         'operator': '前台', 'created_at': start, 'updated_at': start}
+        for i in range(customers * 3)
+    ]
+    db.session.execute(table['services'].insert(), services)
+    db.session.execute(table['service_items'].insert(), [
+        {'service_id': row['service_id'], 'project_name': f"项目{j}", 'beautician_name': '李婷',
+         'unit_price': float(rng.randrange(100, 3000)), 'quantity': 1, 'created_at': start, 'updated_at': start}
+        for row in services for j in range(2)
+    ])
+    db.session.execute(table['communications'].insert(), [
+        {'customer_id': f"C{i % customers:06d}", 'communication_date': start + timedelta(days=i),
+         'communication_type': '电话', 'staff_name': '王小明',
+         'communication_content': '询问客户近期护肤情况，客户反馈皮肤状态良好，预约下周到店',
+         'created_at': start, 'updated_at': start}
+        for i in range(customers * 2)
+    ])
+    db.session.commit()
+
+
+def measure(app, client, url, headers, clear_cache):
+    cache = app.extensions['response_cache']
+    timings = []
+    size = 0
+    for _ in range(REPEAT):
+        if clear_cache:
+            cache.clear()
+        begin = time.process_time()
+        response = client.get(url, headers=headers)
+        timings.append((time.process_time() - begin) * 1000)
+        size = len(response.data)
+    return statistics.median(timings), size, response
+
+
+def main():
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    path = os.path.join(tempfile.mkdtemp(), 'bench_http.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}"})
+    client = app.test_client()
+
+    with app.app_context():
+        seed(customers)
+    print(f"{customers}个客户, 编码: {', '.join(supported_encodings())}")
+
+    for title, url in ENDPOINTS:
+        print(title)
+        for encoding in ('identity',) + supported_encodings():
+            headers = {'Accept-Encoding': encoding}
+            cold, size, response = measure(app, client, url, headers, clear_cache=True)
+            warm, _, _ = measure(app, client, url, headers, clear_cache=False)
+            revalidate, not_modified_size, not_modified = measure(
+                app, client, url, dict(headers, **{'If-None-Match': response.headers['ETag']}), clear_cache=False)
+            assert not_modified.status_code == 304
+            print(f"  {encoding:<9} {size:>10,}B  冷请求 {cold:7.2f}ms  缓存命中 {warm:6.2f}ms  "
+                  f"304 {revalidate:5.2f}ms/{not_modified_size}B")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+查询索引性能基准
+
+用法:
+    python scripts/bench_indexes.py [服务记录数] [数据库文件]
+
+在临时SQLite数据库中按models.py建表并批量生成数据（默认100万条服务记录），
+先删除customer_id/日期相关索引，记录各接口查询的 EXPLAIN QUERY PLAN 和耗时，
+再创建索引并 ANALYZE 后重复测量，输出前后对比。
+
+注意: db.create_all 建出的库带有唯一约束自动索引（如uix_service_record以
+customer_id, service_date开头），按客户查询服务记录在加索引前也可能已走该索引；
+通过Alembic迁移建出的库没有这些唯一约束。
+"""
+
+import os
+import sys
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+# 添加父目录到路径，以便导入models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db
+
+# 迁移新增的查询索引
+NEW_INDEXES = [
+    'ix_customers_created_id',
+    'ix_health_records_customer_id',
+    'ix_consumptions_customer_date',
+    'ix_services_customer_date',
+    'ix_services_date_id',
+    'ix_service_items_service_id',
+    'ix_communications_customer_date',
+]
+
+# 每个查询重复执行次数
+REPEAT = 20
+
+# (名称, SQL, 参数生成函数) - 与各接口实际执行的查询对应
+QUERIES = [
+    ('客户列表 get_customers',
+     'SELECT * FROM customers ORDER BY created_at DESC LIMIT 20 OFFSET 0',
+     lambda ctx: ()),
+    ('健康档案 get_customer',
+     'SELECT * FROM health_records WHERE customer_id = ?',
+     lambda ctx: (ctx.customer(),)),
+    ('消费记录 get_customer_consumptions',
+     'SELECT * FROM consumptions WHERE customer_id = ? ORDER BY date DESC',
+     lambda ctx: (ctx.customer(),)),
+    ('服务记录 get_customer_services',
+     'SELECT * FROM services WHERE customer_id = ? ORDER BY service_date DESC',
+     lambda ctx: (ctx.customer(),)),
+    ('服务项目 service_items',
+     'SELECT * FROM service_items WHERE service_id = ?',
+     lambda ctx: (ctx.service(),)),
+    ('沟通记录 get_customer_communications',
+     'SELECT * FROM communications WHERE customer_id = ? ORDER BY communication_date DESC',
+     lambda ctx: (ctx.customer(),)),
+    ('服务列表 /api/service/list',
+     'SELECT * FROM services ORDER BY service_date DESC LIMIT 10 OFFSET 0',
+     lambda ctx: ()),
+    ('服务列表按日期 /api/service/list',
+     'SELECT * FROM services WHERE service_date >= ? AND service_date <= ? '
+     'ORDER BY service_date DESC LIMIT 10 OFFSET 0',
+     lambda ctx: ctx.date_range()),
+]
+
+
+class Context:
+    """随机选取查询参数"""
+
+    def __init__(self, customers, services, start):
+        self.customers = customers
+        self.services = services
+        self.start = start
+        self.rng = random.Random(1)
+
+    def customer(self):
+        return f"C{self.rng.randrange(self.customers):07d}"
+
+    def service(self):
+        return f"S{self.rng.randrange(self.services):010d}"
+
+    def date_range(self):
+        begin = self.start + timedelta(days=self.rng.randrange(700))
+        return (str(begin), str(begin + timedelta(days=7)))
+
+
+def seed(conn, services):
+    """批量生成数据，每个客户平均50条服务记录"""
+    rng = random.Random(42)
+    customers = max(services // 50, 1)
+    start = datetime(2023, 1, 1, 9, 0)
+    now = str(datetime.now())
+
+    def ts(minutes):
+        return str(start + timedelta(minutes=minutes))
+
+    conn.executemany(
+        'INSERT INTO customers (id, name, gender, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+        ((f"C{i:07d}", f"客户{i}", '女', ts(rng.randrange(1_000_000)), now) for i in range(customers)))
+    conn.executemany(
+        'INSERT INTO health_records (customer_id, skin_type, created_at, updated_at) VALUES (?, ?, ?, ?)',
+        ((f"C{i:07d}", '混合', now, now) for i in range(customers)))
+
+    def service_rows():
+        for i in range(services):
+            yield (f"S{i:010d}", f"C{rng.randrange(customers):07d}", ts(rng.randrange(1_000_000)),
+                   float(rng.randrange(100, 3000)), f"美容师{rng.randrange(30)}", now, now)
+    conn.executemany(
+        'INSERT INTO services (service_id, customer_id, service_date, total_amount, operator, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)', service_rows())
+
+    def item_rows():
+        for i in range(services):
+            for _ in range(rng.randrange(1, 3)):
+                yield (f"S{i:010d}", f"项目{rng.randrange(40)}", f"美容师{rng.randrange(30)}", now, now)
+    conn.executemany(
+        'INSERT INTO service_items (service_id, project_name, beautician_name, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?)', item_rows())
+
+    side_rows = services // 10
+    conn.executemany(
+        'INSERT INTO consumptions (customer_id, date, project_name, amount, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        ((f"C{rng.randrange(customers):07d}", ts(rng.randrange(1_000_000)), f"项目{i % 40}", float(i), now, now)
+         for i in range(side_rows)))
+    conn.executemany(
+        'INSERT INTO communications (customer_id, communication_date, communication_content, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?)',
+        ((f"C{rng.randrange(customers):07d}", ts(rng.randrange(1_000_000)), f"沟通{i}", now, now)
+         for i in range(side_rows)))
+    conn.commit()
+    return Context(customers, services, start)
+
+
+def measure(conn, ctx):
+    """对每个查询输出执行计划和耗时中位数(毫秒)"""
+    results = {}
+    for name, sql, params in QUERIES:
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params(ctx))]
+        timings = []
+        for _ in range(REPEAT):
+            args = params(ctx)
+            begin = time.perf_counter()
+            conn.execute(sql, args).fetchall()
+            timings.append((time.perf_counter() - begin) * 1000)
+        results[name] = (statistics.median(timings), plan)
+    return results
+
+
+def main():
+    services = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.mkdtemp(), 'bench_indexes.db')
+
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    for name in NEW_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    begin = time.perf_counter()
+    ctx = seed(conn, services)
+    print(f"生成数据: {services}条服务记录, {ctx.customers}个客户, 耗时{time.perf_counter() - begin:.1f}s ({path})")
+
+    before = measure(conn, ctx)
+
+    begin = time.perf_counter()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in NEW_INDEXES:
+                columns = ', '.join(column.name for column in index.columns)
+                conn.execute(f"CREATE INDEX {index.name} ON {table.name} ({columns})")
+    conn.execute('ANALYZE')
+    conn.commit()
+    print(f"创建索引并ANALYZE耗时{time.perf_counter() - begin:.1f}s")
+
+    ctx.rng.seed(1)
+    after = measure(conn, ctx)
+    conn.close()
+
+    for name, _, _ in QUERIES:
+        before_ms, before_plan = before[name]
+        after_ms, after_plan = after[name]
+        print(f"\n{name}: {before_ms:.3f}ms -> {after_ms:.3f}ms ({before_ms / max(after_ms, 1e-6):.1f}x)")
+        print(f"  之前: {' | '.join(before_plan)}")
+        print(f"  之后: {' | '.join(after_plan)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+客户报告生成性能基准
+
+用法:
+    python scripts/bench_report_engine.py [客户数] [每个客户的服务记录数]
+
+在临时目录中生成SQLite数据库（每个客户1份健康档案、5条消费记录、指定条数的服务记录
+（每条3个服务项目）和3条沟通记录），比较：
+- 子进程: 原 api/reports.py 的路径，运行 md_report_generator.py，再读回写出的报告文件
+- 进程内引擎: utils.report_engine.generate_report，逐个客户生成
+- 进程内批量: utils.report_engine.iter_reports，一次生成全部客户的报告
+单个客户的耗时取中位数（毫秒），并统计每份报告的SQL语句数。
+开始前先校验两种路径生成的报告内容逐字节一致。
+"""
+
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 添加父目录到路径，以便导入models和utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app import create_app
+from models import db
+from utils.report_engine import generate_report, iter_reports
+
+REPORT_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             'md_report_generator.py')
+
+# 逐个客户测量的客户数
+SAMPLE_SIZE = 20
+
+
+def seed(customers, services_per_customer):
+    rng = random.Random(42)
+    start = datetime(2023, 1, 1, 9, 30, 15, 123456)
+    table = db.metadata.tables
+    db.session.execute(table['customers'].insert(), [
+        {'id': f"C{i:06d}", 'name': f"客户{i}", 'gender': '女', 'age': 20 + i % 40, 'store': f"门店{i % 5}",
+         'hobbies': '瑜伽、阅读', 'occupation': '教师', 'created_at': start, 'updated_at': start}
+        for i in range(customers)
+    ])
+    db.session.execute(table['health_records'].insert(), [
+        {'customer_id': f"C{i:06d}", 'skin_type': '混合', 'allergies': '花粉', 'created_at': start}
+        for i in range(customers)
+    ])
+    db.session.execute(table['consumptions'].insert(), [
+        {'customer_id': f"C{i:06d}", 'date': start + timedelta(days=j, minutes=i), 'project_name': f"项目{j}",
+         'amount': float(rng.randrange(100, 3000)), 'payment_method': '会员卡', 'created_at': start}
+        for i in range(customers) for j in range(5)
+    ])
+    services = [
+        {'service_id': f"S{i:06d}{j:04d}", 'customer_id': f"C{i:06d}", 'customer_name': f"客户{i}",
+         'service_date': start + timedelta(days=j, minutes=i), 'departure_time': start + timedelta(days=j, hours=2),
+         'total_amount': float(rng.randrange(100, 3000)), 'total_sessions': j % 3, 'satisfaction': '满意',
+         'created_at': start}
+        for i in range(customers) for j in range(services_per_customer)
+    ]
+    db.session.execute(table['services'].insert(), services)
+    db.session.execute(table['service_items'].insert(), [
+        {'service_id': row['service_id'], 'project_name': f"项目{k}", 'beautician_name': '李婷',
+         'unit_price': 280.0 if k else None, 'card_deduction': 150.0, 'quantity': 1, 'is_specified': bool(k % 2),
+         'created_at': start}
+        for row in services for k in range(3)
+    ])
+    db.session.execute(table['communications'].insert(), [
+        {'customer_id': f"C{i:06d}", 'communication_date': start + timedelta(days=j), 'communication_location': '门店',
+         'communication_content': f"回访{j}", 'created_at': start}
+        for i in range(customers) for j in range(3)
+    ])
+    db.session.commit()
+
+
+def subprocess_report(root_dir, customer_id):
+    """原路径：子进程生成报告文件后读回"""
+    result = subprocess.run([sys.executable, REPORT_SCRIPT, customer_id], capture_output=True, text=True,
+                            cwd=root_dir)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    with open(os.path.join(root_dir, f"{customer_id}_customer_report.md"), encoding='utf-8') as f:
+        return f.read()
+
+
+def check_parity(root_dir, customer_ids):
+    """进程内引擎与子进程生成的报告必须一致"""
+    for customer_id in customer_ids:
+        expected, actual = subprocess_report(root_dir, customer_id), generate_report(customer_id)
+        if expected != actual:
+            raise AssertionError(f"客户 {customer_id} 的报告不一致:\n{expected}\n----\n{actual}")
+
+
+def timed(func, customer_ids):
+    timings = []
+    for customer_id in customer_ids:
+        begin = time.perf_counter()
+        func(customer_id)
+        timings.append((time.perf_counter() - begin) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    services_per_customer = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    # md_report_generator.py 读取工作目录下的 instance/beauty_crm.db
+    root_dir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(root_dir, 'instance'))
+    path = os.path.join(root_dir, 'instance', 'beauty_crm.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}", 'RESPONSE_CACHE_ENABLED': False})
+
+    with app.app_context():
+        seed(customers, services_per_customer)
+        sample = [f"C{i:06d}" for i in range(0, customers, max(1, customers // SAMPLE_SIZE))][:SAMPLE_SIZE]
+        check_parity(root_dir, sample[:3])
+
+        statements = []
+        listener = lambda *args: statements.append(1)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        generate_report(sample[0])
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+        print(f"{customers}个客户, 每个客户{services_per_customer}条服务记录, 每份报告{len(statements)}条SQL")
+        print(f"  {'子进程':<16} {timed(lambda customer_id: subprocess_report(root_dir, customer_id), sample):9.1f}ms/份")
+        print(f"  {'进程内引擎':<14} {timed(generate_report, sample):9.1f}ms/份")
+
+        ids = [f"C{i:06d}" for i in range(customers)]
+        begin = time.perf_counter()
+        size = sum(len(content) for _, content in iter_reports(ids))
+        elapsed = time.perf_counter() - begin
+        print(f"  {'进程内批量':<14} {elapsed * 1000 / customers:9.2f}ms/份  共{elapsed:.2f}s  {size:,}字符")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+序列化性能基准
+
+用法:
+    python scripts/bench_serializers.py [客户数]
+
+在临时SQLite数据库中生成客户及服务记录（每个客户2条服务记录、每条2个服务项目），
+测量序列化全部客户和服务记录的耗时（毫秒，取中位数）：
+- to_dict + json.dumps: 原来的路径，ORM对象逐个to_dict，标准库编码（与jsonify默认参数相同）
+- serializer + orjson: 预编译序列化函数，orjson编码
+- Core行 + orjson: 不实例化ORM对象，直接序列化查询行（仅客户，服务记录含嵌套项目）
+先在对象已加载的情况下单独测量序列化和编码，再测量包含查询的完整路径。
+开始前先校验预编译序列化函数的输出与to_dict完全一致。
+"""
+
+import os
+import sys
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 添加父目录到路径，以便导入models和utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import selectinload
+
+from app import create_app
+from models import db, Customer, Service, ServiceItem, HealthRecord, Consumption, Communication, Project
+from utils.serializers import get_serializer, get_row_serializer, select_columns, dumps_bytes, orjson
+
+REPEAT = 5
+
+
+def seed(customers):
+    rng = random.Random(42)
+    start = datetime(2023, 1, 1, 9, 30, 15, 123456)
+    table = db.metadata.tables
+    db.session.execute(table['customers'].insert(), [
+        {'id': f"C{i:06d}", 'name': f"客户{i}", 'gender': '女', 'age': 20 + i % 40, 'store': f"门店{i % 5}",
+         'hobbies': '瑜伽、阅读', 'created_at': start + timedelta(minutes=i), 'updated_at': start}
+        for i in range(customers)
+    ])
+    services = [
+        {'service_id': f"S{i:08d}", 'customer_id': f"C{i % customers:06d}", 'customer_name': f"客户{i % customers}",
+         'service_date': start + timedelta(minutes=37 * i), 'total_amount': float(rng.randrange(100, 3000)),
+         'operator': '前台', 'created_at': start, 'updated_at': start}
+        for i in range(customers * 2)
+    ]
+    db.session.execute(table['services'].insert(), services)
+    db.session.execute(table['service_items'].insert(), [
+        {'service_id': row['service_id'], 'project_name': f"项目{j}", 'beautician_name': '李婷',
+         'unit_price': 280.0, 'quantity': 1, 'is_specified': bool(j), 'created_at': start, 'updated_at': start}
+        for row in services for j in range(2)
+    ])
+    db.session.add(HealthRecord(customer_id='C000000', skin_type='混合'))
+    db.session.add(Consumption(customer_id='C000000', date=start, amount=1.5, completion_date=start))
+    db.session.add(Communication(customer_id='C000000', communication_date=start, communication_content='回访'))
+    db.session.add(Project(name='深层补水', price=680))
+    db.session.commit()
+
+
+def check_parity():
+    """预编译序列化函数与to_dict的输出必须一致"""
+    for model in (Customer, HealthRecord, Consumption, Service, ServiceItem, Communication, Project):
+        serializer = get_serializer(model)
+        for obj in model.query.limit(50):
+            expected, actual = obj.to_dict(), serializer(obj)
+            if expected != actual:
+                raise AssertionError(f"{model.__name__} 序列化结果不一致: {expected} != {actual}")
+    db.session.expunge_all()
+
+
+def timed(func, expunge=True):
+    timings = []
+    size = 0
+    for _ in range(REPEAT):
+        if expunge:
+            db.session.expunge_all()
+        begin = time.perf_counter()
+        size = len(func())
+        timings.append((time.perf_counter() - begin) * 1000)
+    return statistics.median(timings), size
+
+
+def legacy_dumps(data):
+    return json.dumps(data, ensure_ascii=True, sort_keys=True).encode('utf-8')
+
+
+def report(title, cases, expunge=True):
+    print(title)
+    for name, func in cases:
+        elapsed, size = timed(func, expunge)
+        print(f"  {name:<28} {elapsed:9.1f}ms  {size:>12,}")
+
+
+def main():
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    path = os.path.join(tempfile.mkdtemp(), 'bench_serializers.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}"})
+
+    with app.app_context():
+        seed(customers)
+        check_parity()
+        print(f"{customers}个客户, {customers * 2}条服务记录, 编码: {'orjson' if orjson else '标准库'}")
+
+        # 对象已加载，只测序列化和编码
+        customer_objects = Customer.query.all()
+        service_objects = Service.query.options(selectinload(Service.service_items)).all()
+        report('序列化+编码（对象已加载，输出字节数）', [
+            ('客户 to_dict + json.dumps', lambda: legacy_dumps([c.to_dict() for c in customer_objects])),
+            ('客户 serializer + json.dumps',
+             lambda: legacy_dumps([get_serializer(Customer)(c) for c in customer_objects])),
+            ('客户 serializer + orjson', lambda: dumps_bytes([get_serializer(Customer)(c) for c in customer_objects])),
+            ('服务记录 to_dict + json.dumps', lambda: legacy_dumps([s.to_dict() for s in service_objects])),
+            ('服务记录 serializer + orjson',
+             lambda: dumps_bytes([get_serializer(Service)(s) for s in service_objects])),
+        ], expunge=False)
+
+        # 含查询的完整路径
+        report('查询+序列化+编码（输出字节数）', [
+            ('客户 ORM + to_dict + json.dumps',
+             lambda: legacy_dumps([c.to_dict() for c in Customer.query.all()])),
+            ('客户 ORM + serializer + orjson',
+             lambda: dumps_bytes([get_serializer(Customer)(c) for c in Customer.query.all()])),
+            ('客户 Core行 + orjson',
+             lambda: dumps_bytes([get_row_serializer(Customer)(row)
+                                  for row in db.session.execute(select_columns(Customer))])),
+        ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+SQLite并发读写基准
+
+用法:
+    python scripts/bench_sqlite_concurrency.py [读进程数] [持续秒数]
+
+模拟多个gunicorn worker共享同一个数据库文件：一个写进程持续执行大事务导入
+（每个事务插入5万条服务记录后提交），同时若干读进程反复执行客户服务记录查询。
+分别使用legacy（回滚日志）和wal配置档，输出读请求的延迟分位数、
+database is locked错误数和写入吞吐量。
+"""
+
+import os
+import sys
+import time
+import random
+import statistics
+import tempfile
+import multiprocessing
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+# 添加父目录到路径，以便导入models和utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db
+from utils.db_engine import resolve_pragmas, sqlite_engine_options, apply_sqlite_pragmas
+
+# 初始数据量
+SEED_CUSTOMERS = 2000
+SEED_SERVICES = 100000
+
+# 写进程每个事务插入的行数及每批行数
+TXN_ROWS = 50000
+BATCH_ROWS = 2000
+
+# 读进程两次查询之间的间隔(秒)，模拟请求到达间隔，避免读进程占满CPU
+READ_INTERVAL = 0.005
+
+READ_SQL = text(
+    'SELECT * FROM services WHERE customer_id = :customer_id ORDER BY service_date DESC LIMIT 50'
+)
+
+
+def make_engine(path, profile):
+    """使用与create_app相同的引擎参数和PRAGMA创建引擎"""
+    uri = f"sqlite:///{path}"
+    pragmas = resolve_pragmas(profile)
+    engine = create_engine(uri, **sqlite_engine_options(uri, pragmas))
+    return apply_sqlite_pragmas(engine, pragmas)
+
+
+def service_rows(start, count, rng):
+    base = datetime(2023, 1, 1)
+    now = datetime.now()
+    for i in range(start, start + count):
+        yield {
+            'service_id': f"S{i:010d}",
+            'customer_id': f"C{rng.randrange(SEED_CUSTOMERS):06d}",
+            'service_date': base + timedelta(minutes=rng.randrange(1_000_000)),
+            'total_amount': float(rng.randrange(100, 3000)),
+            'operator': f"美容师{rng.randrange(30)}",
+            'created_at': now,
+            'updated_at': now,
+        }
+
+
+def seed(path, profile):
+    engine = make_engine(path, profile)
+    db.metadata.create_all(engine)
+    rng = random.Random(42)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(db.metadata.tables['customers'].insert(), [
+            {'id': f"C{i:06d}", 'name': f"客户{i}", 'created_at': now, 'updated_at': now}
+            for i in range(SEED_CUSTOMERS)
+        ])
+        conn.execute(db.metadata.tables['services'].insert(), list(service_rows(0, SEED_SERVICES, rng)))
+    engine.dispose()
+
+
+def writer(path, profile, deadline, results):
+    """持续执行大事务导入，直到deadline"""
+    engine = make_engine(path, profile)
+    table = db.metadata.tables['services']
+    rng = random.Random(7)
+    next_id = SEED_SERVICES
+    written, errors, transactions = 0, 0, 0
+    while time.time() < deadline:
+        try:
+            with engine.begin() as conn:
+                for offset in range(0, TXN_ROWS, BATCH_ROWS):
+                    conn.execute(table.insert(), list(service_rows(next_id + offset, BATCH_ROWS, rng)))
+            next_id += TXN_ROWS
+            written += TXN_ROWS
+            transactions += 1
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put(('writer', written, errors, transactions))
+
+
+def reader(path, profile, deadline, seed_value, results):
+    """反复查询客户服务记录，记录每次查询延迟"""
+    engine = make_engine(path, profile)
+    rng = random.Random(seed_value)
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        begin = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(READ_SQL, {'customer_id': f"C{rng.randrange(SEED_CUSTOMERS):06d}"}).fetchall()
+            latencies.append((time.perf_counter() - begin) * 1000)
+        except OperationalError:
+            errors += 1
+        time.sleep(READ_INTERVAL)
+    engine.dispose()
+    results.put(('reader', latencies, errors))
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(profile, readers, duration):
+    path = os.path.join(tempfile.mkdtemp(), f"bench_{profile}.db")
+    seed(path, profile)
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + duration
+    processes = [multiprocessing.Process(target=writer, args=(path, profile, deadline, results))]
+    processes += [
+        multiprocessing.Process(target=reader, args=(path, profile, deadline, i, results))
+        for i in range(readers)
+    ]
+    for process in processes:
+        process.start()
+
+    latencies, read_errors = [], 0
+    written, write_errors, transactions = 0, 0, 0
+    for _ in processes:
+        item = results.get()
+        if item[0] == 'writer':
+            _, written, write_errors, transactions = item
+        else:
+            latencies.extend(item[1])
+            read_errors += item[2]
+    for process in processes:
+        process.join()
+
+    print(f"\n[{profile}] 读进程{readers}个, 持续{duration}s")
+    print(f"  读请求: {len(latencies)}次, 锁错误{read_errors}次")
+    if latencies:
+        print(f"  读延迟(ms): p50={percentile(latencies, 50):.2f} p95={percentile(latencies, 95):.2f} "
+              f"p99={percentile(latencies, 99):.2f} max={max(latencies):.2f} "
+              f"mean={statistics.mean(latencies):.2f}")
+    print(f"  写入: {written}行/{transactions}个事务, {written / duration:,.0f} 行/秒, 锁错误{write_errors}次")
+
+
+def main():
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    for profile in ('legacy', 'wal'):
+        run(profile, readers, duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+批量生成客户报告
+
+用法:
+    python scripts/generate_bulk_reports.py [--output 目录] [--archive] [--full] [--workers 进程数]
+
+为全部客户生成Markdown报告，每个客户一个文件，默认输出到REPORT_FOLDER（exports/reports）。
+输出目录下的manifest.json记录每个客户的数据水位，再次运行时只重新生成数据有变化的客户，
+并删除已删除客户的报告；--full忽略清单全部重新生成，--archive另外打包为reports.zip。
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+
+# 添加父目录到路径，以便导入models等模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from utils.bulk_reports import generate_bulk_reports, BulkReportRunning
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量生成客户报告')
+    parser.add_argument('--output', help='输出目录，默认为REPORT_FOLDER')
+    parser.add_argument('--archive', action='store_true', help='另外打包为zip')
+    parser.add_argument('--full', action='store_true', help='忽略清单，全部重新生成')
+    parser.add_argument('--workers', type=int, default=None, help='渲染进程数，默认为CPU核数，1为不使用进程池')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        folder = os.path.abspath(args.output or app.config['REPORT_FOLDER'])
+        try:
+            result = generate_bulk_reports(folder, archive=args.archive, full=args.full, workers=args.workers)
+        except BulkReportRunning as e:
+            logger.error(f"{folder}: {str(e)}")
+            sys.exit(1)
+    logger.info(f"报告已输出到 {folder}: {json.dumps(result, ensure_ascii=False)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+清理增量同步的删除记录
+
+用法:
+    python scripts/purge_sync_tombstones.py [保留天数]
+
+删除sync_tombstones中早于保留天数（默认90天）的记录，最新一条始终保留。
+令牌早于保留范围的客户端再次同步时会收到410，需要清空本地数据后重新全量同步。
+"""
+
+import os
+import sys
+import logging
+
+# 添加父目录到路径，以便导入models等模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+from utils.sync import purge_tombstones, TOMBSTONE_RETENTION_DAYS
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else TOMBSTONE_RETENTION_DAYS
+    app = create_app()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            count = purge_tombstones(connection, days)
+        logger.info(f"已清理{days}天前的删除记录{count}条")
+
+
+if __name__ == '__main__':
+    main()
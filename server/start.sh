@@ -4,4 +4,4 @@
 mkdir -p logs
 
 # 启动 gunicorn
-gunicorn -c gunicorn.conf.py app:app
\ No newline at end of file
+gunicorn -c gunicorn.conf.py wsgi:app
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+按ID批量读取和删除 - 大ID列表分批IN查询并直接序列化查询行
+
+导出、报告和小程序历史页常常需要指定的N个客户及其关联记录，原来只能逐个调用详情接口，
+或者把全部ID放进一个IN列表（超过SQLite绑定变量上限时直接报错）。这里：
+- ID列表按IN_CHUNK_SIZE分批，每批每张表一次查询，批次之间不保留数据，内存占用与ID总数无关
+- 用Core查询行和预编译的行序列化函数，不实例化ORM对象
+- 服务记录的服务项目按服务记录ID分批一次查询后挂到所属服务记录下
+- 删除时每批每张关联表一条集合式DELETE，语句数只与ID数有关，与客户的历史记录多少无关；
+  关联记录显式删除，不依赖外键ON DELETE CASCADE（未执行迁移f3b9d1c05a72的旧库外键没有级联，
+  开启外键约束后直接删除主表会失败）
+"""
+from sqlalchemy import delete, select
+
+from models import db, Customer, Service, ServiceItem, HealthRecord, Consumption, Communication
+from utils.bulk_writer import IN_CHUNK_SIZE
+from utils.serializers import get_row_serializer, select_columns
+
+# 单次请求最多的ID数
+MAX_BULK_IDS = 50000
+
+
+class BulkRequestError(ValueError):
+    """ID列表参数错误"""
+
+
+def chunked(values, size=IN_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def parse_ids(values, name='ids', limit=MAX_BULK_IDS):
+    """
+    校验ID列表，去重并保持原顺序
+
+    Args:
+        values: 请求体中的ID数组
+        name: 参数名，用于错误信息
+        limit: 最多的ID数
+    """
+    if not isinstance(values, list) or not values:
+        raise BulkRequestError(f"{name}应为非空数组")
+    if len(values) > limit:
+        raise BulkRequestError(f"{name}最多{limit}个，当前{len(values)}个")
+    ids = []
+    seen = set()
+    for value in values:
+        if not isinstance(value, (str, int)) or isinstance(value, bool):
+            raise BulkRequestError(f"{name}只能包含字符串或整数: {value!r}")
+        value = str(value)
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    return ids
+
+
+def body_args(payload, names):
+    """
+    把请求体中的include/fields参数转换为与查询参数相同的形式，供fieldsets解析
+
+    请求体中的值可以是数组或逗号分隔的字符串，如 {"include": ["health"], "fields": "id,name"}
+    """
+    args = {}
+    for name, value in payload.items():
+        if name not in names and not (name.startswith('fields[') and name.endswith(']')):
+            continue
+        if isinstance(value, list):
+            value = ','.join(str(item) for item in value)
+        args[name] = '' if value is None else str(value)
+    return args
+
+
+def iter_rows(model, key_column, keys, fields=None, order_by=(), extra=()):
+    """
+    按 key_column IN keys 分批查询，逐行产出
+
+    Args:
+        model: 模型类
+        key_column: 过滤列，如HealthRecord.customer_id
+        keys: 键值列表
+        fields: 返回的字段，为None时为全部列（不能包含嵌套字段）
+        order_by: 批内排序
+        extra: 除key_column外需要一并取出、但不一定在fields中的列
+
+    Yields:
+        ((key, *extra), dict)
+    """
+    serializer = get_row_serializer(model, fields)
+    columns = (key_column,) + tuple(extra)
+    width = len(columns)
+    # 行序列化函数按位置读取前面的列，附加列放在末尾
+    query = select_columns(model, fields).add_columns(*columns)
+    for chunk in chunked(keys):
+        for row in db.session.execute(query.where(key_column.in_(chunk)).order_by(*order_by)):
+            yield tuple(row[-width:]), serializer(row)
+
+
+def group_rows(model, key_column, keys, fields=None, order_by=()):
+    """按key_column分组返回 {键值: [dict]}"""
+    groups = {}
+    for (key,), data in iter_rows(model, key_column, keys, fields, order_by):
+        groups.setdefault(key, []).append(data)
+    return groups
+
+
+def service_columns(fields=None):
+    """服务记录除service_items以外要返回的列"""
+    if fields is None:
+        return [column.key for column in Service.__table__.columns]
+    return [name for name in fields if name != 'service_items']
+
+
+def iter_services(key_column, keys, fields=None, order_by=(), item_fields=None):
+    """
+    分批读取服务记录及其服务项目
+
+    Args:
+        key_column: Service.service_id或Service.customer_id
+        keys: 键值列表
+        fields: 服务记录返回的字段，可包含service_items；为None时与Service.to_dict一致
+        item_fields: 服务项目返回的字段
+
+    Yields:
+        (key, dict)
+    """
+    with_items = fields is None or 'service_items' in fields
+    columns = service_columns(fields)
+    for chunk in chunked(keys):
+        rows = list(iter_rows(Service, key_column, chunk, columns, order_by, extra=(Service.service_id,)))
+        items = {}
+        if with_items and rows:
+            items = group_rows(ServiceItem, ServiceItem.service_id, [service_id for (_, service_id), _ in rows],
+                               item_fields, order_by=(ServiceItem.id,))
+        for (key, service_id), data in rows:
+            if with_items:
+                data['service_items'] = items.get(service_id, [])
+            yield key, data
+
+
+def customer_names(customer_ids):
+    """返回 {客户ID: 姓名}"""
+    names = {}
+    for chunk in chunked(list(customer_ids)):
+        names.update(db.session.execute(select(Customer.id, Customer.name).where(Customer.id.in_(chunk))).all())
+    return names
+
+
+def delete_dependents(model, keys):
+    """
+    删除客户或服务记录的关联记录，每张关联表一条DELETE
+
+    服务项目先于服务记录、关联记录先于客户删除：汇总表触发器按所属服务记录和客户计算门店和日期，
+    删除明细时主记录必须仍然存在
+
+    Args:
+        model: Customer或Service
+        keys: 主键值列表，不超过IN_CHUNK_SIZE个
+    """
+    if model is Service:
+        db.session.execute(delete(ServiceItem).where(ServiceItem.service_id.in_(keys)))
+        return
+    service_ids = select(Service.service_id).where(Service.customer_id.in_(keys))
+    db.session.execute(delete(ServiceItem).where(ServiceItem.service_id.in_(service_ids)))
+    for child in (Service, HealthRecord, Consumption, Communication):
+        db.session.execute(delete(child).where(child.customer_id.in_(keys)))
+
+
+def delete_by_ids(model, key_column, keys):
+    """
+    按主键分批删除，关联记录一并删除
+
+    Args:
+        model: Customer或Service
+        key_column: 主键列，如Customer.id
+        keys: 主键值列表
+
+    Returns:
+        list: 实际存在并被删除的主键，顺序与keys一致
+    """
+    existing = set()
+    for chunk in chunked(keys):
+        existing.update(db.session.execute(select(key_column).where(key_column.in_(chunk))).scalars())
+        delete_dependents(model, chunk)
+        db.session.execute(delete(model).where(key_column.in_(chunk)))
+    return [key for key in keys if key in existing]
@@ -0,0 +1,328 @@
+"""
+批量客户报告 - 为全部客户生成Markdown报告，只重新生成数据有变化的客户
+
+export_customers_to_markdown.py、run_data_export.py、generate_report.py 和 md_report_generator.py
+都是逐个客户生成报告，run_data_export.py 每个客户还要发5个HTTP请求。这里：
+- 用utils.report_engine读取数据：全部重新生成时每张表一次查询读取全部客户，在内存中按客户分组；
+  增量生成时按IN_CHUNK_SIZE分批读取有变化的客户
+- 渲染和写文件在进程池中执行，每个任务一批客户，主进程只负责读库和更新清单
+- 输出目录下每个客户一个 <客户ID>.md 文件，可选再打包为一个zip
+- 清单(manifest.json)记录每个客户的数据水位：客户及其关联记录updated_at的最大值和各表记录数。
+  水位不变的客户跳过；记录被删除时updated_at不会变大，由记录数的变化识别；
+  已删除客户的报告文件随之删除
+- 生成期间对输出目录下的锁文件加排他的flock，多个worker、多个gunicorn实例和命令行不会同时
+  生成同一目录（否则会互相覆盖清单和压缩包）；锁被占用时抛出BulkReportRunning
+"""
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import func, select
+from werkzeug.utils import secure_filename
+
+from models import db, Customer, HealthRecord, Consumption, Service, ServiceItem, Communication
+from utils.report_engine import load_report_data, iter_report_data, render_report
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+ARCHIVE_NAME = 'reports.zip'
+LOCK_NAME = '.bulk_reports.lock'
+
+# 清单格式或报告模板变化时增加，旧清单中的报告全部重新生成
+MANIFEST_VERSION = 1
+
+# 每个渲染任务包含的客户数
+RENDER_BATCH_SIZE = 200
+
+# 参与水位计算的关联表: (模型, 客户ID列)；服务项目通过服务记录关联到客户
+WATERMARK_TABLES = [
+    (HealthRecord, HealthRecord.customer_id),
+    (Consumption, Consumption.customer_id),
+    (Service, Service.customer_id),
+    (ServiceItem, Service.customer_id),
+    (Communication, Communication.customer_id),
+]
+
+
+class BulkReportRunning(RuntimeError):
+    """同一输出目录的批量报告正在由其他进程或线程生成"""
+
+
+@contextmanager
+def folder_lock(folder):
+    """
+    对输出目录加排他锁，锁被占用时立即抛出BulkReportRunning而不是等待
+
+    flock随文件描述符释放，进程异常退出时锁自动释放；同一进程内不同线程各自打开锁文件，同样互斥
+    """
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, LOCK_NAME), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise BulkReportRunning('批量报告正在生成中，请稍后再试') from None
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def is_running(folder):
+    """输出目录的批量报告是否正在生成"""
+    try:
+        with folder_lock(folder):
+            return False
+    except BulkReportRunning:
+        return True
+
+
+def _timestamp(value):
+    return value.isoformat(sep=' ') if value else ''
+
+
+def customer_watermarks():
+    """
+    计算每个客户的数据水位，每张表一次聚合查询
+
+    Returns:
+        dict: {客户ID: [updated_at最大值, 健康档案数, 消费记录数, 服务记录数, 服务项目数, 沟通记录数]}
+    """
+    marks = {
+        customer_id: [updated_at, 0, 0, 0, 0, 0]
+        for customer_id, updated_at in db.session.execute(select(Customer.id, Customer.updated_at))
+    }
+    for index, (model, customer_column) in enumerate(WATERMARK_TABLES, 1):
+        query = select(customer_column, func.max(model.updated_at), func.count()).group_by(customer_column)
+        if model is ServiceItem:
+            query = query.select_from(ServiceItem).join(Service, ServiceItem.service_id == Service.service_id)
+        for customer_id, updated_at, count in db.session.execute(query):
+            mark = marks.get(customer_id)
+            if mark is None:
+                continue
+            if updated_at and (mark[0] is None or updated_at > mark[0]):
+                mark[0] = updated_at
+            mark[index] = count
+    for mark in marks.values():
+        mark[0] = _timestamp(mark[0])
+    return marks
+
+
+def report_filename(customer_id):
+    """客户报告文件名；客户ID不能直接用作文件名时改用其哈希"""
+    name = secure_filename(str(customer_id))
+    if name != str(customer_id):
+        name = f"{name}-{uuid.uuid5(uuid.NAMESPACE_OID, str(customer_id)).hex[:12]}"
+    return f"{name}.md"
+
+
+def read_manifest(folder):
+    """读取清单，不存在、损坏或版本不一致时返回空清单"""
+    try:
+        with open(os.path.join(folder, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'customers': {}}
+    return manifest
+
+
+def _write_atomic(path, write):
+    """先写入同目录下的临时文件再重命名，读取方不会看到写了一半的文件"""
+    temp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex}")
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _write_bytes(path, content):
+    def write(temp_path):
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+    _write_atomic(path, write)
+
+
+def write_manifest(folder, manifest):
+    content = json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True)
+    _write_bytes(os.path.join(folder, MANIFEST_NAME), content.encode('utf-8'))
+
+
+def render_batch(folder, batch):
+    """
+    渲染一批客户报告并写入文件，在进程池的子进程中执行
+
+    Args:
+        folder: 输出目录
+        batch: [(客户ID, 文件名, ReportData)]
+
+    Returns:
+        list: [(客户ID, 文件字节数)]
+    """
+    written = []
+    for customer_id, filename, data in batch:
+        content = render_report(data).encode('utf-8')
+        _write_bytes(os.path.join(folder, filename), content)
+        written.append((customer_id, len(content)))
+    return written
+
+
+def _iter_batches(items, size=RENDER_BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _iter_stale_data(stale, rebuild_all):
+    """读取需要重新生成的客户数据；全部重新生成时每张表只查询一次"""
+    if rebuild_all:
+        data = load_report_data()
+        for customer_id in stale:
+            yield customer_id, data.pop(customer_id, None)
+    else:
+        yield from iter_report_data(stale)
+
+
+def _pool_context():
+    """
+    子进程只渲染和写文件，不访问数据库。单线程进程（命令行）用fork，直接共享已导入的模块；
+    服务进程中有其他线程时fork可能继承被持有的锁，改用spawn
+    """
+    if threading.active_count() == 1 and 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('spawn')
+
+
+def build_archive(folder, manifest):
+    """把清单中的全部报告打包为zip，返回压缩包路径"""
+    path = os.path.join(folder, ARCHIVE_NAME)
+
+    def write(temp_path):
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for customer_id in sorted(manifest['customers']):
+                filename = manifest['customers'][customer_id]['file']
+                archive.write(os.path.join(folder, filename), filename)
+
+    _write_atomic(path, write)
+    return path
+
+
+def generate_bulk_reports(folder, archive=False, full=False, workers=None, reporter=None):
+    """
+    增量生成全部客户的报告
+
+    Args:
+        folder: 输出目录，报告文件和清单保存在此目录
+        archive: 是否打包为zip（ARCHIVE_NAME）
+        full: 是否忽略清单全部重新生成
+        workers: 渲染进程数，为0或1时在当前进程内渲染；为None时取CPU核数
+        reporter: 任务进度上报器(JobReporter)，可选
+
+    Returns:
+        dict: 客户总数、重新生成数、未变化数、删除数、耗时(秒)和压缩包文件名
+
+    Raises:
+        BulkReportRunning: 同一输出目录正在生成
+    """
+    with folder_lock(folder):
+        return _generate(folder, archive, full, workers, reporter)
+
+
+def _generate(folder, archive, full, workers, reporter):
+    started = time.perf_counter()
+    manifest = read_manifest(folder)
+    entries = manifest['customers']
+
+    if reporter:
+        reporter.stage('计算数据水位')
+    marks = customer_watermarks()
+
+    # 清单中已不存在的客户，删除其报告文件
+    removed = [customer_id for customer_id in entries if customer_id not in marks]
+    for customer_id in removed:
+        try:
+            os.remove(os.path.join(folder, entries.pop(customer_id)['file']))
+        except OSError:
+            pass
+
+    stale = [
+        customer_id for customer_id, mark in marks.items()
+        if full
+        or customer_id not in entries
+        or entries[customer_id].get('watermark') != mark
+        or not os.path.exists(os.path.join(folder, entries[customer_id]['file']))
+    ]
+    logger.info(f"批量报告: 客户{len(marks)}个，需要生成{len(stale)}个，删除{len(removed)}个")
+
+    if reporter:
+        reporter.stage('生成报告')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    generated = 0
+    batches = _iter_batches(
+        (customer_id, report_filename(customer_id), data)
+        for customer_id, data in _iter_stale_data(stale, len(stale) == len(marks))
+        if data is not None
+    )
+
+    def record(written):
+        nonlocal generated
+        for customer_id, size in written:
+            entries[customer_id] = {'file': report_filename(customer_id), 'watermark': marks[customer_id],
+                                    'size': size}
+        generated += len(written)
+        if reporter:
+            reporter.advance(len(written))
+
+    # 只有一两批时启动进程池的开销大于渲染本身，在当前进程内渲染
+    if workers > 1 and len(stale) > RENDER_BATCH_SIZE:
+        # 同时提交的任务数有上限，读库与渲染交替进行，未渲染的数据不会全部堆积在内存中
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.submit(render_batch, folder, batch))
+                if len(pending) >= workers * 2:
+                    record(pending.popleft().result())
+            while pending:
+                record(pending.popleft().result())
+    else:
+        for batch in batches:
+            record(render_batch(folder, batch))
+
+    manifest['generated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    write_manifest(folder, manifest)
+
+    if archive:
+        if generated or removed or not os.path.exists(os.path.join(folder, ARCHIVE_NAME)):
+            if reporter:
+                reporter.stage('打包')
+            build_archive(folder, manifest)
+
+    result = {
+        'total': len(marks),
+        'generated': generated,
+        'unchanged': len(marks) - len(stale),
+        'removed': len(removed),
+        'elapsed': round(time.perf_counter() - started, 3),
+        'archive': ARCHIVE_NAME if archive else None,
+    }
+    logger.info(f"批量报告完成: {json.dumps(result, ensure_ascii=False)}")
+    return result
@@ -0,0 +1,428 @@
+"""
+批量写入引擎 - 用于Excel导入的集合式合并写库
+
+按表一次性加载已有的自然键（分块IN查询），在内存中拆分新增与更新，
+再通过executemany批量INSERT / 按主键批量UPDATE写入，替代逐行查询与逐个add。
+自然键与模型上的唯一约束保持一致：
+    customers        -> id
+    health_records   -> customer_id
+    consumptions     -> uix_consumption_record
+    services         -> uix_service_record
+    communications   -> uix_communication_record
+    service_items    -> (service_id, project_name, beautician_name)
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, select
+
+from models import (db, Customer, HealthRecord, Consumption, Service, ServiceItem,
+                    Communication, generate_service_id)
+from utils.project_catalog import get_project_catalog
+
+logger = logging.getLogger(__name__)
+
+# SQLite默认的绑定变量上限为999，IN查询按此分块
+IN_CHUNK_SIZE = 500
+
+# 每批executemany的行数
+WRITE_BATCH_SIZE = 1000
+
+# 标题行残留的客户ID值
+HEADER_IDS = ('客户ID', 'ID')
+
+
+def _chunks(values, size=IN_CHUNK_SIZE):
+    """将序列按固定大小分块"""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _unique_key_columns(model, constraint_name):
+    """读取模型唯一约束的列名"""
+    for constraint in model.__table__.constraints:
+        if constraint.name == constraint_name:
+            return [column.key for column in constraint.columns]
+    raise ValueError(f"{model.__tablename__} 不存在唯一约束: {constraint_name}")
+
+
+def _model_fields(model):
+    return {column.key for column in model.__table__.columns}
+
+
+def _filter_fields(row, fields):
+    return {k: v for k, v in row.items() if k in fields}
+
+
+def _merge_into(target, row):
+    """将row中的非空值合并到target，与原逐行导入的"非空才覆盖"语义一致"""
+    for key, value in row.items():
+        if value is not None:
+            target[key] = value
+
+
+def _is_valid_customer_id(customer_id):
+    return bool(customer_id) and customer_id not in HEADER_IDS
+
+
+def _load_existing(model, key_columns, pk_column, customer_ids):
+    """按客户ID分块加载某张表已有的自然键 -> 主键映射"""
+    table = model.__table__
+    columns = [table.c[name] for name in key_columns]
+    existing = {}
+    for chunk in _chunks(customer_ids):
+        stmt = select(table.c[pk_column], *columns).where(table.c.customer_id.in_(chunk))
+        for row in db.session.execute(stmt):
+            key = tuple(row[1:])
+            # 同一自然键存在多条历史数据时，沿用最早的一条
+            existing.setdefault(key, row[0])
+    return existing
+
+
+def _executemany_insert(model, rows):
+    """批量插入，按列集合分组以便每组使用同一条编译语句"""
+    if not rows:
+        return
+    table = model.__table__
+    groups = defaultdict(list)
+    for row in rows:
+        groups[tuple(sorted(row))].append(row)
+    for batch_rows in groups.values():
+        for batch in _chunks(batch_rows, WRITE_BATCH_SIZE):
+            db.session.execute(table.insert(), batch)
+
+
+def _executemany_update(model, pk_column, rows):
+    """按主键批量更新，rows中需包含主键列，只更新出现的列"""
+    if not rows:
+        return
+    table = model.__table__
+    groups = defaultdict(list)
+    for row in rows:
+        columns = tuple(sorted(k for k in row if k != pk_column))
+        if columns:
+            groups[columns].append(row)
+    for columns, batch_rows in groups.items():
+        stmt = (
+            table.update()
+            .where(table.c[pk_column] == bindparam('_pk'))
+            .values({name: bindparam(f'_v_{name}') for name in columns})
+        )
+        params = [
+            dict({f'_v_{name}': row[name] for name in columns}, _pk=row[pk_column])
+            for row in batch_rows
+        ]
+        for batch in _chunks(params, WRITE_BATCH_SIZE):
+            db.session.execute(stmt, batch)
+
+
+def _drop_orphans(rows, known_ids, table_key, result):
+    """跳过引用了不存在客户的明细行，开启外键约束后这些行会使整批写入失败"""
+    kept = []
+    for row in rows:
+        customer_id = row.get('customer_id')
+        if _is_valid_customer_id(customer_id) and customer_id not in known_ids:
+            logger.warning(f"{table_key}记录引用的客户 {customer_id} 不存在，跳过")
+            result['skipped'][table_key] += 1
+            continue
+        kept.append(row)
+    return kept
+
+
+def _known_customer_ids(data):
+    """返回明细数据中引用、且已存在于客户表中的客户ID"""
+    referenced = set()
+    for key in ('health_records', 'consumptions', 'services', 'communications'):
+        referenced.update(row.get('customer_id') for row in data.get(key, [])
+                          if _is_valid_customer_id(row.get('customer_id')))
+    known = set()
+    for chunk in _chunks(referenced):
+        known.update(db.session.execute(select(Customer.id).where(Customer.id.in_(chunk))).scalars())
+    return known
+
+
+def _split(model, key_columns, pk_column, incoming):
+    """将按自然键合并后的行拆分为待插入和待更新两组"""
+    customer_ids = {key[key_columns.index('customer_id')] for key in incoming}
+    existing = _load_existing(model, key_columns, pk_column, customer_ids)
+    inserts, updates = [], []
+    for key, row in incoming.items():
+        if key in existing:
+            updates.append(dict(row, **{pk_column: existing[key]}))
+        else:
+            inserts.append(row)
+    return inserts, updates
+
+
+def merge_customers(rows, result):
+    """合并客户数据，以客户ID为键"""
+    fields = _model_fields(Customer)
+    incoming = {}
+    for row in rows:
+        customer_id = row.get('id')
+        if isinstance(customer_id, str) and customer_id in HEADER_IDS:
+            continue
+        if not customer_id:
+            result['skipped']['customers'] += 1
+            continue
+        filtered = _filter_fields(row, fields)
+        incoming.setdefault(customer_id, {})
+        _merge_into(incoming[customer_id], filtered)
+        incoming[customer_id]['id'] = customer_id
+        result['customers'] += 1
+
+    existing = set()
+    for chunk in _chunks(incoming):
+        existing.update(db.session.execute(select(Customer.id).where(Customer.id.in_(chunk))).scalars())
+
+    inserts = [row for key, row in incoming.items() if key not in existing]
+    updates = [row for key, row in incoming.items() if key in existing]
+    _executemany_insert(Customer, inserts)
+    _executemany_update(Customer, 'id', updates)
+    logger.info(f"客户数据: 新增{len(inserts)}条, 更新{len(updates)}条")
+
+
+def merge_health_records(rows, result):
+    """合并健康档案，每位客户一条"""
+    fields = _model_fields(HealthRecord) - {'id'}
+    incoming = {}
+    for row in rows:
+        customer_id = row.get('customer_id')
+        if not _is_valid_customer_id(customer_id):
+            result['skipped']['health_records'] += 1
+            continue
+        key = (customer_id,)
+        incoming.setdefault(key, {})
+        _merge_into(incoming[key], _filter_fields(row, fields))
+        incoming[key]['customer_id'] = customer_id
+        result['health_records'] += 1
+
+    inserts, updates = _split(HealthRecord, ['customer_id'], 'id', incoming)
+    _executemany_insert(HealthRecord, inserts)
+    _executemany_update(HealthRecord, 'id', updates)
+    logger.info(f"健康档案: 新增{len(inserts)}条, 更新{len(updates)}条")
+
+
+def _merge_keyed(model, constraint_name, date_field, table_key, rows, result):
+    """按唯一约束合并消费记录/沟通记录这类以客户+时间为键的明细表"""
+    fields = _model_fields(model) - {'id'}
+    key_columns = _unique_key_columns(model, constraint_name)
+    incoming = {}
+    for row in rows:
+        customer_id = row.get('customer_id')
+        if not _is_valid_customer_id(customer_id):
+            result['skipped'][table_key] += 1
+            continue
+        filtered = _filter_fields(row, fields)
+        if not filtered.get(date_field):
+            logger.warning(f"跳过缺少{date_field}的{model.__tablename__}记录: {filtered}")
+            result['skipped'][table_key] += 1
+            continue
+        key = tuple(filtered.get(column) for column in key_columns)
+        incoming.setdefault(key, {})
+        _merge_into(incoming[key], filtered)
+        result[table_key] += 1
+
+    inserts, updates = _split(model, key_columns, 'id', incoming)
+    _executemany_insert(model, inserts)
+    _executemany_update(model, 'id', updates)
+    logger.info(f"{model.__tablename__}: 新增{len(inserts)}条, 更新{len(updates)}条")
+
+
+def merge_consumptions(rows, result):
+    """合并消费记录，键为uix_consumption_record"""
+    _merge_keyed(Consumption, 'uix_consumption_record', 'date', 'consumptions', rows, result)
+
+
+def merge_communications(rows, result):
+    """合并沟通记录，键为uix_communication_record"""
+    _merge_keyed(Communication, 'uix_communication_record', 'communication_date', 'communications', rows, result)
+
+
+def _normalize_service_item(item):
+    return {
+        'project_name': str(item['project_name']).strip(),
+        'beautician_name': (item.get('beautician_name') or '').strip(),
+        'unit_price': float(item.get('unit_price') or 0),
+        'is_specified': bool(item.get('is_specified', False)),
+    }
+
+
+def merge_services(rows, result):
+    """合并服务记录及其服务项目，服务键为uix_service_record"""
+    fields = _model_fields(Service)
+    key_columns = _unique_key_columns(Service, 'uix_service_record')
+    incoming = {}
+    incoming_items = defaultdict(list)
+    for row in rows:
+        customer_id = row.get('customer_id')
+        if not _is_valid_customer_id(customer_id):
+            result['skipped']['services'] += 1
+            continue
+        items = row.get('service_items') if isinstance(row.get('service_items'), list) else []
+        filtered = _filter_fields(row, fields)
+        filtered.pop('service_items', None)
+        if not filtered.get('service_date'):
+            logger.warning(f"服务记录缺少service_date字段，使用当前时间: {filtered}")
+            filtered['service_date'] = datetime.now()
+        if row.get('name') and not filtered.get('customer_name'):
+            filtered['customer_name'] = row['name']
+        key = tuple(filtered.get(column) for column in key_columns)
+        incoming.setdefault(key, {})
+        _merge_into(incoming[key], filtered)
+        incoming_items[key].extend(items)
+        result['services'] += 1
+
+    customer_ids = {row['customer_id'] for row in incoming.values()}
+    existing = _load_existing(Service, key_columns, 'service_id', customer_ids)
+
+    service_inserts, service_updates = [], []
+    service_ids = {}
+    for key, row in incoming.items():
+        if key in existing:
+            row.pop('service_id', None)
+            service_ids[key] = existing[key]
+            service_updates.append(dict(row, service_id=existing[key]))
+        else:
+            if not row.get('service_id'):
+                row['service_id'] = generate_service_id()
+            service_ids[key] = row['service_id']
+            service_inserts.append(row)
+
+    # 已存在服务的项目一次性加载
+    existing_items = {}
+    existing_counts = defaultdict(int)
+    existing_service_ids = [row['service_id'] for row in service_updates]
+    for chunk in _chunks(existing_service_ids):
+        stmt = select(ServiceItem.id, ServiceItem.service_id, ServiceItem.project_name,
+                      ServiceItem.beautician_name).where(ServiceItem.service_id.in_(chunk))
+        for item_id, service_id, project_name, beautician_name in db.session.execute(stmt):
+            existing_items.setdefault((service_id, project_name, beautician_name), item_id)
+            existing_counts[service_id] += 1
+
+    item_inserts, item_updates = [], []
+    staged_items = {}
+    for key, items in incoming_items.items():
+        service_id = service_ids[key]
+        for item_idx, item in enumerate(items):
+            if not item.get('project_name'):
+                logger.warning(f"服务项目 {item_idx+1} 缺少project_name字段，跳过: {item}")
+                result['skipped']['service_items'] += 1
+                continue
+            try:
+                item_row = dict(_normalize_service_item(item), service_id=service_id)
+            except (TypeError, ValueError) as e:
+                result['errors'].append(f"服务项目错误: {str(e)}")
+                result['skipped']['service_items'] += 1
+                continue
+            item_key = (service_id, item_row['project_name'], item_row['beautician_name'])
+            if item_key in existing_items:
+                item_updates.append(dict(item_row, id=existing_items[item_key]))
+            elif item_key in staged_items:
+                staged_items[item_key].update(item_row)
+            else:
+                staged_items[item_key] = item_row
+                item_inserts.append(item_row)
+                existing_counts[service_id] += 1
+            result['service_items'] += 1
+
+    # 按名称批量解析项目ID，解析不到的保留原值
+    project_ids, unresolved = get_project_catalog().resolve(row['project_name'] for row in item_inserts + item_updates)
+    for row in item_inserts + item_updates:
+        project_id = project_ids.get(row['project_name'])
+        if project_id:
+            row['project_id'] = project_id
+    # 逐批写入时各批的未解析名称合并
+    result['unresolved_projects'] = sorted(set(result['unresolved_projects']).union(unresolved))
+
+    # 服务项目数大于记录的总次数时，以实际项目数为准
+    for row in service_inserts + service_updates:
+        items_count = existing_counts.get(row['service_id'], 0)
+        if items_count > 0 and (not row.get('total_sessions') or row['total_sessions'] < items_count):
+            row['total_sessions'] = items_count
+
+    _executemany_insert(Service, service_inserts)
+    _executemany_update(Service, 'service_id', service_updates)
+    _executemany_insert(ServiceItem, item_inserts)
+    _executemany_update(ServiceItem, 'id', item_updates)
+    logger.info(f"服务记录: 新增{len(service_inserts)}条, 更新{len(service_updates)}条; "
+                f"服务项目: 新增{len(item_inserts)}条, 更新{len(item_updates)}条")
+
+
+# 数据类型 -> 合并写入函数，按此顺序写入：客户先于引用客户的明细
+MERGERS = [
+    ('customers', merge_customers),
+    ('health_records', merge_health_records),
+    ('consumptions', merge_consumptions),
+    ('services', merge_services),
+    ('communications', merge_communications),
+]
+
+
+def bulk_import_batches(batches, progress=None):
+    """
+    逐批合并写入ExcelProcessor.iter_file产出的数据，每批写入后提交
+
+    每批单独加载已有自然键并写入；前面批次已提交的行对后面批次可见，
+    不同批次中自然键相同的行按更新合并，结果与整体合并一致。客户需在引用它的明细之前写入。
+    写锁只在一批的写入期间持有，批次之间其他连接（任务进度、心跳、其他请求）可以写库。
+    中途失败时已提交的批次保留；各表按自然键合并，重新导入同一文件会收敛到完整结果。
+
+    Args:
+        batches: 可迭代的 (数据类型, 记录列表)
+        progress: 可选的进度回调，每批提交后调用 progress(数据类型, 记录数)
+
+    Returns:
+        dict: 各表导入统计，与原逐行导入返回结构一致
+    """
+    result = {
+        'customers': 0,
+        'health_records': 0,
+        'consumptions': 0,
+        'services': 0,
+        'communications': 0,
+        'service_items': 0,
+        'skipped': {
+            'customers': 0,
+            'health_records': 0,
+            'consumptions': 0,
+            'services': 0,
+            'communications': 0,
+            'service_items': 0
+        },
+        'errors': [],
+        'unresolved_projects': []
+    }
+    mergers = dict(MERGERS)
+
+    try:
+        for key, rows in batches:
+            count = len(rows)
+            if key != 'customers':
+                # 校验明细行引用的客户是否存在（含前面批次刚写入的客户）
+                rows = _drop_orphans(rows, _known_customer_ids({key: rows}), key, result)
+            mergers[key](rows, result)
+            db.session.commit()
+            if progress:
+                progress(key, count)
+        return result
+    except Exception as e:
+        db.session.rollback()
+        logger.exception(f"批量导入失败: {str(e)}")
+        result['errors'].append(f"数据库错误: {str(e)}")
+        raise
+
+
+def bulk_import(data):
+    """
+    将ExcelProcessor.process_file处理后的数据集合式写入数据库
+
+    Args:
+        data: 包含customers/health_records/consumptions/services/communications列表的字典
+
+    Returns:
+        dict: 各表导入统计，与原逐行导入返回结构一致
+    """
+    return bulk_import_batches((key, data.get(key, [])) for key, _ in MERGERS)
@@ -0,0 +1,117 @@
+"""
+响应压缩 - 按Accept-Encoding对较大的响应做gzip/brotli压缩
+
+小程序通过移动网络反复拉取客户列表、项目目录和客户详情，JSON文本压缩后通常只剩原来的
+10%-20%。在after_request中处理：
+- 只压缩COMPRESSIBLE_MIMETYPES中的类型，且响应体不小于COMPRESS_MIN_SIZE
+- 已安装brotli且客户端接受br时优先br，否则gzip
+- 流式响应和send_file等直接透传的响应不压缩
+- 带缓存条目的响应（见utils/response_cache）复用已压缩的响应体，缓存命中时不再压缩
+"""
+import gzip
+import logging
+
+from flask import request
+
+from utils.response_cache import cached_variant, store_variant
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，未安装时只用gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+}
+
+# 小于该字节数的响应不压缩，压缩后节省的流量抵不上开销
+DEFAULT_MIN_SIZE = 1024
+
+# gzip压缩级别(1-9)和brotli质量(0-11)，取压缩率和CPU的折中
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BR_LEVEL = 4
+
+
+def supported_encodings():
+    """服务端支持的编码，按优先级排列"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings):
+    """
+    按客户端Accept-Encoding选择编码
+
+    Args:
+        accept_encodings: werkzeug的Accept对象（request.accept_encodings）
+
+    Returns:
+        str: 'br'或'gzip'，客户端不接受压缩时返回None
+    """
+    best, best_quality = None, 0
+    for encoding in supported_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, gzip_level=DEFAULT_GZIP_LEVEL, br_level=DEFAULT_BR_LEVEL):
+    """压缩字节串，gzip头中不写时间戳，相同输入得到相同输出"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=br_level)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def _should_compress(response, min_size):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if not 200 <= response.status_code < 300 or response.status_code == 204:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    return response.content_length is not None and response.content_length >= min_size
+
+
+def init_compression(app):
+    """注册响应压缩，COMPRESS_ENABLED为False时不处理"""
+    gzip_level = app.config.get('COMPRESS_LEVEL', DEFAULT_GZIP_LEVEL)
+    br_level = app.config.get('COMPRESS_BR_LEVEL', DEFAULT_BR_LEVEL)
+    min_size = app.config.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)
+
+    @app.after_request
+    def compress_response(response):
+        if not app.config.get('COMPRESS_ENABLED', True) or request.method == 'HEAD':
+            return response
+        if not _should_compress(response, min_size):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        data = cached_variant(response, encoding)
+        if data is None:
+            data = compress(response.get_data(), encoding, gzip_level, br_level)
+            store_variant(response, encoding, data)
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        # 强ETag对应具体字节，压缩后要与未压缩的响应区分；弱ETag保持不变
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f"{etag}-{encoding}")
+        return response
+
+    if brotli is None:
+        logger.info("未安装brotli，响应压缩只使用gzip")
+    return app
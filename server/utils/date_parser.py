@@ -0,0 +1,175 @@
+"""
+日期解析工具 - 按列推断日期格式并带缓存的日期解析
+
+Excel中的到店时间、离店时间、消费时间等列格式通常整列一致且取值大量重复：
+- ColumnDateParser 对每列抽样推断一次格式，整列用 pd.to_datetime(format=...) 转换，
+  只有不符合该格式的少数单元格才逐个回退解析
+- parse_date 对单个值解析，字符串结果保存在有界的LRU缓存中
+"""
+import logging
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 支持的日期格式，按优先级排列
+DATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',  # 2023-01-01 12:30:45
+    '%Y-%m-%d %H:%M',     # 2023-01-01 12:30
+    '%Y/%m/%d %H:%M:%S',  # 2023/01/01 12:30:45
+    '%Y/%m/%d %H:%M',     # 2023/01/01 12:30
+    '%Y-%m-%d',           # 2023-01-01
+    '%Y/%m/%d',           # 2023/01/01
+    '%Y年%m月%d日 %H:%M',  # 2023年01月01日 12:30
+    '%Y年%m月%d日',        # 2023年01月01日
+    '%m/%d/%Y',           # 01/01/2023
+    '%d/%m/%Y',           # 01/01/2023
+]
+
+# 推断格式时每列抽样的值个数
+SAMPLE_SIZE = 50
+
+# 单值解析缓存的最大条目数
+CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_string(text, lenient):
+    """按DATE_FORMATS依次尝试解析字符串，lenient时最后交给pandas兜底"""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    if lenient:
+        try:
+            return pd.to_datetime(text).to_pydatetime()
+        except (ValueError, TypeError, OverflowError):
+            pass
+    return None
+
+
+def parse_date(value, lenient=False):
+    """
+    解析单个日期值为datetime对象
+
+    Args:
+        value: 字符串、datetime或pandas Timestamp
+        lenient: 所有格式都不匹配时是否尝试pandas的宽松解析
+
+    Returns:
+        datetime或None
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip()
+    if not text:
+        return None
+    result = _parse_string(text, lenient)
+    if result is None:
+        logger.warning(f"无法解析日期字符串: {text}")
+    return result
+
+
+def cache_info():
+    """单值解析缓存的命中统计"""
+    return _parse_string.cache_info()
+
+
+def infer_format(values):
+    """从样本值中选出能解析最多值的格式，没有任何格式适用时返回None"""
+    best_format, best_count = None, 0
+    for fmt in DATE_FORMATS:
+        parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+        count = int(parsed.notna().sum())
+        if count > best_count:
+            best_format, best_count = fmt, count
+            if count == len(values):
+                break
+    return best_format
+
+
+class ColumnDateParser:
+    """按列推断格式的日期解析器
+
+    同一列（按列名区分）只推断一次格式，多批数据共用；解析统计可用于导入结果
+    """
+
+    def __init__(self, lenient=True):
+        self.lenient = lenient
+        self.formats = {}
+        self.stats = {
+            'formats': {},
+            'parsed': 0,
+            'fallback': 0,
+            'failed': 0,
+        }
+        # 单值缓存在进程内共用，只累计本解析器回退解析期间的命中数和未命中数
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def parse(self, series, column=None):
+        """
+        将整列解析为datetime64，无法解析的值为NaT
+
+        Args:
+            series: 待解析的列
+            column: 列名，用于缓存推断出的格式，默认取series.name
+        """
+        column = column if column is not None else series.name
+        if pd.api.types.is_datetime64_any_dtype(series):
+            self.stats['parsed'] += int(series.notna().sum())
+            return series
+
+        present = series.notna()
+        if pd.api.types.is_string_dtype(series) and series.dtype != object:
+            is_text = present
+        else:
+            is_text = series.map(lambda v: isinstance(v, str))
+        text = series.where(~is_text, series.astype(str).str.strip())
+
+        result = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+
+        # 已经是日期对象的单元格直接转换
+        native = present & ~is_text
+        if native.any():
+            result[native] = pd.to_datetime(series[native], errors='coerce')
+
+        strings = text[present & is_text]
+        if len(strings):
+            fmt = self.formats.get(column)
+            if column not in self.formats:
+                fmt = infer_format(strings.drop_duplicates().head(SAMPLE_SIZE))
+                self.formats[column] = fmt
+                self.stats['formats'][str(column)] = fmt
+                logger.info(f"列'{column}'推断的日期格式: {fmt}")
+            if fmt:
+                result[strings.index] = pd.to_datetime(strings, format=fmt, errors='coerce')
+
+            # 不符合推断格式的单元格逐个回退解析
+            outliers = strings[result[strings.index].isna()]
+            if len(outliers):
+                self.stats['fallback'] += len(outliers)
+                before = cache_info()
+                fallback = outliers.map(lambda v: _parse_string(v, self.lenient))
+                after = cache_info()
+                self.cache_hits += after.hits - before.hits
+                self.cache_misses += after.misses - before.misses
+                fallback = pd.to_datetime(fallback, errors='coerce')
+                result[outliers.index] = fallback
+
+        parsed = int(result.notna().sum())
+        self.stats['parsed'] += parsed
+        self.stats['failed'] += int(present.sum()) - parsed
+        return result
+
+    def get_stats(self):
+        """返回本解析器的解析统计，包含回退解析的单值缓存命中情况"""
+        return dict(self.stats, cache={'hits': self.cache_hits, 'misses': self.cache_misses,
+                                       'size': cache_info().currsize})
@@ -3,55 +3,30 @@ Excel文件处理器 - 用于处理导入的Excel文件，提取数据并按照
 专门针对"模拟-客户信息档案.xlsx"标准模板格式优化
 """
 import os
+import numpy as np
 import pandas as pd
 import logging
 import re
 from datetime import datetime
 import traceback
 
+from utils.excel_reader import StreamingExcelReader, DEFAULT_BATCH_SIZE
+from utils.date_parser import ColumnDateParser, parse_date
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
-def parse_date(date_str):
-    """
-    解析日期字符串为datetime对象
-    支持多种格式的日期字符串
-    """
-    if not date_str or pd.isna(date_str):
-        return None
-    
-    if isinstance(date_str, datetime):
-        return date_str
-    
-    date_str = str(date_str).strip()
-    
-    # 尝试多种常见的日期格式
-    formats = [
-        '%Y-%m-%d %H:%M:%S',  # 2023-01-01 12:30:45
-        '%Y-%m-%d %H:%M',     # 2023-01-01 12:30
-        '%Y/%m/%d %H:%M:%S',  # 2023/01/01 12:30:45
-        '%Y/%m/%d %H:%M',     # 2023/01/01 12:30
-        '%Y-%m-%d',           # 2023-01-01
-        '%Y/%m/%d',           # 2023/01/01
-        '%Y年%m月%d日 %H:%M',  # 2023年01月01日 12:30
-        '%Y年%m月%d日',        # 2023年01月01日
-        '%m/%d/%Y',           # 01/01/2023
-        '%d/%m/%Y',           # 01/01/2023
-    ]
-    
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
-    
-    logger.warning(f"无法解析日期字符串: {date_str}")
-    return None
-
 class ExcelProcessor:
     """Excel文件处理器类"""
     
-    def __init__(self):
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        # 流式读取时每批的行数
+        self.batch_size = batch_size
+        # 表头 -> 字段映射缓存，同一Sheet页的各批数据共用
+        self._field_cache = {}
+        # 按列推断格式的日期解析器，解析统计随处理结果返回
+        self.date_parser = ColumnDateParser()
+
         # 客户表模板字段映射 - 根据"模拟-客户信息档案.xlsx"中的客户表格式
         self.customer_fields = {
             '客户ID': 'id',  # 直接使用Excel中的客户ID
@@ -132,7 +107,8 @@ class ExcelProcessor:
             '项目内容': 'service_items',  # 更新为与数据库模型匹配的字段名
             '操作美容师': 'beautician',  # 更新为与数据库模型匹配的字段名
             '耗卡金额': 'service_amount',  # 更新为与数据库模型匹配的字段名
-            '是否指定': 'is_specified'
+            '是否指定': 'is_specified',
+            '总消耗项目数': 'total_sessions'
         }
 
         # 沟通记录表模板字段映射 - 根据"模拟-客户信息档案.xlsx"中的沟通记录表格式
@@ -146,14 +122,44 @@ class ExcelProcessor:
             '沟通人员': 'staff'
         }
 
-    def process_file(self, filepath):
-        """处理Excel文件
+    def _match_sheets(self, sheet_names):
+        """根据Sheet页名称确定各类数据对应的Sheet页"""
+        def first(predicate):
+            return next((name for name in sheet_names if predicate(name)), None)
+
+        return {
+            'customers': first(lambda n: '客户' in n and ('基本' in n or '基础' in n)) or first(lambda n: n == '客户'),
+            'health_records': first(lambda n: '健康' in n or '档案' in n),
+            'consumptions': first(lambda n: '消费' in n and '记录' in n) or first(lambda n: '消费' in n),
+            'services': first(lambda n: '消耗' in n or ('服务' in n and '记录' in n)),
+            'communications': first(lambda n: '沟通' in n and '记录' in n),
+        }
+
+    def _sheet_pipeline(self):
+        """各类数据的处理函数与需要读取的列
+
+        沟通记录会按列名关键字兜底查找，读取全部列
+        """
+        return [
+            ('customers', self._process_customers, list(self.customer_fields)),
+            ('health_records', self._process_health_records, list(self.health_fields)),
+            ('consumptions', self._process_consumptions, list(self.consumption_fields)),
+            ('services', self._process_services, list(self.service_fields)),
+            ('communications', self._process_communications, None),
+        ]
+
+    def iter_file(self, filepath, progress=None):
+        """逐批处理Excel文件
+
+        使用流式读取器逐批读取匹配到的Sheet页，每批数据交给对应的处理函数后立即产出，
+        按客户、健康档案、消费、服务、沟通的顺序；调用方逐批写库时，内存占用只与批大小有关
 
         Args:
             filepath: Excel文件路径
+            progress: 可选的进度回调，每处理完一批调用 progress(sheet_name, rows)
 
-        Returns:
-            dict: 包含处理后数据的字典
+        Yields:
+            (数据类型, 记录列表)，数据类型为customers/health_records/consumptions/services/communications
         """
         logger.info(f"开始处理Excel文件: {filepath}")
 
@@ -162,243 +168,202 @@ class ExcelProcessor:
             raise FileNotFoundError(f"文件不存在: {filepath}")
 
         try:
-            # 读取Excel文件的所有sheet
-            logger.info(f"使用pandas读取Excel文件: {filepath}")
-            excel_data = pd.read_excel(filepath, sheet_name=None)
-
-            # 输出读取到的sheet名称
-            sheet_names = list(excel_data.keys())
-            logger.info(f"读取到的Sheet页: {sheet_names}")
-
-            processed_data = {
-                'customers': [],
-                'health_records': [],
-                'consumptions': [],
-                'services': [],
-                'communications': []
-            }
+            with StreamingExcelReader(filepath, batch_size=self.batch_size) as reader:
+                sheet_names = reader.sheet_names()
+                logger.info(f"读取到的Sheet页: {sheet_names}")
+                matched_sheets = self._match_sheets(sheet_names)
+
+                for key, handler, field_names in self._sheet_pipeline():
+                    sheet_name = matched_sheets[key]
+                    if sheet_name is None:
+                        logger.warning(f"没有找到{key}对应的Sheet页")
+                        continue
 
-            # 检查并处理客户信息sheet - 根据Excel中的表名调整
-            for sheet_name in sheet_names:
-                if '客户' in sheet_name and ('基本' in sheet_name or '基础' in sheet_name):
                     logger.info(f"开始处理'{sheet_name}'Sheet页")
-                    df = excel_data[sheet_name]
-                    logger.info(f"'{sheet_name}'列名: {list(df.columns)}")
-                    customers = self._process_customers(df)
-                    processed_data['customers'] = customers
-                    logger.info(f"处理客户信息完成，共{len(customers)}条记录")
-                    break
-            else:
-                # 如果没有找到包含"基本"或"基础"的客户表，尝试直接使用"客户"表
-                for sheet_name in sheet_names:
-                    if sheet_name == '客户':
-                        logger.info(f"尝试使用'{sheet_name}'Sheet页作为客户信息表")
-                        df = excel_data[sheet_name]
-                            logger.info(f"'{sheet_name}'列名: {list(df.columns)}")
-                        customers = self._process_customers(df)
-                        processed_data['customers'] = customers
-                        logger.info(f"处理客户信息完成，共{len(customers)}条记录")
-                        break
-            else:
-                    logger.warning("没有找到包含客户基本信息的Sheet页")
+                    count = 0
+                    for batch in reader.iter_batches(sheet_name, field_names):
+                        records = handler(batch)
+                        count += len(records)
+                        if progress:
+                            progress(sheet_name, len(batch))
+                        yield key, records
+                    logger.info(f"处理'{sheet_name}'完成，共{count}条记录")
+
+            logger.info(f"日期解析统计: {self.date_parser.get_stats()}")
+            logger.info(f"Excel文件处理完成: {filepath}")
 
-            # 处理健康档案sheet - 根据Excel中的表名调整
-                for sheet_name in sheet_names:
-                    if '健康' in sheet_name or '档案' in sheet_name:
-                    logger.info(f"开始处理'{sheet_name}'Sheet页")
-                        df = excel_data[sheet_name]
-                    health_records = self._process_health_records(df)
-                    processed_data['health_records'] = health_records
-                    logger.info(f"处理健康档案完成，共{len(health_records)}条记录")
-                        break
-            else:
-                logger.warning("没有找到包含健康档案的Sheet页")
+        except Exception as e:
+            logger.error(f"Excel文件处理错误: {str(e)}", exc_info=True)
+            raise e
 
-            # 处理消费记录sheet - 根据Excel中的表名调整
-                for sheet_name in sheet_names:
-                if '消费' in sheet_name and '记录' in sheet_name:
-                    logger.info(f"开始处理'{sheet_name}'Sheet页")
-                        df = excel_data[sheet_name]
-                    consumptions = self._process_consumptions(df)
-                    processed_data['consumptions'] = consumptions
-                    logger.info(f"处理消费记录完成，共{len(consumptions)}条记录")
-                        break
-            else:
-                # 如果没有找到包含"消费记录"的Sheet页，尝试直接使用"消费"表
-                for sheet_name in sheet_names:
-                    if sheet_name == '消费' or '消费' in sheet_name:
-                        logger.info(f"尝试使用'{sheet_name}'Sheet页作为消费记录表")
-                        df = excel_data[sheet_name]
-                        consumptions = self._process_consumptions(df)
-                        processed_data['consumptions'] = consumptions
-                        logger.info(f"处理消费记录完成，共{len(consumptions)}条记录")
-                        break
-                else:
-                    logger.warning("没有找到包含消费记录的Sheet页")
+    def process_file(self, filepath, progress=None):
+        """处理Excel文件，返回全部记录
 
-            # 处理服务记录sheet - 根据Excel中的表名调整
-            for sheet_name in sheet_names:
-                if '消耗' in sheet_name or ('服务' in sheet_name and '记录' in sheet_name):
-                    logger.info(f"开始处理'{sheet_name}'Sheet页")
-                    df = excel_data[sheet_name]
-                    services = self._process_services(df)
-                    processed_data['services'] = services
-                    logger.info(f"处理服务记录完成，共{len(services)}条记录")
-                    break
-            else:
-                logger.warning("没有找到包含服务记录的Sheet页")
+        各批记录汇总在内存中；导入数据库时使用iter_file逐批写入
 
-            # 处理沟通记录sheet - 根据Excel中的表名调整
-                for sheet_name in sheet_names:
-                if '沟通' in sheet_name and '记录' in sheet_name:
-                    logger.info(f"开始处理'{sheet_name}'Sheet页")
-                        df = excel_data[sheet_name]
-                    communications = self._process_communications(df)
-                    processed_data['communications'] = communications
-                    logger.info(f"处理沟通记录完成，共{len(communications)}条记录")
-                        break
-            else:
-                logger.warning("没有找到包含沟通记录的Sheet页")
-
-            # 输出处理统计信息
-            counts = {
-                '客户数量': len(processed_data['customers']),
-                '健康档案数量': len(processed_data['health_records']),
-                '消费记录数量': len(processed_data['consumptions']),
-                '服务记录数量': len(processed_data['services']),
-                '沟通记录数量': len(processed_data['communications']),
-            }
-            logger.info(f"Excel文件处理统计: {counts}")
+        Args:
+            filepath: Excel文件路径
+            progress: 可选的进度回调，每处理完一批调用 progress(sheet_name, rows)
 
-            logger.info(f"Excel文件处理完成: {filepath}")
-            return processed_data
+        Returns:
+            dict: 包含处理后数据的字典
+        """
+        processed_data = {
+            'customers': [],
+            'health_records': [],
+            'consumptions': [],
+            'services': [],
+            'communications': []
+        }
+        for key, records in self.iter_file(filepath, progress):
+            processed_data[key].extend(records)
+
+        # 输出处理统计信息
+        counts = {
+            '客户数量': len(processed_data['customers']),
+            '健康档案数量': len(processed_data['health_records']),
+            '消费记录数量': len(processed_data['consumptions']),
+            '服务记录数量': len(processed_data['services']),
+            '沟通记录数量': len(processed_data['communications']),
+        }
+        logger.info(f"Excel文件处理统计: {counts}")
 
-        except Exception as e:
-            logger.error(f"Excel文件处理错误: {str(e)}", exc_info=True)
-            raise e
+        processed_data['parse_stats'] = self.date_parser.get_stats()
+        return processed_data
+
+    def _resolve_fields(self, columns, field_mapping):
+        """
+        将表头解析为 {数据库字段: 列名}，每个字段取第一个包含该中文字段名的列
+
+        同一Sheet页的各批数据表头相同，解析结果按表头缓存，只计算一次
+        """
+        cache_key = (id(field_mapping), tuple(columns))
+        resolved = self._field_cache.get(cache_key)
+        if resolved is None:
+            resolved = {}
+            for excel_field, db_field in field_mapping.items():
+                for col in columns:
+                    if excel_field in str(col):
+                        resolved[db_field] = col
+                        break
+            self._field_cache[cache_key] = resolved
+            logger.info(f"列名解析结果: {resolved}")
+        return resolved
+
+    @staticmethod
+    def _column_to_text(series, strip=True):
+        """整列转换为字符串，空值为None"""
+        mask = series.notna()
+        text = series.astype(str)
+        if strip:
+            text = text.str.strip()
+        return text.astype(object).where(mask, None)
+
+    @staticmethod
+    def _column_to_int(series):
+        """整列转换为整数(Int64)，无法转换的值为None"""
+        numbers = np.trunc(pd.to_numeric(series, errors='coerce')).astype('Int64').astype(object)
+        return numbers.where(numbers.notna(), None)
 
     def _process_customers(self, df):
         """
         处理客户数据 DataFrame
+
+        表头到字段的映射每个Sheet页只解析一次，类型转换按整列完成
         """
-        logger.info("开始处理客户数据")
-        logger.info(f"DataFrame形状: {df.shape}")
-        
-        # 打印前几行数据的信息，帮助调试
-        logger.info(f"DataFrame前2行数据类型: {df.dtypes}")
-        logger.info(f"DataFrame前2行数据: \n{df.head(2)}")
-        
+        logger.info(f"开始处理客户数据, DataFrame形状: {df.shape}")
+
         # 检查第一行是否为标题行
-        first_row = df.iloc[0].astype(str).tolist()
-        logger.info(f"第一行内容: {first_row}")
-        
-        if any('客户ID' in str(val) or '姓名' in str(val) for val in first_row):
-            logger.info("第一行是标题行，将作为新的列名")
-            columns = df.iloc[0].astype(str).tolist()
-            df = df[1:]  # 删除旧标题行
-            df.columns = columns  # 设置新标题行
-            df = df.reset_index(drop=True)  # 重置索引
-            logger.info(f"新列名: {list(df.columns)}")
-        
-        customers = []
-        skipped_count = 0
-        
-        for i, row in df.iterrows():
-            customer = {}
-            
-            # 检查客户ID
-            customer_id = row.get('客户ID')
-            if customer_id is None or pd.isna(customer_id) or (isinstance(customer_id, str) and customer_id.strip() in ['客户ID', 'ID', '']):
-                logger.warning(f"跳过第{i+1}行：客户ID为空或无效")
-                skipped_count += 1
-                continue
-            
-            # 确保ID是字符串
-            customer_id = str(customer_id).strip()
-            logger.info(f"处理客户ID: {customer_id}")
-            
-            # 映射字段
-            for excel_field, db_field in self.customer_fields.items():
-                for col in df.columns:
-                    if excel_field in str(col):
-                        value = row.get(col)
-                        
-                        # 处理常见的空值情况
-                        if value is None or pd.isna(value):
-                            customer[db_field] = None
-                            continue
-                            
-                        # 处理数值型字段
-                        if db_field == 'age' and not pd.isna(value):
-                            try:
-                                customer[db_field] = int(value) if pd.notna(value) else None
-                            except (ValueError, TypeError):
-                                logger.warning(f"无法将年龄值转换为整数: {value}")
-                                customer[db_field] = None
-                        else:
-                            customer[db_field] = str(value).strip() if pd.notna(value) else None
-                        
-                        break  # 找到匹配的列后不再继续查找
-            
-            # 添加客户记录
-            customers.append(customer)
-        
+        if df.shape[0] > 0:
+            first_row = [str(val) for val in df.iloc[0]]
+            if any('客户ID' in val or '姓名' in val for val in first_row):
+                logger.info("第一行是标题行，将作为新的列名")
+                columns = first_row
+                df = df[1:]
+                df.columns = columns
+                df = df.reset_index(drop=True)
+
+        if '客户ID' not in df.columns:
+            logger.warning(f"客户表缺少'客户ID'列: {list(df.columns)}")
+            return []
+
+        # 过滤客户ID为空或无效的行
+        ids = self._column_to_text(df['客户ID'])
+        valid = ids.notna() & ~ids.isin(['客户ID', 'ID', ''])
+        skipped_count = int((~valid).sum())
+        df = df[valid]
+
+        resolved = self._resolve_fields(df.columns, self.customer_fields)
+        out = pd.DataFrame(index=df.index)
+        for db_field, col in resolved.items():
+            series = df[col]
+            if isinstance(series, pd.DataFrame):
+                series = series.iloc[:, 0]
+            if db_field == 'age':
+                out[db_field] = self._column_to_int(series)
+            else:
+                out[db_field] = self._column_to_text(series)
+
+        customers = out.to_dict('records')
+
         logger.info(f"处理完成: 共处理{len(customers)}条客户记录，跳过{skipped_count}条无效记录")
-        
-        # 记录一些处理后的客户ID信息以便调试
         if customers:
-            sample_ids = [customer.get('id') for customer in customers[:min(3, len(customers))]]
+            sample_ids = [customer.get('id') for customer in customers[:3]]
             logger.info(f"处理后的客户ID样本: {sample_ids}")
-        
+
         return customers
 
     def _process_health_records(self, df):
-        """处理健康档案记录"""
+        """处理健康档案记录
+
+        列名映射每个Sheet页只解析一次，清洗按整列完成
+        """
         logger.info("开始处理健康档案记录")
 
         # 检查头部行是否是标题
         if df.shape[0] > 0 and isinstance(df.iloc[0, 0], str) and ('客户ID' in df.iloc[0, 0] or 'ID' in df.iloc[0, 0]):
             logger.info("检测到第一行是标题行，将其作为新的列名")
-            # 将首行设为表头
             new_header = df.iloc[0]
-            df = df[1:]  # 删除旧标题行
-            df.columns = new_header  # 设置新标题行
-            df = df.reset_index(drop=True)  # 重置索引
-            logger.info(f"新的列名: {list(df.columns)}")
+            df = df[1:]
+            df.columns = new_header
+            df = df.reset_index(drop=True)
 
         # 反向映射中文列名到英文字段
-        df = self._rename_columns(df, self.health_fields)
-
-        # 转换为字典列表
-        health_records = []
-        for _, row in df.iterrows():
-            # 验证是否有客户ID
-            if pd.isna(row.get('customer_id')):
-                logger.warning(f"跳过没有客户ID的健康记录行: {row.to_dict()}")
+        cache_key = (id(self.health_fields), 'rename', tuple(df.columns))
+        renamed = self._field_cache.get(cache_key)
+        if renamed is None:
+            renamed = list(self._rename_columns(df.head(0), self.health_fields).columns)
+            self._field_cache[cache_key] = renamed
+        df = df.set_axis(renamed, axis=1)
+
+        if 'customer_id' not in df.columns:
+            logger.warning(f"健康档案表缺少客户ID列: {list(df.columns)}")
+            return []
+
+        wanted = set(self.health_fields.values())
+        out = pd.DataFrame(index=df.index)
+        # 同名字段出现多列时以最后一列为准，与逐行处理时的覆盖顺序一致
+        for position, field in enumerate(df.columns):
+            if field not in wanted:
                 continue
-                
-            # 转换并清洗数据
-            record = {}
-            for field, value in row.items():
-                # 跳过不在字段映射中的列，但保留customer_id和name
-                if field not in self.health_fields.values() and field not in ['customer_id', 'name']:
-                    continue
-                
-            # 处理空值
-                if pd.isna(value):
-                    record[field] = None
-                    continue
-                
-                # 清洗数据
-                if field == 'customer_id':
-                    # 确保客户ID是字符串格式
-                    record[field] = str(value).strip()
-                else:
-                    # 其他字段保持原样，但确保字符串类型
-                    record[field] = str(value) if isinstance(value, (str, int, float)) else None
-            
-            health_records.append(record)
-            
+            series = df.iloc[:, position]
+            if field == 'customer_id':
+                out[field] = self._column_to_text(series)
+            elif series.dtype == object or pd.api.types.is_string_dtype(series):
+                # 只保留字符串和数值，其他类型（如日期）置空
+                keep = series.map(lambda v: isinstance(v, (str, int, float)))
+                out[field] = self._column_to_text(series, strip=False).where(keep, None)
+            elif pd.api.types.is_numeric_dtype(series):
+                out[field] = self._column_to_text(series, strip=False)
+            else:
+                out[field] = pd.Series([None] * len(df), index=df.index, dtype=object)
+
+        # 验证是否有客户ID
+        valid = out['customer_id'].notna()
+        if not valid.all():
+            logger.warning(f"跳过{int((~valid).sum())}条没有客户ID的健康记录")
+        health_records = out[valid].to_dict('records')
+
         logger.info(f"处理健康档案记录完成，共{len(health_records)}条记录")
         return health_records
 
@@ -419,6 +384,10 @@ class ExcelProcessor:
         # 反向映射中文列名到英文字段
         df = self._rename_columns(df, self.consumption_fields)
 
+        # 日期列整列解析，逐行处理时只需处理解析失败的个别单元格
+        df = self._preparse_dates(df, 'date')
+        df = self._preparse_dates(df, 'completion_date')
+
         # 转换为字典列表
         consumptions = []
         for _, row in df.iterrows():
@@ -481,7 +450,7 @@ class ExcelProcessor:
                             consumption[field] = int(sessions_str)
                         elif isinstance(value, (int, float)):
                             consumption[field] = int(value)
-                else:
+                        else:
                             consumption[field] = int(value) if not pd.isna(value) else None
                         logger.info(f"提取总次数: 原始值 {value} -> {consumption[field]}")
                     except (ValueError, TypeError) as e:
@@ -517,248 +486,199 @@ class ExcelProcessor:
         logger.info(f"处理消费记录完成，共{len(consumptions)}条记录")
         return consumptions
 
+    # 服务记录中每个项目组包含的列（表头名 -> 字段名）
+    SERVICE_ITEM_GROUP = {
+        '项目内容': 'project_name',
+        '操作美容师': 'beautician_name',
+        '耗卡金额': 'unit_price',
+        '是否指定': 'is_specified',
+    }
+
+    # 表示"已指定美容师"的取值
+    SPECIFIED_VALUES = ['✓', '√', '是', 'Yes', 'yes', 'TRUE', 'true', 'True', '1', 'Y', 'y']
+
+    @staticmethod
+    def _header_base(name):
+        """去掉重复表头的.1/.2后缀"""
+        return re.sub(r'\.\d+$', '', str(name).strip())
+
+    def _locate_service_header(self, df):
+        """确保列名为标题行；标题行仍在数据中时（前三行内包含"客户ID"的行）将其提升为列名"""
+        if any('客户ID' in str(col) for col in df.columns):
+            return df
+        for i in range(min(3, len(df))):
+            row_values = df.iloc[i].tolist()
+            if any('客户ID' in str(val) for val in row_values if not pd.isna(val)):
+                logger.info(f"找到标题行: 第{i+1}行, 数据从第{i+2}行开始")
+                seen = {}
+                header = []
+                for idx, val in enumerate(row_values):
+                    name = f"Unnamed: {idx}" if pd.isna(val) else str(val).strip()
+                    if name in seen:
+                        seen[name] += 1
+                        name = f"{name}.{seen[name]}"
+                    else:
+                        seen[name] = 0
+                    header.append(name)
+                df = df.iloc[i + 1:].reset_index(drop=True)
+                df.columns = header
+                return df
+        return None
+
+    def _detect_item_groups(self, columns):
+        """
+        从表头识别重复的项目组，支持任意数量的组
+
+        每个"项目内容"列开启一组，组内其余字段取其后、下一个"项目内容"之前的同名列
+
+        Returns:
+            list: 每组为 {字段名: 列名}
+        """
+        groups = []
+        for col in columns:
+            field = self.SERVICE_ITEM_GROUP.get(self._header_base(col))
+            if field is None:
+                continue
+            if field == 'project_name':
+                groups.append({})
+            if groups and field not in groups[-1]:
+                groups[-1][field] = col
+        return groups
+
+    def _to_datetime_column(self, series):
+        """整列解析为日期时间，无法解析的值为NaT"""
+        return self.date_parser.parse(series)
+
+    def _preparse_dates(self, df, column):
+        """预先按列解析日期列，解析失败的单元格保留原值交给逐行逻辑处理"""
+        if column not in df.columns or isinstance(df[column], pd.DataFrame):
+            return df
+        parsed = self.date_parser.parse(df[column], column)
+        df = df.copy()
+        df[column] = parsed.astype(object).where(parsed.notna(), df[column])
+        return df
+
     def _process_services(self, df):
         """
         处理服务记录数据，按照一行基础信息配合多个服务项目组的模式处理
-        优化处理逻辑，使用更直接的索引方式，提高对Excel特殊结构的兼容性
-        完全重构的服务记录清洗逻辑，基于测试脚本的成功导入经验
+
+        项目组从表头识别（任意N组），通过一次reshape转为长表后按列转换类型，
+        再按行号分组回填到各服务记录，不再逐行逐格处理
         """
         services = []
-        
+
         try:
-            # 记录DataFrame的形状和原始列名
-            logger.info(f"DataFrame形状: {df.shape}")
-            logger.info(f"原始列名: {list(df.columns)}")
-            
-            # 直接使用原始数据(不使用pandas默认的列名处理)
-            # 创建一个没有预设标题行的数据框
-            raw_df = pd.DataFrame(df.values, columns=range(df.shape[1]))
-            
-            # 根据观察到的数据结构，直接使用第1行作为标题行，从第2行开始作为数据
-            header_row = None
-            data_start_row = 0
-            
-            # 检查前三行，寻找包含"客户ID"的行作为标题行
-            for i in range(min(3, len(raw_df))):
-                row_values = raw_df.iloc[i].tolist()
-                # 检查是否包含客户ID列
-                if any(["客户ID" in str(val) if not pd.isna(val) else False for val in row_values]):
-                    header_row = i
-                    data_start_row = i + 1
-                    logger.info(f"找到标题行: 第{header_row+1}行, 数据从第{data_start_row+1}行开始")
-                    break
-            
-            if header_row is None:
+            logger.info(f"开始处理服务记录, DataFrame形状: {df.shape}")
+
+            df = self._locate_service_header(df)
+            if df is None:
                 logger.warning("未能找到包含'客户ID'的标题行，将使用默认处理方式")
                 return services
-            
-            # 将关键列索引映射到易于理解的变量名
-            customer_id_col = 0      # 客户ID
-            customer_name_col = 1    # 姓名
-            arrival_time_col = 2     # 到店时间
-            departure_time_col = 3   # 离店时间
-            total_projects_col = 4   # 总消耗项目数
-            total_amount_col = 5     # 总耗卡金额
-            satisfaction_col = 6     # 服务满意度
-            
-            # 服务项目组，每组4列(项目内容、操作美容师、耗卡金额、是否指定)
-            project_groups = [
-                {"name": 7, "beautician": 8, "amount": 9, "specified": 10},
-                {"name": 11, "beautician": 12, "amount": 13, "specified": 14},
-                {"name": 15, "beautician": 16, "amount": 17, "specified": 18},
-                {"name": 19, "beautician": 20, "amount": 21, "specified": 22},
-                {"name": 23, "beautician": 24, "amount": 25, "specified": 26}
+
+            base_fields = {
+                '客户ID': 'customer_id',
+                '姓名': 'name',
+                '到店时间': 'service_date',
+                '离店时间': 'departure_time',
+                '总消耗项目数': 'total_sessions',
+                '总耗卡金额': 'total_amount',
+                '服务满意度': 'satisfaction',
+            }
+            base_columns = {}
+            for col in df.columns:
+                field = base_fields.get(self._header_base(col))
+                if field and field not in base_columns:
+                    base_columns[field] = col
+            if 'customer_id' not in base_columns or 'service_date' not in base_columns:
+                logger.warning(f"服务记录缺少客户ID或到店时间列: {list(df.columns)}")
+                return services
+
+            def column(field):
+                if field in base_columns:
+                    return df[base_columns[field]]
+                return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+            # 基础信息按列转换
+            base = pd.DataFrame(index=df.index)
+            base['customer_id'] = self._column_to_text(column('customer_id'))
+            base['service_date'] = self._to_datetime_column(column('service_date'))
+            base = base[base['customer_id'].notna() & base['service_date'].notna()]
+            df = df.loc[base.index]
+
+            names = self._column_to_text(column('name'))
+            base['name'] = names.where(names.notna(), '客户' + base['customer_id'])
+            departure = self._to_datetime_column(column('departure_time'))
+            sessions = column('total_sessions')
+            if sessions.dtype == object or pd.api.types.is_string_dtype(sessions):
+                sessions = sessions.astype(str).str.replace('次', '', regex=False).str.strip().where(sessions.notna())
+            base['total_sessions'] = pd.to_numeric(sessions, errors='coerce').fillna(0).astype(int)
+            base['total_amount'] = pd.to_numeric(column('total_amount'), errors='coerce').fillna(0.0).astype(float)
+            base['satisfaction'] = self._column_to_text(column('satisfaction'), strip=False)
+
+            # 项目组宽表 -> 长表：(行数, N组, 4列) 一次reshape为 (行数*N, 4)
+            groups = self._detect_item_groups(df.columns)
+            item_fields = list(self.SERVICE_ITEM_GROUP.values())
+            logger.info(f"识别到{len(groups)}个项目组")
+
+            items_by_row = {}
+            item_count = 0
+            if groups and len(df):
+                blank = pd.Series([None] * len(df), index=df.index, dtype=object)
+                wide = [
+                    (df[group[field]] if field in group else blank).to_numpy(dtype=object)
+                    for group in groups for field in item_fields
+                ]
+                stacked = np.stack(wide, axis=1).reshape(len(df) * len(groups), len(item_fields))
+                items = pd.DataFrame(stacked, columns=item_fields)
+                items['row'] = np.repeat(np.arange(len(df)), len(groups))
+
+                project_names = self._column_to_text(items['project_name'])
+                items = items[project_names.notna() & (project_names != '')]
+                items['project_name'] = project_names.loc[items.index]
+
+                beauticians = self._column_to_text(items['beautician_name'])
+                items['beautician_name'] = beauticians.where(beauticians.notna(), '')
+                items['unit_price'] = pd.to_numeric(items['unit_price'], errors='coerce').fillna(0.0).astype(float)
+                specified = items['is_specified']
+                specified_text = specified.astype(str).str.strip()
+                specified_number = pd.to_numeric(specified, errors='coerce')
+                items['is_specified'] = specified.notna() & (
+                    specified_text.isin(self.SPECIFIED_VALUES) | specified_number.fillna(0).ne(0)
+                )
+
+                records = items[item_fields].to_dict('records')
+                for row, positions in items.groupby('row', sort=False).indices.items():
+                    items_by_row[row] = [records[pos] for pos in positions]
+                item_count = len(records)
+
+            service_dates = [value.to_pydatetime() for value in base['service_date']]
+            departure_times = departure.loc[base.index]
+            departure_values = [
+                None if pd.isna(value) else pd.Timestamp(value).to_pydatetime()
+                for value in departure_times
             ]
-            
-            logger.info(f"使用第{data_start_row+1}行开始作为数据，第{header_row+1}行作为标题")
-            
-            # 导入服务记录
-            imported_services = 0
-            imported_items = 0
-            
-            # 处理每一行数据
-            for row_idx in range(data_start_row, raw_df.shape[0]):
-                try:
-                    row = raw_df.iloc[row_idx]
-                    
-                    # 获取客户ID
-                    customer_id = row[customer_id_col]
-                    if pd.isna(customer_id):
-                        continue  # 跳过没有客户ID的行
-                    
-                    customer_id = str(customer_id).strip()
-                    customer_name = str(row[customer_name_col]).strip() if not pd.isna(row[customer_name_col]) else f"客户{customer_id}"
-                    
-                    logger.info(f"处理客户: {customer_id} - {customer_name}")
-                    
-                    # 解析到店时间
-                    arrival_time = row[arrival_time_col]
-                    if pd.isna(arrival_time):
-                        continue  # 无到店时间，跳过
-                    
-                    # 解析日期时间
-                    try:
-                        if isinstance(arrival_time, str):
-                            if '/' in arrival_time:
-                                arrival_dt = datetime.strptime(arrival_time, "%Y/%m/%d %H:%M")
-                            else:
-                                arrival_dt = datetime.strptime(arrival_time, "%Y-%m-%d %H:%M")
-                        else:
-                            arrival_dt = pd.to_datetime(arrival_time).to_pydatetime()
-                        
-                        service_date = arrival_dt
-                    except Exception as e:
-                        logger.warning(f"解析到店时间出错 [{arrival_time}]: {str(e)}")
-                        continue
-                    
-                    # 解析离店时间
-                    departure_time = row[departure_time_col]
-                    departure_time_obj = None
-                    if not pd.isna(departure_time):
-                        try:
-                            if isinstance(departure_time, str):
-                                if '/' in departure_time:
-                                    departure_dt = datetime.strptime(departure_time, "%Y/%m/%d %H:%M")
-                                else:
-                                    departure_dt = datetime.strptime(departure_time, "%Y-%m-%d %H:%M")
-                else:
-                                departure_dt = pd.to_datetime(departure_time).to_pydatetime()
-                            
-                            departure_time_obj = departure_dt
-                        except Exception as e:
-                            logger.warning(f"解析离店时间出错 [{departure_time}]: {str(e)}")
-                    
-                    # 获取总项目数
-                    total_sessions = 0
-                    total_projects = row[total_projects_col]
-                    if not pd.isna(total_projects):
-                        try:
-                            if isinstance(total_projects, str):
-                                # 处理可能的"次"字符
-                                total_projects_str = total_projects.replace("次", "").strip()
-                                total_sessions = int(float(total_projects_str))
-                        else:
-                                total_sessions = int(total_projects)
-                        except Exception as e:
-                            logger.warning(f"解析总项目数出错 [{total_projects}]: {str(e)}")
-                    
-                    # 获取总金额
-                    total_amount = 0.0
-                    amount_val = row[total_amount_col]
-                    if not pd.isna(amount_val):
-                        try:
-                            total_amount = float(amount_val)
-                        except Exception as e:
-                            logger.warning(f"解析总金额出错 [{amount_val}]: {str(e)}")
-                    
-                    # 获取满意度
-                    satisfaction = None
-                    satisfaction_val = row[satisfaction_col]
-                    if not pd.isna(satisfaction_val):
-                        satisfaction = str(satisfaction_val)
-                    
-                    # 创建服务项目列表
-                    service_items = []
-                    
-                    # 记录所有项目栏位的值
-                    logger.info(f"项目组数据: 项目1={row[7] if 7 < len(row) else 'N/A'}, 项目2={row[11] if 11 < len(row) else 'N/A'}, 项目3={row[15] if 15 < len(row) else 'N/A'}")
-                    
-                    # 处理项目组
-                    for group in project_groups:
-                        try:
-                            # 确保索引在有效范围内
-                            if group["name"] >= len(row):
-                                logger.warning(f"项目名称索引 {group['name']} 超出行长度 {len(row)}")
-                                continue
-                            
-                            project_name_val = row[group["name"]]
-                            
-                            # 跳过空项目
-                            if pd.isna(project_name_val) or not str(project_name_val).strip():
-                                continue
-                            
-                            project_name = str(project_name_val).strip()
-                            logger.info(f"发现项目名称: {project_name}")
-                            
-                            # 获取美容师
-                            beautician_name = ""
-                            if group["beautician"] < len(row):
-                                beautician_val = row[group["beautician"]]
-                                if not pd.isna(beautician_val):
-                                    beautician_name = str(beautician_val).strip()
-                            
-                            # 获取金额
-                            unit_price = 0.0
-                            if group["amount"] < len(row):
-                                price_val = row[group["amount"]]
-                                if not pd.isna(price_val):
-                                    try:
-                                        unit_price = float(price_val)
-                    except:
-                                        logger.warning(f"解析项目金额出错 [{price_val}]")
-                            
-                            # 获取是否指定
-                            is_specified = False
-                            if group["specified"] < len(row):
-                                specified_val = row[group["specified"]]
-                                if not pd.isna(specified_val):
-                                    if isinstance(specified_val, str):
-                                        is_specified = specified_val.strip() in ['✓', '√', '是', 'Yes', 'yes', 'TRUE', 'true', 'True', '1', 'Y', 'y']
-                else:
-                                        is_specified = bool(specified_val)
-                            
-                            # 使用有意义的字段名存储项目数据
-                            service_item = {
-                                'project_name': project_name,  # 明确使用project_name作为项目名称字段
-                                'beautician_name': beautician_name,
-                                'unit_price': unit_price,
-                                'is_specified': is_specified
-                            }
-                            
-                            service_items.append(service_item)
-                            
-                            imported_items += 1
-                            logger.info(f"创建服务项目: {project_name} - {beautician_name} - {unit_price}元 - {'指定' if is_specified else '未指定'}")
-                        except Exception as e:
-                            logger.warning(f"处理项目组时出错: {str(e)}")
-                            logger.warning(f"行内容: {row}")
-                            continue
-                    
-                    # 记录服务项目总数
-                    logger.info(f"解析出服务项目数: {len(service_items)}")
-                    
-                    # 如果没有找到有效的项目数，则使用实际项目数
-                    if total_sessions == 0 and service_items:
-                        total_sessions = len(service_items)
-                        logger.info(f"使用实际项目数 {total_sessions} 代替总次数")
-                    
-                    # 创建服务记录
-                    service_record = {
-                        'customer_id': customer_id,
-                        'name': customer_name,
-                        'service_date': service_date,
-                        'departure_time': departure_time_obj,
-                        'total_amount': total_amount,
-                        'total_sessions': total_sessions,
-                        'satisfaction': satisfaction,
-                        'service_items': service_items
-                    }
-                    
-                    services.append(service_record)
-                    
-                    imported_services += 1
-                    logger.info(f"创建服务记录: 客户ID={customer_id}, 项目数={len(service_items)}")
-                
-            except Exception as e:
-                    logger.error(f"处理行 {row_idx} 时出错: {str(e)}")
-                    logger.error(traceback.format_exc())
-            
-            logger.info(f"服务记录处理完成: 共处理 {imported_services} 条记录, {imported_items} 个服务项目")
-            
-            except Exception as e:
+
+            for row, record in enumerate(base.drop(columns=['service_date']).to_dict('records')):
+                service_items = items_by_row.get(row, [])
+                # 如果没有找到有效的项目数，则使用实际项目数
+                total_sessions = record['total_sessions'] or len(service_items)
+                services.append({
+                    'customer_id': record['customer_id'],
+                    'name': record['name'],
+                    'service_date': service_dates[row],
+                    'departure_time': departure_values[row],
+                    'total_amount': record['total_amount'],
+                    'total_sessions': int(total_sessions),
+                    'satisfaction': record['satisfaction'],
+                    'service_items': service_items
+                })
+
+            logger.info(f"服务记录处理完成: 共处理 {len(services)} 条记录, {item_count} 个服务项目")
+
+        except Exception as e:
             logger.error(f"处理服务记录时出错: {str(e)}")
             logger.error(traceback.format_exc())
-        
+
         return services
 
     def _get_value_safe(self, row, column):
@@ -802,7 +722,8 @@ class ExcelProcessor:
             # 检查第一行是否包含标题信息
             if df.shape[0] > 0:
                 first_row = df.iloc[0].tolist()
-                if '客户ID' in first_row or any('沟通' in str(val) for val in first_row):
+                # 表头已由流式读取器定位，这里只处理残留的重复标题行
+                if '客户ID' in first_row:
                     logger.info(f"第一行内容: {first_row}")
                     logger.info("第一行是标题行，将使用第一行作为新的列名")
                     
@@ -826,6 +747,12 @@ class ExcelProcessor:
             }
             
             logger.info(f"沟通记录字段映射: {field_mapping}")
+
+            # 沟通时间列整列解析
+            for col in df.columns:
+                if '沟通时间' in str(col):
+                    df = self._preparse_dates(df, col)
+                    break
             
             # 处理每一行
             for idx, row in df.iterrows():
@@ -922,31 +849,8 @@ class ExcelProcessor:
                     return self._parse_datetime(val)
             return None
             
-                if pd.isna(value):
-            return None
-            
-        try:
-            if isinstance(value, str):
-                # 尝试从字符串解析日期
-                date_formats = ['%Y/%m/%d %H:%M', '%Y-%m-%d %H:%M', '%Y/%m/%d', '%Y-%m-%d']
-                for fmt in date_formats:
-                    try:
-                        return datetime.strptime(value, fmt)
-                    except ValueError:
-                        continue
-                # 如果标准格式都失败，尝试更灵活的格式
-                try:
-                    return pd.to_datetime(value).to_pydatetime()
-                except:
-                    logger.warning(f"无法解析日期时间: {value}")
-                    return None
-            elif isinstance(value, (datetime, pd.Timestamp)):
-                return pd.to_datetime(value).to_pydatetime()
-            else:
-                return None
-            except Exception as e:
-            logger.warning(f"处理日期时间异常: {str(e)}")
-            return None
+        # 字符串按常用格式解析（带缓存），都不匹配时交给pandas兜底
+        return parse_date(value, lenient=True)
             
     def _parse_float(self, value):
         """解析浮点数值"""
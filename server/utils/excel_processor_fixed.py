@@ -9,51 +9,11 @@ import re
 from datetime import datetime
 import traceback
 
+from utils.date_parser import parse_date
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
-def parse_date(date_str):
-    """
-    解析日期字符串为datetime对象
-    支持多种格式的日期字符串
-    """
-    if not date_str or pd.isna(date_str):
-        return None
-    
-    if isinstance(date_str, datetime):
-        return date_str
-    
-    date_str = str(date_str).strip()
-    
-    # 尝试多种常见的日期格式
-    formats = [
-        '%Y-%m-%d %H:%M:%S',  # 2023-01-01 12:30:45
-        '%Y-%m-%d %H:%M',     # 2023-01-01 12:30
-        '%Y/%m/%d %H:%M:%S',  # 2023/01/01 12:30:45
-        '%Y/%m/%d %H:%M',     # 2023/01/01 12:30
-        '%Y-%m-%d',           # 2023-01-01
-        '%Y/%m/%d',           # 2023/01/01
-        '%Y年%m月%d日 %H:%M',  # 2023年01月01日 12:30
-        '%Y年%m月%d日',        # 2023年01月01日
-        '%m/%d/%Y',           # 01/01/2023
-        '%d/%m/%Y',           # 01/01/2023
-    ]
-    
-    for fmt in formats:
-        try:
-
-            pass
-
-        except Exception as e:
-
-            print(f"错误: {str(e)}")
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            pass  # 原来是continue
-    
-    logger.warning(f"无法解析日期字符串: {date_str}")
-    return None
-
 class ExcelProcessor:
     """Excel文件处理器类"""
     
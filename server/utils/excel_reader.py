@@ -0,0 +1,151 @@
+"""
+流式Excel读取器 - 以固定内存逐批读取工作表
+
+基于openpyxl的read_only模式逐行读取，只读取被匹配到的Sheet页和需要的列，
+每累计batch_size行产出一个DataFrame，峰值内存只与批大小相关，与工作簿大小无关。
+.xls文件openpyxl无法读取，此时退化为按Sheet页单独调用pandas读取后再分批产出。
+"""
+import os
+import logging
+
+import pandas as pd
+from openpyxl import load_workbook
+
+logger = logging.getLogger(__name__)
+
+# 默认每批行数
+DEFAULT_BATCH_SIZE = 2000
+
+# 在前几行中查找表头
+HEADER_SCAN_ROWS = 3
+
+# 表头行的标志列
+HEADER_MARKER = '客户ID'
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _dedupe_header(cells):
+    """生成与pandas一致的列名：空表头为Unnamed: i，重复表头追加.1/.2后缀"""
+    header = []
+    seen = {}
+    for idx, cell in enumerate(cells):
+        name = f"Unnamed: {idx}" if _is_blank(cell) else str(cell).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+
+def match_columns(header, field_names):
+    """返回表头中与字段名互相包含的列位置，与处理器的列名模糊匹配规则一致"""
+    positions = []
+    for idx, name in enumerate(header):
+        if any(field in name or name in field for field in field_names):
+            positions.append(idx)
+    return positions
+
+
+class StreamingExcelReader:
+    """流式Excel读取器"""
+
+    def __init__(self, filepath, batch_size=DEFAULT_BATCH_SIZE):
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self._legacy = os.path.splitext(filepath)[1].lower() == '.xls'
+        self._workbook = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """关闭底层工作簿，释放文件句柄"""
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+    @property
+    def workbook(self):
+        if self._workbook is None:
+            self._workbook = load_workbook(self.filepath, read_only=True, data_only=True)
+        return self._workbook
+
+    def sheet_names(self):
+        """获取所有Sheet页名称（不读取单元格数据）"""
+        if self._legacy:
+            return list(pd.ExcelFile(self.filepath).sheet_names)
+        return list(self.workbook.sheetnames)
+
+    def _iter_raw_rows(self, sheet_name):
+        if self._legacy:
+            df = pd.read_excel(self.filepath, sheet_name=sheet_name, header=None)
+            for row in df.itertuples(index=False, name=None):
+                yield tuple(None if pd.isna(value) else value for value in row)
+            return
+        worksheet = self.workbook[sheet_name]
+        for row in worksheet.iter_rows(values_only=True):
+            yield row
+
+    def iter_batches(self, sheet_name, field_names=None):
+        """
+        按批读取指定Sheet页
+
+        表头在前几行中查找包含"客户ID"的行，找不到时使用第一个非空行。
+
+        Args:
+            sheet_name: Sheet页名称
+            field_names: 需要的字段名（Excel中文列名），为None时读取全部列
+
+        Yields:
+            DataFrame: 列为表头、最多batch_size行的数据块
+        """
+        rows = self._iter_raw_rows(sheet_name)
+
+        # 定位表头
+        leading = []
+        header_cells = None
+        for row in rows:
+            if all(_is_blank(value) for value in row):
+                continue
+            leading.append(row)
+            if any(isinstance(value, str) and HEADER_MARKER in value for value in row):
+                header_cells = row
+                leading = []
+                break
+            if len(leading) >= HEADER_SCAN_ROWS:
+                break
+
+        if header_cells is None:
+            if not leading:
+                logger.warning(f"Sheet页'{sheet_name}'为空")
+                return
+            header_cells, leading = leading[0], leading[1:]
+
+        header = _dedupe_header(header_cells)
+        positions = list(range(len(header)))
+        if field_names is not None:
+            positions = match_columns(header, field_names)
+        columns = [header[idx] for idx in positions]
+        logger.info(f"Sheet页'{sheet_name}'表头: {header}, 读取列: {columns}")
+
+        def project(row):
+            return [row[idx] if idx < len(row) else None for idx in positions]
+
+        batch = [project(row) for row in leading]
+        for row in rows:
+            if all(_is_blank(value) for value in row):
+                continue
+            batch.append(project(row))
+            if len(batch) >= self.batch_size:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
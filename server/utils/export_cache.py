@@ -0,0 +1,223 @@
+"""
+导出文件缓存 - 相同选择、数据未变化时直接复用已生成的导出文件
+
+导出和服务记录报告原来每次请求都重新生成一个带时间戳的文件，导出目录只增不减。这里：
+- 缓存键由导出类型、导出参数和所涉及表的当前代数(generation，见utils.response_cache)计算，
+  数据修改后代数变化，旧文件不再命中并随淘汰删除
+- 文件先写入临时文件再原子重命名，多个worker同时生成同一文件也不会读到写了一半的内容
+- 元数据（下载文件名、MIME类型、导出结果）保存在同名.json文件中，任意worker都能读取
+- 命中时更新文件修改时间，按修改时间做LRU淘汰，总字节数和文件数超过配额时删除最久未用的文件
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app, send_file
+
+from models import Job
+from utils.response_cache import read_generations
+
+logger = logging.getLogger(__name__)
+
+# 缓存目录默认容量
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_FILES = 500
+
+META_SUFFIX = '.json'
+
+Artifact = namedtuple('Artifact', ['key', 'path', 'mimetype', 'download_name', 'size', 'created_at', 'result'])
+
+
+def artifact_key(kind, params, tables):
+    """
+    计算导出文件的缓存键
+
+    Args:
+        kind: 导出类型，如excel_export
+        params: 决定导出内容的参数，须可JSON序列化
+        tables: 导出内容依赖的表
+    """
+    generations = dict(zip(tables, read_generations(tables)))
+    payload = json.dumps([kind, params, generations], ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ExportCache:
+    """磁盘上的导出文件缓存，按总字节数和文件数做LRU淘汰"""
+
+    def __init__(self, folder, max_bytes=DEFAULT_MAX_BYTES, max_files=DEFAULT_MAX_FILES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _meta_path(self, key):
+        return os.path.join(self.folder, key + META_SUFFIX)
+
+    def get(self, key):
+        """返回已缓存的导出文件，不存在时返回None；命中时刷新LRU时间"""
+        if not key.isalnum():
+            return None
+        try:
+            with open(self._meta_path(key), encoding='utf-8') as f:
+                meta = json.load(f)
+            path = os.path.join(self.folder, meta['filename'])
+            size = os.path.getsize(path)
+            os.utime(path)
+            os.utime(self._meta_path(key))
+        except (OSError, ValueError, KeyError):
+            return None
+        return Artifact(key, path, meta['mimetype'], meta['download_name'], size, meta['created_at'], meta.get('result'))
+
+    def put(self, key, extension, mimetype, download_name, write):
+        """
+        生成并缓存导出文件
+
+        Args:
+            key: artifact_key计算的缓存键
+            extension: 文件扩展名
+            mimetype: 下载时的MIME类型
+            download_name: 下载时的文件名
+            write: 写文件的函数，签名为 write(path)，返回值作为导出结果保存
+
+        Returns:
+            Artifact
+        """
+        filename = f"{key}.{extension}"
+        path = os.path.join(self.folder, filename)
+        temp_path = os.path.join(self.folder, f".{key}.{uuid.uuid4().hex}.{extension}")
+        try:
+            result = write(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        meta = {'filename': filename, 'mimetype': mimetype, 'download_name': download_name,
+                'created_at': created_at, 'result': result}
+        temp_meta = os.path.join(self.folder, f".{key}.{uuid.uuid4().hex}{META_SUFFIX}")
+        with open(temp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, default=str)
+        os.replace(temp_meta, self._meta_path(key))
+
+        self.evict(keep=key)
+        return Artifact(key, path, mimetype, download_name, os.path.getsize(path), created_at, result)
+
+    def _entries(self):
+        """返回[(最后使用时间, 字节数, 缓存键, [文件路径])]"""
+        groups = {}
+        for name in os.listdir(self.folder):
+            # 以.开头的是正在写入的临时文件
+            if name.startswith('.'):
+                continue
+            key = name.split('.', 1)[0]
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            mtime, size, paths = groups.get(key, (0, 0, []))
+            paths.append(path)
+            groups[key] = (max(mtime, stat.st_mtime), size + stat.st_size, paths)
+        return sorted((mtime, size, key, paths) for key, (mtime, size, paths) in groups.items())
+
+    def evict(self, keep=None):
+        """删除最久未用的文件直到满足容量配额，返回删除的文件数"""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _, _ in entries)
+            count = len(entries)
+            removed = 0
+            for _, size, key, paths in entries:
+                if total <= self.max_bytes and count <= self.max_files:
+                    break
+                if key == keep:
+                    continue
+                for path in paths:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+                count -= 1
+                removed += 1
+        if removed:
+            logger.info(f"导出缓存淘汰 {removed} 个文件，剩余 {count} 个、{total} 字节")
+        return removed
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            'files': len(entries),
+            'bytes': sum(size for _, size, _, _ in entries),
+            'max_files': self.max_files,
+            'max_bytes': self.max_bytes,
+        }
+
+
+# 正在生成的导出任务: 缓存键 -> 任务ID（进程内），相同请求不重复提交任务
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def pending_job(key, submit):
+    """
+    返回生成key的未完成任务，没有时调用submit()提交新任务
+
+    Returns:
+        (Job, 是否新提交)
+    """
+    with _pending_lock:
+        job_id = _pending.get(key)
+        if job_id:
+            job = Job.query.get(job_id)
+            if job is not None and job.status in ('pending', 'running'):
+                return job, False
+        job = submit()
+        _pending[key] = job.id
+        return job, True
+
+
+def release_pending(key):
+    with _pending_lock:
+        _pending.pop(key, None)
+
+
+def get_export_cache():
+    """返回当前应用的导出缓存（每个应用一个实例）"""
+    cache = current_app.extensions.get('export_cache')
+    if cache is None:
+        folder = current_app.config.get('EXPORT_CACHE_FOLDER') or os.path.join(
+            current_app.config['EXPORT_FOLDER'], 'cache')
+        cache = current_app.extensions.setdefault('export_cache', ExportCache(
+            folder,
+            current_app.config.get('EXPORT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES),
+            current_app.config.get('EXPORT_CACHE_MAX_FILES', DEFAULT_MAX_FILES),
+        ))
+    return cache
+
+
+def send_artifact(artifact):
+    """
+    下载导出文件，支持Range断点续传
+
+    ETag取缓存键，与文件修改时间无关（命中时会刷新修改时间），If-Range在文件不变时始终有效
+    """
+    return send_file(
+        artifact.path,
+        mimetype=artifact.mimetype,
+        as_attachment=True,
+        download_name=artifact.download_name,
+        conditional=True,
+        etag=artifact.key,
+        last_modified=datetime.strptime(artifact.created_at, '%Y-%m-%d %H:%M:%S'),
+    )
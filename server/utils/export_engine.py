@@ -0,0 +1,399 @@
+"""
+数据导出引擎 - 按客户ID分批读取，逐行写入xlsx/CSV/JSONL/Parquet文件
+
+原导出逐个部分加载ORM对象并调用to_dict()，拼成DataFrame改列名后用pandas写Excel，
+每个部分还重新查询一次客户姓名，内存占用随导出规模增长。这里：
+- 各部分按客户ID分批用Core查询读取（见utils.bulk_fetch），行序列化后直接写入文件，不构建DataFrame
+- xlsx使用xlsxwriter的constant_memory模式，每行写出后即释放
+- 客户姓名只查询一次，各部分共用
+- 多个部分导出为CSV/JSONL/Parquet时每个部分一个文件，打包为zip
+- Parquet需要安装pyarrow（可选依赖），未安装时该格式不可用
+"""
+import csv
+import json
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import OrderedDict, namedtuple
+
+import xlsxwriter
+from sqlalchemy import Boolean, Float, Integer, Numeric
+
+from models import Customer, HealthRecord, Consumption, Service, Communication
+from utils.bulk_fetch import iter_rows, iter_services, customer_names
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow为可选依赖，未安装时不支持Parquet
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# 导出部分: 工作表/文件名称、模型、列名映射（英文字段名 -> 中文表头）、是否在客户ID后加姓名列
+ExportSection = namedtuple('ExportSection', ['title', 'model', 'columns', 'with_name'])
+
+CUSTOMER_COLUMNS = {
+    'id': '客户ID',
+    'name': '姓名',
+    'gender': '性别',
+    'age': '年龄',
+    'store': '门店归属',
+    'hometown': '籍贯',
+    'residence': '现居地',
+    'residence_years': '居住时长',
+    'family_structure': '家庭成员构成',
+    'family_age_distribution': '家庭人员年龄分布',
+    'living_condition': '家庭居住情况',
+    'personality_tags': '性格类型标签',
+    'consumption_decision': '消费决策主导',
+    'risk_sensitivity': '风险敏感度',
+    'hobbies': '兴趣爱好',
+    'routine': '作息规律',
+    'diet_preference': '饮食偏好',
+    'menstrual_record': '生理期记录',
+    'family_medical_history': '家族遗传病史',
+    'occupation': '职业',
+    'work_unit_type': '单位性质',
+    'annual_income': '年收入'
+}
+
+HEALTH_COLUMNS = {
+    'customer_id': '客户ID',
+    'skin_type': '肤质类型',
+    'oil_water_balance': '水油情况',
+    'pores_blackheads': '毛孔与黑头',
+    'wrinkles_texture': '皱纹与纹理',
+    'pigmentation': '色素沉着',
+    'photoaging_inflammation': '光老化与炎症',
+    'tcm_constitution': '中医体质类型',
+    'tongue_features': '舌象特征',
+    'pulse_data': '脉象数据',
+    'sleep_routine': '作息规律',
+    'exercise_pattern': '运动频率及类型',
+    'diet_restrictions': '饮食禁忌/偏好',
+    'care_time_flexibility': '护理时间灵活度',
+    'massage_pressure_preference': '手法力度偏好',
+    'environment_requirements': '环境氛围要求',
+    'short_term_beauty_goal': '短期美丽目标',
+    'long_term_beauty_goal': '长期美丽目标',
+    'short_term_health_goal': '短期健康目标',
+    'long_term_health_goal': '长期健康目标',
+    'medical_cosmetic_history': '医美操作史',
+    'wellness_service_history': '大健康服务史',
+    'major_disease_history': '重大疾病历史',
+    'allergies': '过敏史'
+}
+
+CONSUMPTION_COLUMNS = {
+    'customer_id': '客户ID',
+    'date': '消费时间',
+    'project_name': '项目名称',
+    'amount': '消费金额',
+    'payment_method': '支付方式',
+    'total_sessions': '总次数',
+    'completion_date': '耗卡完成时间',
+    'satisfaction': '项目满意度'
+}
+
+SERVICE_COLUMNS = {
+    'customer_id': '客户ID',
+    'service_date': '到店时间',
+    'departure_time': '离店时间',
+    'total_amount': '总耗卡金额',
+    'satisfaction': '服务满意度',
+    'service_items': '消耗项目',
+}
+
+COMMUNICATION_COLUMNS = {
+    'customer_id': '客户ID',
+    'communication_date': '沟通时间',
+    'communication_type': '沟通方式',
+    'communication_location': '沟通地点',
+    'staff_name': '员工',
+    'communication_content': '沟通内容',
+    'customer_feedback': '客户反馈',
+    'follow_up_action': '后续跟进'
+}
+
+# 可导出的部分，按此顺序写出
+SECTIONS = OrderedDict([
+    ('customer', ExportSection('客户基础信息', Customer, CUSTOMER_COLUMNS, False)),
+    ('health', ExportSection('健康与皮肤数据', HealthRecord, HEALTH_COLUMNS, True)),
+    ('consumption', ExportSection('消费行为记录', Consumption, CONSUMPTION_COLUMNS, True)),
+    ('service', ExportSection('消耗行为记录', Service, SERVICE_COLUMNS, True)),
+    ('communication', ExportSection('客户沟通记录', Communication, COMMUNICATION_COLUMNS, True)),
+])
+
+# 导出格式 -> (扩展名, MIME类型)
+FORMATS = OrderedDict([
+    ('xlsx', ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')),
+    ('csv', ('csv', 'text/csv')),
+    ('jsonl', ('jsonl', 'application/x-ndjson')),
+    ('parquet', ('parquet', 'application/vnd.apache.parquet')),
+])
+
+ZIP_MIMETYPE = 'application/zip'
+
+NAME_FIELD = '姓名'
+
+# xlsx工作表最多的数据行数（不含表头）
+XLSX_MAX_ROWS = 1048575
+
+# Parquet每个行组的行数
+PARQUET_BATCH_SIZE = 10000
+
+
+class ExportError(ValueError):
+    """导出参数错误"""
+
+
+def available_formats():
+    """当前环境支持的导出格式"""
+    return tuple(name for name in FORMATS if name != 'parquet' or pyarrow is not None)
+
+
+def parse_sections(values):
+    """校验导出部分，返回按SECTIONS顺序排列的部分名列表"""
+    if values is None:
+        return list(SECTIONS)
+    if not isinstance(values, list) or not values:
+        raise ExportError("sections应为非空数组")
+    unknown = [value for value in values if value not in SECTIONS]
+    if unknown:
+        raise ExportError(f"不支持导出的部分: {', '.join(map(str, unknown))}，可选: {', '.join(SECTIONS)}")
+    return [name for name in SECTIONS if name in values]
+
+
+def parse_format(value):
+    fmt = (value or 'xlsx').lower()
+    if fmt not in FORMATS:
+        raise ExportError(f"不支持的导出格式: {value}，可选: {', '.join(FORMATS)}")
+    if fmt not in available_formats():
+        raise ExportError(f"导出{fmt}需要安装pyarrow")
+    return fmt
+
+
+def output_type(fmt, sections):
+    """返回(扩展名, MIME类型)；非xlsx格式导出多个部分时为zip"""
+    if fmt != 'xlsx' and len(sections) > 1:
+        return 'zip', ZIP_MIMETYPE
+    return FORMATS[fmt]
+
+
+def section_tables(sections):
+    """导出内容依赖的表，用于计算导出文件缓存键"""
+    tables = {Customer.__tablename__}
+    for key in sections:
+        tables.add(SECTIONS[key].model.__tablename__)
+        if SECTIONS[key].model is Service:
+            tables.add('service_items')
+    return sorted(tables)
+
+
+# ---- 行读取 ----
+
+def section_fields(key):
+    """某部分的输出字段（英文字段名，姓名列为NAME_FIELD），顺序与原DataFrame导出一致"""
+    section = SECTIONS[key]
+    fields = [column.key for column in section.model.__table__.columns]
+    if section.model is Service:
+        fields.append('service_items')
+    if section.with_name:
+        fields.remove('customer_id')
+        fields = ['customer_id', NAME_FIELD] + fields
+    return fields
+
+
+def section_headers(key):
+    columns = SECTIONS[key].columns
+    return [columns.get(field, field) for field in section_fields(key)]
+
+
+def iter_section(key, customer_ids, names):
+    """
+    按客户ID分批读取某部分，逐行产出与section_headers对应的值列表
+
+    Args:
+        key: 部分名
+        customer_ids: 客户ID列表
+        names: {客户ID: 姓名}，各部分共用
+    """
+    section = SECTIONS[key]
+    model = section.model
+    fields = section_fields(key)
+    if model is Customer:
+        rows = ((customer_id, data) for (customer_id,), data in iter_rows(
+            Customer, Customer.id, customer_ids, order_by=(Customer.id,)))
+    elif model is Service:
+        rows = iter_services(Service.customer_id, customer_ids,
+                             order_by=(Service.customer_id, Service.service_date, Service.service_id))
+    else:
+        rows = ((customer_id, data) for (customer_id,), data in iter_rows(
+            model, model.customer_id, customer_ids, order_by=(model.customer_id, model.id)))
+
+    for customer_id, data in rows:
+        if section.with_name:
+            data[NAME_FIELD] = names.get(customer_id, '')
+        yield [data.get(field) for field in fields]
+
+
+# ---- 写入 ----
+
+def _text(value):
+    """表格格式中嵌套数据（服务项目）写为JSON文本"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def write_xlsx(path, parts):
+    """
+    写入xlsx，每个部分一个工作表
+
+    Args:
+        parts: [(部分名, 行迭代器)]
+
+    Returns:
+        dict: {部分名: 行数}
+    """
+    counts = {}
+    # constant_memory模式下每个工作表须按行顺序写入，写完一行即刷到临时文件
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_numbers': False,
+                                          'strings_to_formulas': False, 'strings_to_urls': False})
+    try:
+        for key, rows in parts:
+            worksheet = workbook.add_worksheet(SECTIONS[key].title)
+            worksheet.write_row(0, 0, section_headers(key))
+            count = 0
+            for count, values in enumerate(rows, 1):
+                if count > XLSX_MAX_ROWS:
+                    raise ExportError(f"{SECTIONS[key].title}超过xlsx单个工作表的行数上限，请改用csv等格式导出")
+                for col, value in enumerate(values):
+                    if value is not None:
+                        worksheet.write(count, col, _text(value))
+            counts[key] = count
+    finally:
+        workbook.close()
+    return counts
+
+
+def write_csv(path, key, rows):
+    # 带BOM，Excel直接打开不乱码
+    count = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(section_headers(key))
+        for count, values in enumerate(rows, 1):
+            writer.writerow(['' if value is None else _text(value) for value in values])
+    return count
+
+
+def write_jsonl(path, key, rows):
+    headers = section_headers(key)
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for count, values in enumerate(rows, 1):
+            f.write(json.dumps(dict(zip(headers, values)), ensure_ascii=False))
+            f.write('\n')
+    return count
+
+
+def _arrow_type(model, field):
+    column = model.__table__.columns.get(field)
+    if column is None:
+        return pyarrow.string()
+    if isinstance(column.type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column.type, Integer):
+        return pyarrow.int64()
+    if isinstance(column.type, (Float, Numeric)):
+        return pyarrow.float64()
+    # 日期时间已由行序列化函数格式化为文本
+    return pyarrow.string()
+
+
+def write_parquet(path, key, rows):
+    model = SECTIONS[key].model
+    fields = section_fields(key)
+    schema = pyarrow.schema([(header, _arrow_type(model, field))
+                             for header, field in zip(section_headers(key), fields)])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        batch = []
+        for values in rows:
+            batch.append([_text(value) for value in values])
+            if len(batch) >= PARQUET_BATCH_SIZE:
+                writer.write_batch(pyarrow.RecordBatch.from_arrays(
+                    [pyarrow.array(column, type=schema.field(i).type) for i, column in enumerate(zip(*batch))],
+                    schema=schema))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            columns = list(zip(*batch)) if batch else [[] for _ in fields]
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(
+                [pyarrow.array(column, type=schema.field(i).type) for i, column in enumerate(columns)],
+                schema=schema))
+            count += len(batch)
+    return count
+
+
+FILE_WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet,
+}
+
+
+def _write_zip(path, fmt, parts):
+    """每个部分先写入临时文件，再逐个加入zip"""
+    counts = {}
+    workdir = tempfile.mkdtemp(prefix='.export-', dir=os.path.dirname(path) or None)
+    try:
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for key, rows in parts:
+                member = f"{SECTIONS[key].title}.{FORMATS[fmt][0]}"
+                member_path = os.path.join(workdir, member)
+                counts[key] = FILE_WRITERS[fmt](member_path, key, rows)
+                archive.write(member_path, member)
+                os.remove(member_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return counts
+
+
+def export_data(customer_ids, sections, fmt, path):
+    """
+    导出客户数据到文件
+
+    Args:
+        customer_ids: 去重后的客户ID列表
+        sections: parse_sections返回的部分名列表
+        fmt: 导出格式，见FORMATS
+        path: 输出文件路径，扩展名由调用方按output_type确定
+
+    Returns:
+        dict: {表名: 导出行数}
+    """
+    names = customer_names(customer_ids)
+    parts = [(key, iter_section(key, customer_ids, names)) for key in sections]
+
+    try:
+        if fmt == 'xlsx':
+            counts = write_xlsx(path, parts)
+        elif len(parts) == 1:
+            key, rows = parts[0]
+            counts = {key: FILE_WRITERS[fmt](path, key, rows)}
+        else:
+            counts = _write_zip(path, fmt, parts)
+    except Exception:
+        # 不保留写了一半的文件
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+    result = {SECTIONS[key].model.__tablename__: count for key, count in counts.items()}
+    logger.info(f"导出完成: {len(customer_ids)}个客户, 格式 {fmt}, {result}")
+    return result
@@ -0,0 +1,85 @@
+"""
+稀疏字段集工具 - 详情接口的include/fields参数
+
+- include=health,services 指定要一并返回的关联数据，未传时返回全部关联数据
+- fields=id,name 指定主记录返回的字段，fields[services]=service_id,service_date 指定关联记录的字段
+- 指定了字段时只加载这些列（load_only），未请求的Text大字段不会从数据库读出
+- 未指定字段时与原来的to_dict输出一致，序列化函数由utils.serializers按字段集预编译
+"""
+from sqlalchemy import inspect
+
+from utils.serializers import serialize
+
+
+class FieldsetError(ValueError):
+    """include/fields参数错误"""
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def parse_include(args, allowed):
+    """
+    解析include参数
+
+    Args:
+        args: request.args
+        allowed: 可选的关联名称列表
+
+    Returns:
+        list: 需要返回的关联名称；未传include时为全部
+    """
+    if 'include' not in args:
+        return list(allowed)
+    include = _split(args.get('include', ''))
+    unknown = [name for name in include if name not in allowed]
+    if unknown:
+        raise FieldsetError(f"不支持的include: {', '.join(unknown)}，可选: {', '.join(allowed)}")
+    return include
+
+
+def column_names(model):
+    return [column.key for column in inspect(model).column_attrs]
+
+
+def parse_fields(args, model, key=None, extra=()):
+    """
+    解析fields参数
+
+    Args:
+        args: request.args
+        model: 字段所属模型
+        key: 关联名称，为None时读取fields，否则读取fields[key]
+        extra: 除列以外允许的字段（如服务记录的service_items）
+
+    Returns:
+        list或None: 未传时为None，表示返回全部字段
+    """
+    param = 'fields' if key is None else f'fields[{key}]'
+    if param not in args:
+        return None
+    fields = _split(args.get(param, ''))
+    allowed = set(column_names(model)) | set(extra)
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise FieldsetError(f"{param}包含未知字段: {', '.join(unknown)}")
+    return fields
+
+
+def load_only_columns(model, fields):
+    """返回load_only需要的列属性，主键总是加载"""
+    names = set(fields) & set(column_names(model))
+    names.update(column.key for column in inspect(model).primary_key)
+    return [getattr(model, name) for name in column_names(model) if name in names]
+
+
+def to_partial_dict(obj, fields=None):
+    """
+    按字段集序列化
+
+    Args:
+        obj: 模型实例
+        fields: 需要的字段（可包含已注册的嵌套字段如service_items），为None时与obj.to_dict()一致
+    """
+    return serialize(obj, fields)
@@ -0,0 +1,247 @@
+"""
+后台任务执行器 - 把Excel导入等耗时操作移出请求线程
+
+任务记录保存在同一数据库的jobs表中，由本进程内的线程池执行：
+- 上传接口创建任务后立即返回任务ID，不再占用同步worker直到导入结束
+- 执行过程中的阶段、已处理行数和错误写回jobs表，任意worker都能通过 GET /api/jobs/<id> 查询
+- 进度使用独立连接写入，不会提前提交导入数据所在的事务；SQLite同一时间只有一个写事务，
+  导入任务按批提交（见commit_batches），在批次之间上报进度，不会等待自身事务的写锁
+- 未结束的任务由所在进程定期刷新updated_at（心跳）；进程被杀死后任务停止刷新，
+  下次启动时由recover_stale_jobs标记为失败，不会一直停留在running
+"""
+import json
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, Job
+
+logger = logging.getLogger(__name__)
+
+# 默认后台线程数
+DEFAULT_JOB_WORKERS = 2
+
+# 进度写库的最小间隔(秒)，阶段变化时总是立即写入
+PROGRESS_INTERVAL = 1.0
+
+# 单个任务最多保留的错误条数
+MAX_ERRORS = 100
+
+# 导入任务每批提交的记录数
+COMMIT_BATCH_SIZE = 500
+
+# 未结束任务的心跳间隔(秒)
+HEARTBEAT_INTERVAL = 30
+
+# 默认超过该时长(秒)没有心跳的未结束任务视为所在进程已退出，应明显大于HEARTBEAT_INTERVAL
+DEFAULT_JOB_STALE_SECONDS = 300
+
+# 未结束的任务状态
+UNFINISHED_STATUSES = ('pending', 'running')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 本进程中排队或执行中的任务ID，由心跳线程定期刷新
+_live_jobs = set()
+_heartbeat = None
+_live_lock = threading.Lock()
+
+
+def get_executor():
+    """获取进程内共享的线程池，首次使用时按JOB_WORKERS配置创建"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = current_app.config.get('JOB_WORKERS', DEFAULT_JOB_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+            logger.info(f"后台任务线程池已创建，线程数: {workers}")
+        return _executor
+
+
+def _heartbeat_loop(app):
+    """定期刷新本进程中未结束任务的updated_at"""
+    table = Job.__table__
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        with _live_lock:
+            job_ids = list(_live_jobs)
+        if not job_ids:
+            continue
+        try:
+            with app.app_context(), db.engine.begin() as conn:
+                conn.execute(table.update()
+                             .where(table.c.id.in_(job_ids), table.c.status.in_(UNFINISHED_STATUSES))
+                             .values(updated_at=datetime.now()))
+        except Exception:
+            logger.exception("任务心跳写入失败")
+
+
+def _track_job(app, job_id):
+    """登记本进程中的未结束任务，首次登记时启动心跳线程"""
+    global _heartbeat
+    with _live_lock:
+        _live_jobs.add(job_id)
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_heartbeat_loop, args=(app,), name='job-heartbeat', daemon=True)
+            _heartbeat.start()
+
+
+def recover_stale_jobs(stale_seconds=DEFAULT_JOB_STALE_SECONDS):
+    """
+    把所在进程已退出的任务标记为失败，在应用启动时调用
+
+    worker被杀死或重启时，线程池中排队和执行中的任务随之丢失，jobs表中的状态停留在pending/running。
+    按心跳判断：超过stale_seconds没有更新的未结束任务才标记为失败，其他仍在运行的worker中的任务不受影响。
+    更新时再次校验状态和心跳，期间刚结束或恢复心跳的任务不会被覆盖。
+
+    Returns:
+        int: 标记为失败的任务数
+    """
+    table = Job.__table__
+    now = datetime.now()
+    cutoff = now - timedelta(seconds=stale_seconds)
+    stale = (table.c.status.in_(UNFINISHED_STATUSES), table.c.updated_at < cutoff)
+    recovered = []
+    with db.engine.begin() as conn:
+        for job_id, errors in conn.execute(select(table.c.id, table.c.errors).where(*stale)).all():
+            errors = json.loads(errors) if errors else []
+            errors.append('任务所在进程已退出，任务未完成，请重新提交')
+            result = conn.execute(table.update().where(table.c.id == job_id, *stale).values(
+                status='failed',
+                errors=json.dumps(errors[-MAX_ERRORS:], ensure_ascii=False),
+                finished_at=now,
+                updated_at=now,
+            ))
+            if result.rowcount:
+                recovered.append(job_id)
+    if recovered:
+        logger.warning(f"已将 {len(recovered)} 个中断的后台任务标记为失败: {', '.join(recovered)}")
+    return len(recovered)
+
+
+class JobReporter:
+    """任务进度上报器，由任务函数调用以更新jobs表中的进度"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.rows_processed = 0
+        self.errors = []
+        self._stage = None
+        self._last_flush = 0.0
+
+    def stage(self, name):
+        """进入新的执行阶段"""
+        logger.info(f"任务 {self.job_id} 进入阶段: {name}")
+        self._stage = name
+        self.flush()
+
+    def advance(self, rows):
+        """累加已处理行数，按PROGRESS_INTERVAL节流写库"""
+        self.rows_processed += rows
+        if time.monotonic() - self._last_flush >= PROGRESS_INTERVAL:
+            self.flush()
+
+    def error(self, message):
+        """记录一条不中断任务的错误"""
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(message)
+
+    def flush(self, **values):
+        """把当前进度写入jobs表"""
+        values.update(
+            stage=self._stage,
+            rows_processed=self.rows_processed,
+            errors=json.dumps(self.errors, ensure_ascii=False) if self.errors else None,
+            updated_at=datetime.now(),
+        )
+        # 使用独立连接立即提交，避免与任务自身的会话事务混在一起
+        with db.engine.begin() as conn:
+            conn.execute(Job.__table__.update().where(Job.__table__.c.id == self.job_id).values(**values))
+        self._last_flush = time.monotonic()
+
+
+def commit_batches(reporter, records, size=COMMIT_BATCH_SIZE):
+    """
+    逐条产出records，每产出size条后提交当前事务并上报进度
+
+    导入循环写成 for record in commit_batches(reporter, records)：每批记录处理完后提交，
+    写锁随之释放，进度和心跳写入不必等到整个导入结束；中途失败时已提交的批次保留
+    """
+    for start in range(0, len(records), size):
+        batch = records[start:start + size]
+        yield from batch
+        db.session.commit()
+        reporter.advance(len(batch))
+
+
+def _run_job(app, job_id, func, args, kwargs):
+    """在线程池中执行任务函数，并记录最终状态"""
+    with app.app_context():
+        reporter = JobReporter(job_id)
+        try:
+            reporter.flush(status='running', started_at=datetime.now())
+            result = func(reporter, *args, **kwargs)
+            reporter.stage('完成')
+            reporter.flush(
+                status='succeeded',
+                result=json.dumps(result, ensure_ascii=False, default=str),
+                finished_at=datetime.now(),
+            )
+            logger.info(f"任务 {job_id} 执行成功，处理 {reporter.rows_processed} 行")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"任务 {job_id} 执行失败: {str(e)}\n{traceback.format_exc()}")
+            reporter.error(str(e))
+            try:
+                reporter.flush(status='failed', finished_at=datetime.now())
+            except Exception:
+                logger.exception(f"任务 {job_id} 状态写入失败")
+        finally:
+            with _live_lock:
+                _live_jobs.discard(job_id)
+
+
+def submit_job(job_type, func, *args, filename=None, **kwargs):
+    """
+    创建任务记录并提交到后台线程池
+
+    Args:
+        job_type: 任务类型
+        func: 任务函数，签名为 func(reporter, *args, **kwargs)，返回可JSON序列化的结果
+        filename: 导入的文件名，仅用于展示
+
+    Returns:
+        Job: 新建的任务记录
+    """
+    job = Job(job_type=job_type, status='pending', stage='排队中', filename=filename)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    _track_job(app, job.id)
+    get_executor().submit(_run_job, app, job.id, func, args, kwargs)
+    logger.info(f"已提交后台任务: {job.id} ({job_type})")
+    return job
+
+
+class _InlineReporter(JobReporter):
+    """同步执行时使用的上报器，只在内存中记录进度"""
+
+    def __init__(self):
+        super().__init__(job_id=None)
+
+    def flush(self, **values):
+        self._last_flush = time.monotonic()
+
+
+def run_job_inline(func, *args, **kwargs):
+    """不创建任务记录直接执行任务函数，供需要同步返回结果的调用方使用"""
+    reporter = _InlineReporter()
+    return func(reporter, *args, **kwargs)
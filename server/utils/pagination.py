@@ -0,0 +1,118 @@
+"""
+游标分页工具 - 列表接口的keyset分页
+
+paginate()使用OFFSET并且每页都执行COUNT(*)，翻到深页时耗时随页码线性增长。
+游标分页按(排序时间, 主键)定位上一页最后一条记录，每页只读取limit+1行：
+- 游标是不透明的base64字符串，内容为最后一条记录的排序值和主键
+- 总数只在请求with_total=1时计算，并按查询条件缓存一段时间
+"""
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+# 总数缓存的有效期(秒)
+COUNT_CACHE_TTL = 60
+
+# 总数缓存的最大条目数
+COUNT_CACHE_SIZE = 256
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+class InvalidCursor(ValueError):
+    """游标格式错误"""
+
+
+def encode_cursor(sort_value, key):
+    """将排序值和主键编码为游标"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, key], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，返回(排序时间, 主键)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if sort_value is not None:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, key
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursor(f"无效的分页游标: {cursor}") from e
+
+
+def keyset_page(query, sort_column, key_column, after=None, limit=20):
+    """
+    按(sort_column, key_column)倒序取一页
+
+    游标条件使用行值比较 (sort, key) < (?, ?)，SQLite可以直接在复合索引上定位。
+    SQLite倒序时NULL排在最后，排序值为NULL的记录在非NULL记录取完后按主键继续翻页。
+
+    Args:
+        query: 已应用过滤条件、未排序的查询
+        sort_column: 排序时间列，如Customer.created_at
+        key_column: 主键列，用于排序值相同时定序
+        after: 上一页返回的next_cursor，为空时从第一页开始
+        limit: 每页条数
+
+    Returns:
+        (items, next_cursor): 没有下一页时next_cursor为None
+    """
+    ordered = (sort_column.desc(), key_column.desc())
+    if not after:
+        rows = query.order_by(*ordered).limit(limit + 1).all()
+    else:
+        sort_value, key = decode_cursor(after)
+        if sort_value is None:
+            rows = (query.filter(sort_column.is_(None), key_column < key)
+                    .order_by(key_column.desc()).limit(limit + 1).all())
+        else:
+            rows = (query.filter(tuple_(sort_column, key_column) < tuple_(sort_value, key))
+                    .order_by(*ordered).limit(limit + 1).all())
+            if len(rows) <= limit:
+                rows += (query.filter(sort_column.is_(None))
+                         .order_by(key_column.desc()).limit(limit + 1 - len(rows)).all())
+
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, key_column.key))
+    return items, next_cursor
+
+
+def cached_count(query, cache_key, ttl=COUNT_CACHE_TTL):
+    """
+    带缓存的COUNT(*)
+
+    Args:
+        query: 已应用过滤条件的查询
+        cache_key: 区分查询条件的键，如('customers', name, store, gender)
+        ttl: 缓存有效期(秒)
+    """
+    now = time.monotonic()
+    with _count_lock:
+        entry = _count_cache.get(cache_key)
+        if entry and now - entry[1] < ttl:
+            return entry[0]
+
+    total = query.order_by(None).count()
+    with _count_lock:
+        if len(_count_cache) >= COUNT_CACHE_SIZE:
+            # 淘汰最早写入的条目
+            oldest = min(_count_cache, key=lambda k: _count_cache[k][1])
+            _count_cache.pop(oldest, None)
+        _count_cache[cache_key] = (total, now)
+    return total
+
+
+def wants_total(args):
+    """请求参数with_total为1/true时返回True"""
+    return str(args.get('with_total', '')).lower() in ('1', 'true')
@@ -0,0 +1,109 @@
+"""
+项目目录解析 - 服务项目名称到项目ID的进程内映射
+
+写服务记录时需要按项目名称填写project_id，原来每个服务项目都执行一次
+Project.query.filter_by(name=...)。这里在进程内保存 名称 -> 项目ID 的映射：
+- 先按原名称精确匹配，再按规范化名称（全角转半角、去除空白、英文小写）匹配
+- 规范化后对应多个项目的名称不做模糊匹配，避免填错项目
+- 映射的版本即cache_generations中projects表的代数，/api/projects的新增、修改、
+  删除、导入以及其他进程对projects的写入都会使代数加1，解析前比较代数，变化时重新加载
+"""
+import logging
+import re
+import threading
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, Project
+from utils.response_cache import read_generations
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_project_name(name):
+    """规范化项目名称：全角转半角、去除所有空白、英文转小写"""
+    if name is None:
+        return ''
+    return _WHITESPACE.sub('', unicodedata.normalize('NFKC', str(name))).lower()
+
+
+class ProjectCatalog:
+    """项目名称 -> 项目ID映射，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._names = {}
+        self._aliases = {}
+        self.loads = 0
+
+    def _load(self):
+        """从projects表加载映射，同名项目沿用最早创建的一个（与原first()一致）"""
+        names, aliases, ambiguous = {}, {}, set()
+        rows = db.session.execute(
+            select(Project.id, Project.name).order_by(Project.created_at, Project.id)
+        )
+        for project_id, name in rows:
+            if not name:
+                continue
+            names.setdefault(name, project_id)
+            alias = normalize_project_name(name)
+            if alias in aliases and aliases[alias] != project_id:
+                ambiguous.add(alias)
+            aliases.setdefault(alias, project_id)
+        for alias in ambiguous:
+            aliases.pop(alias, None)
+        return names, aliases
+
+    def _refresh(self):
+        version = read_generations(('projects',))[0]
+        with self._lock:
+            if version == self._version:
+                return
+        names, aliases = self._load()
+        with self._lock:
+            self._names, self._aliases, self._version = names, aliases, version
+            self.loads += 1
+        logger.info(f"项目目录已加载: {len(names)}个项目, 版本{version}")
+
+    def invalidate(self):
+        """丢弃当前映射，下次解析时重新加载"""
+        with self._lock:
+            self._version = None
+
+    def resolve(self, names):
+        """
+        批量解析项目名称
+
+        Args:
+            names: 项目名称序列，空值忽略
+
+        Returns:
+            (mapping, unresolved): mapping为{原名称: 项目ID}，unresolved为未找到的名称列表（去重）
+        """
+        names = {name for name in names if name}
+        if not names:
+            return {}, []
+        self._refresh()
+        with self._lock:
+            project_names, aliases = self._names, self._aliases
+        mapping, unresolved = {}, []
+        for name in names:
+            project_id = project_names.get(name) or aliases.get(normalize_project_name(name))
+            if project_id:
+                mapping[name] = project_id
+            else:
+                unresolved.append(name)
+        return mapping, sorted(unresolved)
+
+
+def get_project_catalog():
+    """返回当前应用的项目目录（每个应用一个实例）"""
+    catalog = current_app.extensions.get('project_catalog')
+    if catalog is None:
+        catalog = current_app.extensions.setdefault('project_catalog', ProjectCatalog())
+    return catalog
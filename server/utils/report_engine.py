@@ -0,0 +1,290 @@
+"""
+客户报告引擎 - 在进程内生成客户Markdown报告
+
+报告原来由 api/reports.py 调用子进程运行 md_report_generator.py 生成：每次请求都要启动解释器、
+导入模块，脚本每次查询都新建sqlite3连接，并逐条服务记录查询服务项目，最后把报告写到项目根目录
+的 <客户ID>_customer_report.md 再读回，并发请求同一客户时会互相覆盖。这里：
+- 使用应用的数据库会话，一批客户的全部数据固定6次查询读取（客户、健康档案、消费、服务记录、
+  服务项目、沟通记录），查询次数与服务记录条数无关；服务项目通过服务记录子查询一次读取
+- 报告各段的Markdown模板在导入时编译为格式化函数，渲染时只做format_map和字符串拼接
+- 直接返回报告内容，不写临时文件
+- 输出与 md_report_generator.py 逐字节一致（见 scripts/bench_report_engine.py 的一致性校验）
+"""
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import db, Customer, HealthRecord, Consumption, Service, ServiceItem, Communication
+from utils.bulk_fetch import chunked
+
+# 一位客户报告所需的数据，各记录均为 {列名: 值}
+ReportData = namedtuple('ReportData', ['customer', 'health_record', 'consumptions', 'services', 'communications'])
+
+# 报告依赖的表，供缓存键计算
+REPORT_TABLES = ('customers', 'health_records', 'consumptions', 'services', 'service_items', 'communications')
+
+# 基本信息: (字段名, 列名)
+CUSTOMER_FIELDS = [
+    ('姓名', 'name'),
+    ('性别', 'gender'),
+    ('年龄', 'age'),
+    ('门店归属', 'store'),
+    ('籍贯', 'hometown'),
+    ('现居地', 'residence'),
+    ('居住时长', 'residence_years'),
+    ('家庭成员构成', 'family_structure'),
+    ('家庭人员年龄分布', 'family_age_distribution'),
+    ('家庭居住情况', 'living_condition'),
+    ('性格类型标签', 'personality_tags'),
+    ('消费决策主导', 'consumption_decision'),
+    ('兴趣爱好', 'hobbies'),
+    ('作息规律', 'routine'),
+    ('饮食偏好', 'diet_preference'),
+    ('职业', 'occupation'),
+    ('单位性质', 'work_unit_type'),
+    ('年收入', 'annual_income'),
+]
+
+# 健康档案: (类别, 字段名, 列名)
+HEALTH_FIELDS = [
+    ('皮肤状况', '肤质类型', 'skin_type'),
+    ('皮肤状况', '水油平衡', 'oil_water_balance'),
+    ('皮肤状况', '毛孔与黑头', 'pores_blackheads'),
+    ('皮肤状况', '皱纹与纹理', 'wrinkles_texture'),
+    ('皮肤状况', '色素沉着', 'pigmentation'),
+    ('皮肤状况', '光老化与炎症', 'photoaging_inflammation'),
+    ('中医体质', '体质类型', 'tcm_constitution'),
+    ('中医体质', '舌象特征', 'tongue_features'),
+    ('中医体质', '脉象数据', 'pulse_data'),
+    ('生活习惯', '作息规律', 'sleep_routine'),
+    ('生活习惯', '运动频率', 'exercise_pattern'),
+    ('生活习惯', '饮食禁忌', 'diet_restrictions'),
+    ('护理需求', '时间灵活度', 'care_time_flexibility'),
+    ('护理需求', '手法力度偏好', 'massage_pressure_preference'),
+    ('护理需求', '环境氛围', 'environment_requirements'),
+    ('美容健康目标', '短期美丽目标', 'short_term_beauty_goal'),
+    ('美容健康目标', '长期美丽目标', 'long_term_beauty_goal'),
+    ('美容健康目标', '短期健康目标', 'short_term_health_goal'),
+    ('美容健康目标', '长期健康目标', 'long_term_health_goal'),
+    ('健康记录', '医美操作史', 'medical_cosmetic_history'),
+    ('健康记录', '大健康服务史', 'wellness_service_history'),
+    ('健康记录', '过敏史', 'allergies'),
+    ('健康记录', '重大疾病历史', 'major_disease_history'),
+]
+
+# 服务记录表最多列出的项目详情数
+SERVICE_DETAIL_COLUMNS = 5
+
+# 预编译的模板：模板文本只在导入时拼接一次，渲染时调用format_map/format
+_CUSTOMER_SECTION = '\n'.join(
+    ["## 客户: {name} ({id})\n", "### 基本信息\n", "| 字段 | 值 |", "|------|----|"]
+    + [f"| {label} | {{{column}}} |" for label, column in CUSTOMER_FIELDS]
+).format_map
+
+_HEALTH_SECTION = '\n'.join(
+    ["\n### 健康档案\n", "| 类别 | 字段 | 值 |", "|------|------|----|"]
+    + [f"| {category} | {label} | {{{column}}} |" for category, label, column in HEALTH_FIELDS]
+).format_map
+
+_CONSUMPTION_HEADER = '\n'.join(["\n### 消费记录\n", "| 消费时间 | 项目名称 | 消费金额 | 支付方式 |",
+                                 "|----------|----------|----------|----------|"])
+_CONSUMPTION_ROW = "| {0} | {1[project_name]} | {1[amount]} | {1[payment_method]} |".format
+
+_SERVICE_HEADER = '\n'.join([
+    "| 到店时间 | 离店时间 | 总耗卡次数 | 总耗卡金额 | 服务满意度 | "
+    + ' | '.join(f"项目详情{index}" for index in range(1, SERVICE_DETAIL_COLUMNS + 1)) + " |",
+    "|----------|----------|------------|------------|------------|-----------|-----------|-----------|-----------|------------|",
+])
+_SERVICE_ROW = ("| {0} | {1} | {2} | {3[total_amount]} | {3[satisfaction]} | "
+                + ' | '.join(f"{{4[{index}]}}" for index in range(SERVICE_DETAIL_COLUMNS)) + " |").format
+_SERVICE_ITEM = "{project_name} - {beautician_name} - {0}元 - {1}".format
+
+_COMMUNICATION_HEADER = '\n'.join(["\n### 沟通记录\n", "| 沟通时间 | 沟通地点 | 沟通内容 |", "|----------|----------|----------|"])
+_COMMUNICATION_ROW = "| {0} | {1[communication_location]} | {1[communication_content]} |".format
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _datetime_text(value, default=None):
+    """时间列格式化为秒级文本；空值时返回default（为None时原样返回空值，与原报告一致）"""
+    if not value:
+        return value if default is None else default
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return str(value)
+
+
+def _rows(query):
+    return [dict(row) for row in db.session.execute(query).mappings()]
+
+
+def _group(rows, column):
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[column], []).append(row)
+    return groups
+
+
+def _for_customers(query, column, customer_ids):
+    return query if customer_ids is None else query.where(column.in_(customer_ids))
+
+
+def load_report_data(customer_ids=None):
+    """
+    读取一批客户的报告数据，每张表一次查询，共6次
+
+    Args:
+        customer_ids: 客户ID列表，不超过IN_CHUNK_SIZE个（更多时使用iter_report_data）；
+            为None时读取全部客户
+
+    Returns:
+        dict: {客户ID: ReportData}，不存在的客户不在结果中
+    """
+    customers = _rows(_for_customers(select(Customer.__table__), Customer.id, customer_ids))
+    if not customers:
+        return {}
+
+    health_records = {}
+    for row in _rows(_for_customers(select(HealthRecord.__table__), HealthRecord.customer_id, customer_ids)
+                     .order_by(HealthRecord.id)):
+        # 每位客户取最早的一份健康档案
+        health_records.setdefault(row['customer_id'], row)
+
+    consumptions = _group(_rows(
+        _for_customers(select(Consumption.__table__), Consumption.customer_id, customer_ids)
+        .order_by(Consumption.date.desc(), Consumption.id)
+    ), 'customer_id')
+
+    services = _group(_rows(
+        _for_customers(select(Service.__table__), Service.customer_id, customer_ids)
+        .order_by(Service.service_date.desc(), Service.service_id)
+    ), 'customer_id')
+
+    # 服务项目按服务记录子查询一次读取，不再逐条服务记录查询
+    service_ids = _for_customers(select(Service.service_id), Service.customer_id, customer_ids)
+    items = _group(_rows(
+        _for_customers(select(ServiceItem.__table__), ServiceItem.service_id,
+                       None if customer_ids is None else service_ids)
+        .order_by(ServiceItem.id)
+    ), 'service_id')
+    for rows in services.values():
+        for service in rows:
+            service['items'] = items.get(service['service_id'], [])
+
+    communications = _group(_rows(
+        _for_customers(select(Communication.__table__), Communication.customer_id, customer_ids)
+        .order_by(Communication.communication_date.desc(), Communication.id)
+    ), 'customer_id')
+
+    return {
+        customer['id']: ReportData(
+            customer,
+            health_records.get(customer['id']),
+            consumptions.get(customer['id'], []),
+            services.get(customer['id'], []),
+            communications.get(customer['id'], []),
+        )
+        for customer in customers
+    }
+
+
+def iter_report_data(customer_ids):
+    """
+    分批读取客户报告数据，每批固定6次查询，批次之间不保留数据
+
+    Yields:
+        (客户ID, ReportData或None)，顺序与customer_ids一致，不存在的客户为None
+    """
+    for chunk in chunked(list(customer_ids)):
+        data = load_report_data(chunk)
+        for customer_id in chunk:
+            yield customer_id, data.get(customer_id)
+
+
+def _unique_items(items):
+    """去掉项目名称为空或为数字的错误数据，同一项目同一美容师只保留一条"""
+    unique = []
+    seen = set()
+    for item in items:
+        project_name = item['project_name'] or ''
+        if str(project_name).isdigit() or not project_name.strip():
+            continue
+        key = f"{project_name}-{item['beautician_name']}"
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+def _item_detail(item):
+    """项目详情: 项目内容 - 操作美容师 - 耗卡金额 - 是否指定；单价为空时使用扣卡金额"""
+    amount = item['unit_price']
+    if not amount:
+        amount = item['card_deduction']
+    if amount is None:
+        amount = 0
+    return _SERVICE_ITEM(amount, "✓指定" if item['is_specified'] else "未指定", **item)
+
+
+def render_service_table(services):
+    """服务记录表：每条服务记录一行，最多列出SERVICE_DETAIL_COLUMNS个项目"""
+    if not services:
+        return "无服务记录"
+    lines = [_SERVICE_HEADER]
+    for service in services:
+        unique_items = _unique_items(service['items'])
+        # 优先使用Excel中记录的总耗卡次数，没有时按去重后的项目数
+        total_sessions = service['total_sessions'] or len(unique_items)
+        details = [_item_detail(item) for item in unique_items[:SERVICE_DETAIL_COLUMNS]]
+        details.extend([''] * (SERVICE_DETAIL_COLUMNS - len(details)))
+        lines.append(_SERVICE_ROW(
+            _datetime_text(service['service_date'], ''),
+            _datetime_text(service['departure_time'], ''),
+            total_sessions,
+            service,
+            details,
+        ))
+    return '\n'.join(lines)
+
+
+def render_report(data):
+    """
+    渲染客户Markdown报告
+
+    Args:
+        data: ReportData
+
+    Returns:
+        str: 报告内容
+    """
+    sections = [_CUSTOMER_SECTION(data.customer)]
+    if data.health_record:
+        sections.append(_HEALTH_SECTION(data.health_record))
+    if data.consumptions:
+        sections.append(_CONSUMPTION_HEADER)
+        sections.extend(_CONSUMPTION_ROW(_datetime_text(row['date']), row) for row in data.consumptions)
+    sections.append("\n### 服务记录\n")
+    sections.append(render_service_table(data.services))
+    if data.communications:
+        sections.append(_COMMUNICATION_HEADER)
+        sections.extend(_COMMUNICATION_ROW(_datetime_text(row['communication_date']), row)
+                        for row in data.communications)
+    return '\n'.join(sections)
+
+
+def generate_report(customer_id):
+    """生成单个客户的报告，客户不存在时返回None"""
+    data = load_report_data([customer_id]).get(customer_id)
+    return render_report(data) if data else None
+
+
+def iter_reports(customer_ids):
+    """
+    批量生成客户报告
+
+    Yields:
+        (客户ID, 报告内容或None)
+    """
+    for customer_id, data in iter_report_data(customer_ids):
+        yield customer_id, render_report(data) if data else None
@@ -0,0 +1,362 @@
+"""
+响应缓存 - 读多写少接口的进程内LRU缓存
+
+- 缓存键为路由路径加查询参数，值为完整的响应体，按总字节数做LRU淘汰
+- 每个缓存条目记录所依赖的表以及写入缓存时这些表的代数(generation)
+- 通过SQLAlchemy会话事件跟踪被修改的表：flush(ORM对象增删改)和session.execute
+  (批量INSERT/UPDATE/DELETE)时在同一事务内把cache_generations表中对应行的代数加1，
+  提交后清除本进程内依赖这些表的条目；删除时经外键ON DELETE CASCADE级联删除的表一并计入；
+  由数据库触发器从其他表派生的表（如统计汇总表，见register_derived_tables）随来源表一并计入
+- 其他gunicorn worker在命中缓存前读取依赖表的当前代数，与条目记录的不一致即视为过期，
+  因此跨进程也能保持一致
+- 同一组代数也用来生成弱ETag：请求带If-None-Match且代数未变时直接返回304，不执行接口查询；
+  压缩后的响应体（见utils/compression）与条目一起缓存，命中时不必重复压缩
+
+绕过会话直接写库（如sqlite3脚本）不会更新代数，需要手动调用 bump_generations。
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+from flask import current_app, request, make_response
+from sqlalchemy import event, select, update, insert
+
+from models import db, CacheGeneration
+
+logger = logging.getLogger(__name__)
+
+# 缓存总字节数上限
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# 单个条目最多占总容量的比例，超过的响应不缓存
+MAX_ENTRY_RATIO = 8
+
+# 不参与缓存失效跟踪的表
+UNTRACKED_TABLES = {'cache_generations', 'jobs'}
+
+_generations_table = CacheGeneration.__table__
+
+# 来源表 -> 由触发器从该表派生的表；触发器写入不经过会话事件，修改来源表时一并更新派生表的代数
+_derived_tables = {}
+
+
+class CacheEntry:
+    __slots__ = ('body', 'status', 'mimetype', 'tables', 'generations', 'variants')
+
+    def __init__(self, body, status, mimetype, tables, generations):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.tables = tables
+        self.generations = generations
+        # 压缩后的响应体 {编码: 字节串}
+        self.variants = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(data) for data in self.variants.values())
+
+
+class ResponseCache:
+    """按字节数淘汰的LRU缓存，线程安全"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key, generations):
+        """查找条目，依赖表的代数与当前不一致时视为过期并移除"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry.generations != generations:
+                self._stats['stale'] += 1
+                self._stats['misses'] += 1
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def put(self, key, entry):
+        if entry.size * MAX_ENTRY_RATIO > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def add_variant(self, key, entry, encoding, data):
+        """为仍在缓存中的条目保存压缩后的响应体"""
+        with self._lock:
+            if self._entries.get(key) is not entry or encoding in entry.variants:
+                return
+            entry.variants[encoding] = data
+            self._bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats['evictions'] += 1
+
+    def invalidate_tables(self, tables):
+        """移除依赖任一给定表的条目"""
+        tables = set(tables)
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry.tables & tables]
+            for key in keys:
+                self._remove(key)
+            self._stats['invalidations'] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=round(self._stats['hits'] / lookups, 4) if lookups else None,
+            )
+
+
+def read_generations(tables):
+    """读取给定表的当前代数，没有记录的表代数为0"""
+    rows = db.session.execute(
+        select(_generations_table.c.table_name, _generations_table.c.generation)
+        .where(_generations_table.c.table_name.in_(tables))
+    )
+    current = dict(rows.all())
+    return tuple(current.get(table, 0) for table in tables)
+
+
+def bump_generations(connection, tables):
+    """在给定连接的事务内把各表代数加1"""
+    table = _generations_table
+    for name in sorted(tables):
+        result = connection.execute(
+            update(table)
+            .where(table.c.table_name == name)
+            .values(generation=table.c.generation + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(table_name=name, generation=1))
+
+
+def register_derived_tables(source, derived):
+    """登记由数据库触发器从source表写入的derived表，修改source表时derived表的缓存一并失效"""
+    _derived_tables.setdefault(source, set()).update(derived)
+
+
+def _track_tables(session, tables):
+    """记录本事务修改的表，并在同一事务内更新代数（每个事务每张表只更新一次）"""
+    tables = {name for name in tables if name and name not in UNTRACKED_TABLES}
+    for name in list(tables):
+        tables |= _derived_tables.get(name, set())
+    bumped = session.info.setdefault('cache_bumped_tables', set())
+    pending = tables - bumped
+    if not pending:
+        return
+    bump_generations(session.connection(), pending)
+    bumped.update(pending)
+
+
+@lru_cache(maxsize=None)
+def cascade_tables(name):
+    """删除name表的行时经ON DELETE CASCADE外键（递归）一并删除的表"""
+    tables = set()
+    pending = [name]
+    while pending:
+        parent = pending.pop()
+        for table in db.metadata.tables.values():
+            if table.name in tables:
+                continue
+            if any(fk.ondelete and fk.ondelete.upper() == 'CASCADE' and fk.column.table.name == parent
+                   for fk in table.foreign_keys):
+                tables.add(table.name)
+                pending.append(table.name)
+    return frozenset(tables)
+
+
+def _after_flush(session, flush_context):
+    objects = list(session.new) + list(session.dirty) + list(session.deleted)
+    tables = {obj.__table__.name for obj in objects if hasattr(obj, '__table__')}
+    for obj in session.deleted:
+        if hasattr(obj, '__table__'):
+            tables |= cascade_tables(obj.__table__.name)
+    _track_tables(session, tables)
+
+
+def _do_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    name = getattr(table, 'name', None)
+    if name:
+        tables = {name}
+        if orm_execute_state.is_delete:
+            tables |= cascade_tables(name)
+        _track_tables(orm_execute_state.session, tables)
+
+
+def _after_commit(session):
+    tables = session.info.pop('cache_bumped_tables', None)
+    if not tables:
+        return
+    for cache in _caches:
+        cache.invalidate_tables(tables)
+
+
+def _after_rollback(session):
+    session.info.pop('cache_bumped_tables', None)
+
+
+# 所有已初始化的缓存实例（每个应用一个），提交后统一失效
+_caches = []
+_events_registered = False
+
+
+def init_response_cache(app):
+    """创建应用的响应缓存并注册会话事件"""
+    global _events_registered
+    cache = ResponseCache(app.config.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+    app.extensions['response_cache'] = cache
+    _caches.append(cache)
+
+    if not _events_registered:
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
+        _events_registered = True
+    return cache
+
+
+def _is_cacheable(response):
+    """只缓存成功的JSON响应，接口内部出错但返回200的也不缓存；流式响应不缓存"""
+    if response.is_streamed:
+        return False
+    if response.status_code != 200 or not response.is_json:
+        return False
+    payload = response.get_json(silent=True)
+    if isinstance(payload, dict) and (payload.get('success') is False or 'error' in payload):
+        return False
+    return True
+
+
+def make_etag(key, generations):
+    """由缓存键和依赖表代数生成ETag值，不需要读取响应体"""
+    digest = hashlib.blake2b(repr((key, generations)).encode('utf-8'), digest_size=12)
+    return digest.hexdigest()
+
+
+def _not_modified(etag):
+    response = current_app.response_class(status=304)
+    _set_validators(response, etag)
+    return response
+
+
+def _set_validators(response, etag):
+    response.set_etag(etag, weak=True)
+    # 客户端可以保存响应，但每次使用前都要带If-None-Match重新验证
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+
+
+def cached_variant(response, encoding):
+    """返回响应对应缓存条目中已压缩的响应体，没有时返回None"""
+    cached = getattr(response, 'cache_entry', None)
+    if cached is None:
+        return None
+    return cached[2].variants.get(encoding)
+
+
+def store_variant(response, encoding, data):
+    """把压缩后的响应体保存到响应对应的缓存条目"""
+    cached = getattr(response, 'cache_entry', None)
+    if cached is not None:
+        cache, key, entry = cached
+        cache.add_variant(key, entry, encoding, data)
+
+
+def cached_response(*tables):
+    """
+    缓存GET接口的响应，并按依赖表的代数处理条件请求(ETag / If-None-Match)
+
+    Args:
+        tables: 响应数据依赖的表名，任一表被修改后缓存失效、ETag改变
+
+    用法:
+        @customer_bp.route('/stats', methods=['GET'])
+        @cached_response('customers', 'projects', 'consumptions')
+        def get_stats():
+            ...
+    """
+    tables = tuple(sorted(tables))
+    dependencies = frozenset(tables)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            cache = current_app.extensions.get('response_cache')
+            if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+                cache = None
+            use_etag = current_app.config.get('ETAG_ENABLED', True)
+            if cache is None and not use_etag:
+                return view(*args, **kwargs)
+
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            # 先读代数再执行查询：期间若有写入提交，条目代数偏旧，下次读取时会被判为过期
+            generations = read_generations(tables)
+            etag = make_etag(key, generations) if use_etag else None
+            # If-None-Match: * 不处理，资源是否存在要执行接口才知道
+            if_none_match = request.if_none_match
+            if etag is not None and not if_none_match.star_tag and if_none_match.contains_weak(etag):
+                return _not_modified(etag)
+
+            entry = cache.get(key, generations) if cache is not None else None
+            if entry is not None:
+                response = current_app.response_class(entry.body, status=entry.status, mimetype=entry.mimetype)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if not _is_cacheable(response):
+                    return response
+                if cache is not None:
+                    entry = CacheEntry(response.get_data(), response.status_code, response.mimetype,
+                                       dependencies, generations)
+                    cache.put(key, entry)
+            if entry is not None:
+                response.cache_entry = (cache, key, entry)
+            if etag is not None:
+                _set_validators(response, etag)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,295 @@
+"""
+统计汇总表 - 按天预聚合的门店、项目、美容师数据
+
+统计接口原来每次请求都对consumptions/services/service_items做全表聚合，
+耗时随历史数据量增长。这里维护三张按天分桶的汇总表：
+- daily_store_stats: (日期, 门店) 消费金额/笔数、到店次数/服务金额
+- daily_project_stats: (日期, 项目名称) 服务项目条数/金额
+- daily_beautician_stats: (日期, 美容师) 服务项目条数/金额
+
+汇总表由SQLite触发器在写入明细时增量维护，与明细写入处于同一事务，
+ORM、批量executemany和直接用sqlite3写库都会触发。门店取客户当前所属门店，
+客户修改门店时触发器把该客户的历史数据整体移到新门店；找不到客户的明细计入空门店。
+服务项目按所属服务记录的日期分桶，服务记录改日期时其项目一并移动。
+
+统计接口只需要对日期范围内的分桶求和。已有的历史数据，以及删除触发器期间的写入，
+通过 rebuild_rollups / scripts/backfill_rollups.py 重建。
+"""
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from utils.response_cache import bump_generations, register_derived_tables
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLES = ('daily_store_stats', 'daily_project_stats', 'daily_beautician_stats')
+
+DAY_FORMAT = '%Y-%m-%d'
+
+# 来源表 -> 其触发器写入的汇总表；修改来源表时使依赖汇总表的响应缓存一并失效
+ROLLUP_SOURCES = {
+    'consumptions': ('daily_store_stats',),
+    'services': ROLLUP_TABLES,
+    'service_items': ('daily_project_stats', 'daily_beautician_stats'),
+    'customers': ('daily_store_stats',),
+}
+for _source, _rollups in ROLLUP_SOURCES.items():
+    register_derived_tables(_source, _rollups)
+
+# ---- 触发器SQL ----
+
+_STORE_UPSERT = """
+INSERT INTO daily_store_stats (day, store, revenue, consumption_count, visit_count, service_amount)
+{source}
+ON CONFLICT (day, store) DO UPDATE SET
+    revenue = revenue + excluded.revenue,
+    consumption_count = consumption_count + excluded.consumption_count,
+    visit_count = visit_count + excluded.visit_count,
+    service_amount = service_amount + excluded.service_amount"""
+
+_PROJECT_UPSERT = """
+INSERT INTO daily_project_stats (day, project_name, item_count, amount)
+{source}
+ON CONFLICT (day, project_name) DO UPDATE SET
+    item_count = item_count + excluded.item_count,
+    amount = amount + excluded.amount"""
+
+_BEAUTICIAN_UPSERT = """
+INSERT INTO daily_beautician_stats (day, beautician_name, item_count, amount)
+{source}
+ON CONFLICT (day, beautician_name) DO UPDATE SET
+    item_count = item_count + excluded.item_count,
+    amount = amount + excluded.amount"""
+
+
+def _store_of(row):
+    return f"COALESCE((SELECT store FROM customers WHERE id = {row}.customer_id), '')"
+
+
+def _item_amount(row):
+    return f"COALESCE({row}.unit_price, 0) * COALESCE({row}.quantity, 1)"
+
+
+def _consumption_delta(row, sign):
+    """单条消费记录对门店分桶的增减"""
+    return _STORE_UPSERT.format(source=(
+        f"SELECT date({row}.date), {_store_of(row)}, {sign}COALESCE({row}.amount, 0), {sign}1, 0, 0 "
+        f"WHERE date({row}.date) IS NOT NULL"
+    ))
+
+
+def _service_delta(row, sign):
+    """单条服务记录对门店分桶的增减"""
+    return _STORE_UPSERT.format(source=(
+        f"SELECT date({row}.service_date), {_store_of(row)}, 0, 0, {sign}1, {sign}COALESCE({row}.total_amount, 0) "
+        f"WHERE date({row}.service_date) IS NOT NULL"
+    ))
+
+
+def _item_deltas(row, sign):
+    """单条服务项目对项目、美容师分桶的增减，日期取所属服务记录"""
+    where = f"FROM services s WHERE s.service_id = {row}.service_id AND date(s.service_date) IS NOT NULL"
+    return [
+        _PROJECT_UPSERT.format(source=(
+            f"SELECT date(s.service_date), {row}.project_name, {sign}1, {sign}({_item_amount(row)}) {where}"
+        )),
+        _BEAUTICIAN_UPSERT.format(source=(
+            f"SELECT date(s.service_date), COALESCE({row}.beautician_name, ''), {sign}1, "
+            f"{sign}({_item_amount(row)}) {where}"
+        )),
+    ]
+
+
+def _service_items_deltas(service_id, day, sign):
+    """某服务记录下全部服务项目对项目、美容师分桶的增减"""
+    where = f"FROM service_items i WHERE i.service_id = {service_id} AND {day} IS NOT NULL"
+    return [
+        _PROJECT_UPSERT.format(source=(
+            f"SELECT {day}, i.project_name, {sign}COUNT(*), {sign}SUM({_item_amount('i')}) "
+            f"{where} GROUP BY i.project_name"
+        )),
+        _BEAUTICIAN_UPSERT.format(source=(
+            f"SELECT {day}, COALESCE(i.beautician_name, ''), {sign}COUNT(*), {sign}SUM({_item_amount('i')}) "
+            f"{where} GROUP BY COALESCE(i.beautician_name, '')"
+        )),
+    ]
+
+
+def _move_customer(customer_id, from_store, to_store):
+    """把某客户的消费和服务记录从一个门店分桶移到另一个门店分桶"""
+    statements = []
+    for store, sign in ((from_store, '-'), (to_store, '')):
+        statements.append(_STORE_UPSERT.format(source=(
+            f"SELECT date(c.date), {store}, {sign}SUM(COALESCE(c.amount, 0)), {sign}COUNT(*), 0, 0 "
+            f"FROM consumptions c WHERE c.customer_id = {customer_id} AND date(c.date) IS NOT NULL "
+            f"GROUP BY date(c.date)"
+        )))
+        statements.append(_STORE_UPSERT.format(source=(
+            f"SELECT date(s.service_date), {store}, 0, 0, {sign}COUNT(*), {sign}SUM(COALESCE(s.total_amount, 0)) "
+            f"FROM services s WHERE s.customer_id = {customer_id} AND date(s.service_date) IS NOT NULL "
+            f"GROUP BY date(s.service_date)"
+        )))
+    return statements
+
+
+def _trigger(name, timing, table, statements, when=None):
+    condition = f"\nWHEN {when}" if when else ''
+    body = ';\n'.join(statement.strip() for statement in statements)
+    return f"CREATE TRIGGER IF NOT EXISTS {name} {timing} ON {table}{condition}\nBEGIN\n{body};\nEND"
+
+
+# (触发器名, 时机, 表, 语句列表, 条件)
+ROLLUP_TRIGGERS = [
+    ('trg_rollup_consumptions_insert', 'AFTER INSERT', 'consumptions',
+     [_consumption_delta('NEW', '')], None),
+    ('trg_rollup_consumptions_delete', 'AFTER DELETE', 'consumptions',
+     [_consumption_delta('OLD', '-')], None),
+    ('trg_rollup_consumptions_update', 'AFTER UPDATE OF customer_id, date, amount', 'consumptions',
+     [_consumption_delta('OLD', '-'), _consumption_delta('NEW', '')], None),
+
+    ('trg_rollup_services_insert', 'AFTER INSERT', 'services',
+     [_service_delta('NEW', '')], None),
+    ('trg_rollup_services_delete', 'AFTER DELETE', 'services',
+     [_service_delta('OLD', '-')], None),
+    ('trg_rollup_services_update', 'AFTER UPDATE OF customer_id, service_date, total_amount', 'services',
+     [_service_delta('OLD', '-'), _service_delta('NEW', '')], None),
+    # 服务记录改日期时，其服务项目随之移到新日期
+    ('trg_rollup_services_move_items', 'AFTER UPDATE OF service_date', 'services',
+     _service_items_deltas('NEW.service_id', 'date(OLD.service_date)', '-')
+     + _service_items_deltas('NEW.service_id', 'date(NEW.service_date)', ''),
+     'date(OLD.service_date) IS NOT date(NEW.service_date)'),
+    # 删除服务记录前先扣除其服务项目；级联删除项目时服务记录已不存在，项目触发器不会重复扣除
+    ('trg_rollup_services_before_delete', 'BEFORE DELETE', 'services',
+     _service_items_deltas('OLD.service_id', 'date(OLD.service_date)', '-'), None),
+
+    ('trg_rollup_service_items_insert', 'AFTER INSERT', 'service_items',
+     _item_deltas('NEW', ''), None),
+    ('trg_rollup_service_items_delete', 'AFTER DELETE', 'service_items',
+     _item_deltas('OLD', '-'), None),
+    ('trg_rollup_service_items_update',
+     'AFTER UPDATE OF service_id, project_name, beautician_name, unit_price, quantity', 'service_items',
+     _item_deltas('OLD', '-') + _item_deltas('NEW', ''), None),
+
+    ('trg_rollup_customers_store', 'AFTER UPDATE OF store', 'customers',
+     _move_customer('NEW.id', "COALESCE(OLD.store, '')", "COALESCE(NEW.store, '')"),
+     "COALESCE(OLD.store, '') IS NOT COALESCE(NEW.store, '')"),
+    # 先有明细后建客户（未开启外键约束时）把空门店下的数据移到客户门店
+    ('trg_rollup_customers_insert', 'AFTER INSERT', 'customers',
+     _move_customer('NEW.id', "''", 'NEW.store'),
+     "COALESCE(NEW.store, '') != ''"),
+    # 删除客户前把其数据移到空门店，之后删除明细（含级联删除）时从空门店扣除
+    ('trg_rollup_customers_before_delete', 'BEFORE DELETE', 'customers',
+     _move_customer('OLD.id', 'OLD.store', "''"),
+     "COALESCE(OLD.store, '') != ''"),
+]
+
+
+def install_rollup_triggers(connection):
+    """在给定连接上创建汇总表触发器（已存在则跳过），非SQLite数据库不支持"""
+    if connection.dialect.name != 'sqlite':
+        logger.warning(f"汇总表触发器只支持SQLite，当前数据库: {connection.dialect.name}，统计数据需定期重建")
+        return
+    for name, timing, table, statements, when in ROLLUP_TRIGGERS:
+        connection.exec_driver_sql(_trigger(name, timing, table, statements, when))
+
+
+def drop_rollup_triggers(connection):
+    for name, *_ in ROLLUP_TRIGGERS:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+
+# ---- 重建 ----
+
+_DAY_RANGE = "{day} IS NOT NULL AND (:start IS NULL OR {day} >= :start) AND (:end IS NULL OR {day} <= :end)"
+
+_REBUILD_STATEMENTS = [
+    _STORE_UPSERT.format(source=(
+        "SELECT date(c.date), COALESCE(cu.store, ''), SUM(COALESCE(c.amount, 0)), COUNT(*), 0, 0 "
+        "FROM consumptions c LEFT JOIN customers cu ON cu.id = c.customer_id "
+        f"WHERE {_DAY_RANGE.format(day='date(c.date)')} "
+        "GROUP BY date(c.date), COALESCE(cu.store, '')"
+    )),
+    _STORE_UPSERT.format(source=(
+        "SELECT date(s.service_date), COALESCE(cu.store, ''), 0, 0, COUNT(*), SUM(COALESCE(s.total_amount, 0)) "
+        "FROM services s LEFT JOIN customers cu ON cu.id = s.customer_id "
+        f"WHERE {_DAY_RANGE.format(day='date(s.service_date)')} "
+        "GROUP BY date(s.service_date), COALESCE(cu.store, '')"
+    )),
+    _PROJECT_UPSERT.format(source=(
+        f"SELECT date(s.service_date), i.project_name, COUNT(*), SUM({_item_amount('i')}) "
+        "FROM service_items i JOIN services s ON s.service_id = i.service_id "
+        f"WHERE {_DAY_RANGE.format(day='date(s.service_date)')} "
+        "GROUP BY date(s.service_date), i.project_name"
+    )),
+    _BEAUTICIAN_UPSERT.format(source=(
+        f"SELECT date(s.service_date), COALESCE(i.beautician_name, ''), COUNT(*), SUM({_item_amount('i')}) "
+        "FROM service_items i JOIN services s ON s.service_id = i.service_id "
+        f"WHERE {_DAY_RANGE.format(day='date(s.service_date)')} "
+        "GROUP BY date(s.service_date), COALESCE(i.beautician_name, '')"
+    )),
+]
+
+
+def rebuild_rollups(connection, start=None, end=None):
+    """
+    从明细表重建汇总表
+
+    Args:
+        connection: 处于事务中的数据库连接，重建与明细写入互斥
+        start: 起始日期(YYYY-MM-DD)，为None时不限
+        end: 结束日期(YYYY-MM-DD，含当天)，为None时不限
+
+    Returns:
+        dict: 各汇总表重建后的分桶数
+    """
+    params = {'start': start, 'end': end}
+    for table in ROLLUP_TABLES:
+        connection.execute(
+            text(f"DELETE FROM {table} WHERE (:start IS NULL OR day >= :start) AND (:end IS NULL OR day <= :end)"),
+            params)
+    for statement in _REBUILD_STATEMENTS:
+        connection.execute(text(statement), params)
+    # 重建不经过ORM会话，需要手动使依赖汇总表的响应缓存失效
+    bump_generations(connection, ROLLUP_TABLES)
+
+    return {
+        table: connection.execute(
+            text(f"SELECT COUNT(*) FROM {table} WHERE (:start IS NULL OR day >= :start) AND (:end IS NULL OR day <= :end)"),
+            params).scalar()
+        for table in ROLLUP_TABLES
+    }
+
+
+# ---- 查询 ----
+
+def parse_day(value):
+    """把YYYY-MM-DD格式的日期规范化，格式错误时记录警告并返回None"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, DAY_FORMAT).strftime(DAY_FORMAT)
+    except ValueError:
+        logger.warning(f"无效的日期格式: {value}")
+        return None
+
+
+def parse_day_range(args):
+    """从请求参数start_date/end_date解析日期范围，两端都包含"""
+    return parse_day(args.get('start_date')), parse_day(args.get('end_date'))
+
+
+def next_day(day):
+    """返回下一天的日期字符串，用于把含当天的结束日期换成明细表上的开区间"""
+    return (datetime.strptime(day, DAY_FORMAT) + timedelta(days=1)).strftime(DAY_FORMAT)
+
+
+def filter_days(query, model, start=None, end=None):
+    """只保留日期范围内的分桶"""
+    if start:
+        query = query.filter(model.day >= start)
+    if end:
+        query = query.filter(model.day <= end)
+    return query
+
@@ -0,0 +1,228 @@
+"""
+序列化工具 - 预编译的模型序列化函数和orjson响应
+
+各模型的to_dict逐字段手写字典并对每个时间字段调用strftime，列表页和导出时
+序列化占了大部分CPU。这里按 (模型, 字段集) 从 __table__.columns 生成一次序列化函数
+并缓存：
+- get_serializer(model, fields): 序列化ORM对象，输出与to_dict一致
+- get_row_serializer(model, fields): 直接序列化Core查询返回的行元组，不实例化ORM对象，
+  配合 select_columns(model, fields) 使用
+- 时间字段用 isoformat 代替 strftime 格式化，结果相同
+- 已安装orjson时，Flask的jsonify改用orjson编码（OrjsonProvider），未安装时保持原行为
+
+Service的service_items等嵌套字段通过 register_nested 注册。
+"""
+import json
+import logging
+import threading
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import DateTime, select
+
+from models import Service, ServiceItem
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 与各模型to_dict一致的时间格式
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def format_datetime(value):
+    """格式化为YYYY-MM-DD HH:MM:SS，isoformat比strftime快数倍；公元1000年以前的日期走strftime"""
+    if value is None:
+        return None
+    if value.year >= 1000:
+        return value.isoformat(' ', 'seconds')
+    return value.strftime(DATETIME_FORMAT)
+
+
+# {模型: {字段名: (关系属性名, 嵌套模型)}}
+_nested = {}
+
+# {(模型, 字段集, 类型): 序列化函数}
+_serializers = {}
+_lock = threading.Lock()
+
+
+def register_nested(model, name, nested_model, attribute=None):
+    """
+    注册嵌套字段，序列化时输出为嵌套模型的完整字典列表
+
+    Args:
+        model: 所属模型，如Service
+        name: 输出的字段名，如'service_items'
+        nested_model: 嵌套记录的模型，如ServiceItem
+        attribute: 关系属性名，默认与name相同
+    """
+    _nested.setdefault(model, {})[name] = (attribute or name, nested_model)
+    with _lock:
+        for key in [key for key in _serializers if key[0] is model]:
+            _serializers.pop(key)
+
+
+def nested_fields(model):
+    return tuple(_nested.get(model, {}))
+
+
+def _columns(model):
+    return list(model.__table__.columns)
+
+
+def _resolve_fields(model, fields):
+    """返回 (列列表, 嵌套字段列表)，fields为None时为全部列加全部嵌套字段"""
+    columns = {column.key: column for column in _columns(model)}
+    nested = _nested.get(model, {})
+    if fields is None:
+        return list(columns.values()), list(nested)
+    unknown = [name for name in fields if name not in columns and name not in nested]
+    if unknown:
+        raise KeyError(f"{model.__name__}没有字段: {', '.join(unknown)}")
+    return [columns[name] for name in fields if name in columns], [name for name in fields if name in nested]
+
+
+def _compile(name, source, namespace):
+    code = compile(source, f'<serializer {name}>', 'exec')
+    exec(code, namespace)
+    return namespace[name]
+
+
+def _build_object_serializer(model, fields):
+    columns, nested = _resolve_fields(model, fields)
+    namespace = {'_fmt': format_datetime}
+    entries = []
+    for column in columns:
+        if isinstance(column.type, DateTime):
+            entries.append(f"{column.key!r}: _fmt(obj.{column.key})")
+        else:
+            entries.append(f"{column.key!r}: obj.{column.key}")
+    for index, field in enumerate(nested):
+        attribute, nested_model = _nested[model][field]
+        namespace[f'_nested{index}'] = get_serializer(nested_model)
+        entries.append(f"{field!r}: [_nested{index}(item) for item in obj.{attribute}]")
+    source = "def serialize(obj):\n    return {" + ", ".join(entries) + "}\n"
+    return _compile('serialize', source, namespace)
+
+
+def _build_row_serializer(model, fields):
+    columns, nested = _resolve_fields(model, fields)
+    if nested:
+        raise ValueError(f"行序列化不支持嵌套字段: {', '.join(nested)}")
+    namespace = {'_fmt': format_datetime}
+    entries = []
+    for index, column in enumerate(columns):
+        if isinstance(column.type, DateTime):
+            entries.append(f"{column.key!r}: _fmt(row[{index}])")
+        else:
+            entries.append(f"{column.key!r}: row[{index}]")
+    source = "def serialize_row(row):\n    return {" + ", ".join(entries) + "}\n"
+    return _compile('serialize_row', source, namespace)
+
+
+def _get(kind, builder, model, fields):
+    key = (model, tuple(fields) if fields is not None else None, kind)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        serializer = builder(model, fields)
+        with _lock:
+            _serializers[key] = serializer
+    return serializer
+
+
+def get_serializer(model, fields=None):
+    """
+    获取ORM对象的序列化函数
+
+    Args:
+        model: 模型类
+        fields: 字段名列表，为None时为全部列及已注册的嵌套字段（与to_dict一致）
+
+    Returns:
+        function: serialize(obj) -> dict
+    """
+    return _get('object', _build_object_serializer, model, fields)
+
+
+def get_row_serializer(model, fields=None):
+    """获取Core行元组的序列化函数，行中列的顺序须与select_columns(model, fields)一致"""
+    return _get('row', _build_row_serializer, model, fields)
+
+
+def select_columns(model, fields=None):
+    """构造只查询指定列的select语句，列顺序与get_row_serializer一致"""
+    columns, _ = _resolve_fields(model, fields)
+    return select(*columns)
+
+
+def serialize(obj, fields=None):
+    """序列化单个ORM对象"""
+    return get_serializer(type(obj), fields)(obj)
+
+
+def serialize_many(objects, model=None, fields=None):
+    """序列化ORM对象列表"""
+    objects = list(objects)
+    if not objects:
+        return []
+    serializer = get_serializer(model or type(objects[0]), fields)
+    return [serializer(obj) for obj in objects]
+
+
+register_nested(Service, 'service_items', ServiceItem)
+
+
+# ---- JSON编码 ----
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps_bytes(obj, default=None, sort_keys=False, indent=False):
+    """编码为UTF-8 JSON字节串，优先使用orjson"""
+    if orjson is not None:
+        options = _ORJSON_OPTIONS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=options)
+    return json.dumps(obj, default=default, ensure_ascii=False, sort_keys=sort_keys,
+                      indent=2 if indent else None,
+                      separators=None if indent else (',', ':')).encode('utf-8')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    使用orjson的Flask JSON提供者
+
+    orjson不支持的类型（时间、Decimal、UUID、dataclass等）交给Flask默认的default处理；
+    不对键排序、不转义中文，输出比标准库更短。
+    """
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # 带自定义参数（如cls、indent）时退回标准库实现
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, default=self.default, sort_keys=self.sort_keys).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = dumps_bytes(obj, default=self.default, sort_keys=self.sort_keys or indent, indent=indent)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    """JSON_BACKEND为orjson且已安装orjson时替换应用的JSON提供者"""
+    backend = app.config.get('JSON_BACKEND', 'orjson')
+    if backend != 'orjson':
+        return
+    if orjson is None:
+        logger.warning("未安装orjson，JSON响应使用标准库编码")
+        return
+    app.json = OrjsonProvider(app)
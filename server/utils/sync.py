@@ -0,0 +1,287 @@
+"""
+增量同步 - 按updated_at返回自上次同步以来变化的记录和删除记录
+
+客户端原来每次刷新都重新下载全部客户和消费记录。这里按同步令牌(token)只返回变化的数据：
+- 各表按 (updated_at, 主键) 顺序读取，令牌记录每张表读到的位置，(updated_at, 主键)上有索引
+- 删除由SQLite触发器写入sync_tombstones表（删除日志），ORM、批量删除、级联删除和直接用
+  sqlite3删除都会记录；按自增id顺序返回，行已重新创建的删除记录不返回
+- 每页最多limit条（变化记录加删除记录），服务端内存占用与总数据量无关；从空令牌开始
+  逐页请求直到has_more为false，即可从零同步到最新
+- updated_at在应用中生成，写锁等待期间可能晚于其他已提交的记录，因此最后一页读到的记录
+  在最近SYNC_OVERLAP之内时，令牌把读取位置回退到 当前时间 - SYNC_OVERLAP，下次同步会重复返回
+  这段时间内的记录，客户端按主键覆盖即可
+
+绕过ORM写库且不更新updated_at的修改不会被同步。
+"""
+import base64
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import Integer, and_, delete, func, or_, select, tuple_
+
+from models import db, Customer, HealthRecord, Consumption, Service, ServiceItem, Communication, Project, SyncTombstone
+from utils.db_engine import DEFAULT_BUSY_TIMEOUT
+from utils.serializers import get_row_serializer, select_columns, format_datetime
+
+logger = logging.getLogger(__name__)
+
+# 可同步的表: 表名 -> (模型, 主键列名)，按此顺序返回
+SYNC_TABLES = OrderedDict([
+    ('customers', (Customer, 'id')),
+    ('projects', (Project, 'id')),
+    ('health_records', (HealthRecord, 'id')),
+    ('consumptions', (Consumption, 'id')),
+    ('services', (Service, 'service_id')),
+    ('service_items', (ServiceItem, 'id')),
+    ('communications', (Communication, 'id')),
+])
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+
+# 最近SYNC_OVERLAP之内的记录在同步完成后会再返回一次，覆盖写锁等待时间
+SYNC_OVERLAP = timedelta(milliseconds=DEFAULT_BUSY_TIMEOUT) + timedelta(seconds=5)
+
+# 删除记录保留天数，令牌早于保留范围时需要重新全量同步
+TOMBSTONE_RETENTION_DAYS = 90
+
+TOKEN_VERSION = 1
+
+# IN查询每批的主键数
+IN_CHUNK_SIZE = 500
+
+
+class InvalidSyncToken(ValueError):
+    """同步令牌格式错误"""
+
+
+class SyncTokenExpired(InvalidSyncToken):
+    """令牌之后的删除记录已被清理，需要重新全量同步"""
+
+
+# ---- 删除日志触发器 ----
+
+def _tombstone_trigger(table, pk):
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS sync_{table}_delete AFTER DELETE ON {table}\n"
+        f"BEGIN\n"
+        f"INSERT INTO sync_tombstones (table_name, row_id, deleted_at) "
+        f"VALUES ('{table}', OLD.{pk}, datetime('now', 'localtime'));\n"
+        f"END"
+    )
+
+
+def install_sync_triggers(connection):
+    """在给定连接上创建删除日志触发器（已存在则跳过），非SQLite数据库不支持"""
+    if connection.dialect.name != 'sqlite':
+        logger.warning(f"删除日志触发器只支持SQLite，当前数据库: {connection.dialect.name}，增量同步不会返回删除记录")
+        return
+    for table, (_, pk) in SYNC_TABLES.items():
+        connection.exec_driver_sql(_tombstone_trigger(table, pk))
+
+
+def drop_sync_triggers(connection):
+    for table in SYNC_TABLES:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS sync_{table}_delete")
+
+
+def purge_tombstones(connection, days=TOMBSTONE_RETENTION_DAYS):
+    """
+    删除早于保留天数的删除记录，始终保留最新一条，用于判断令牌是否过期
+
+    Returns:
+        int: 删除的条数
+    """
+    table = SyncTombstone.__table__
+    cutoff = datetime.now() - timedelta(days=days)
+    newest = connection.execute(select(func.max(table.c.id))).scalar()
+    if newest is None:
+        return 0
+    result = connection.execute(delete(table).where(table.c.deleted_at < cutoff, table.c.id < newest))
+    return result.rowcount
+
+
+# ---- 令牌 ----
+
+def encode_token(cursors, tombstone_id):
+    """
+    编码同步令牌
+
+    Args:
+        cursors: {表名: (updated_at, 主键)}，主键为None表示从该时间（含）开始
+        tombstone_id: 已读取的最后一条删除记录id
+    """
+    payload = {
+        'v': TOKEN_VERSION,
+        'c': {table: [value.isoformat() if value else None, key] for table, (value, key) in cursors.items()},
+        'd': tombstone_id,
+    }
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    """解析同步令牌，返回(cursors, tombstone_id)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if payload.get('v') != TOKEN_VERSION:
+            raise ValueError(payload.get('v'))
+        cursors = {}
+        for table, (value, key) in payload['c'].items():
+            if table in SYNC_TABLES:
+                cursors[table] = (datetime.fromisoformat(value) if value else None, key)
+        return cursors, int(payload['d'])
+    except (ValueError, TypeError, KeyError, AttributeError, UnicodeError) as e:
+        raise InvalidSyncToken(f"无效的同步令牌: {token}") from e
+
+
+def parse_tables(value):
+    """解析tables参数，为空时返回全部可同步的表"""
+    if not value:
+        return list(SYNC_TABLES)
+    tables = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in tables if name not in SYNC_TABLES]
+    if unknown:
+        raise ValueError(f"不支持同步的表: {', '.join(unknown)}，可选: {', '.join(SYNC_TABLES)}")
+    return [name for name in SYNC_TABLES if name in tables]
+
+
+# ---- 读取 ----
+
+def _after(updated_at, pk, cursor):
+    """(updated_at, 主键) 位于游标之后的条件；SQLite升序时NULL在前"""
+    value, key = cursor
+    if value is None:
+        if key is None:
+            return None
+        return or_(and_(updated_at.is_(None), pk > key), updated_at.isnot(None))
+    if key is None:
+        return updated_at >= value
+    return tuple_(updated_at, pk) > tuple_(value, key)
+
+
+def _read_changes(table, cursor, limit):
+    """读取一张表游标之后的最多limit条记录，返回(记录列表, 新游标)"""
+    model, pk_name = SYNC_TABLES[table]
+    # 只返回表本身的列，服务项目等嵌套数据由各自的表同步
+    fields = tuple(column.key for column in model.__table__.columns)
+    updated_index, pk_index = fields.index('updated_at'), fields.index(pk_name)
+    updated_at, pk = model.__table__.c.updated_at, model.__table__.c[pk_name]
+
+    query = select_columns(model, fields)
+    condition = _after(updated_at, pk, cursor)
+    if condition is not None:
+        query = query.where(condition)
+    rows = db.session.execute(query.order_by(updated_at, pk).limit(limit)).all()
+
+    serializer = get_row_serializer(model, fields)
+    if rows:
+        last = rows[-1]
+        cursor = (last[updated_index], last[pk_index])
+    return [serializer(row) for row in rows], cursor
+
+
+def _existing_keys(table, row_ids):
+    model, pk_name = SYNC_TABLES[table]
+    pk = model.__table__.c[pk_name]
+    if isinstance(pk.type, Integer):
+        row_ids = [int(row_id) for row_id in row_ids]
+    existing = set()
+    for start in range(0, len(row_ids), IN_CHUNK_SIZE):
+        chunk = row_ids[start:start + IN_CHUNK_SIZE]
+        existing.update(str(key) for key in db.session.execute(select(pk).where(pk.in_(chunk))).scalars())
+    return existing
+
+
+def _read_tombstones(tables, after_id, limit):
+    """读取删除记录，跳过行已重新创建的记录，返回(删除记录列表, 最后读取的id, 是否还有未读的删除记录)"""
+    table = SyncTombstone.__table__
+    rows = db.session.execute(
+        select(table.c.id, table.c.table_name, table.c.row_id, table.c.deleted_at)
+        .where(table.c.id > after_id, table.c.table_name.in_(tables))
+        .order_by(table.c.id)
+        .limit(limit)
+    ).all()
+    if not rows:
+        return [], after_id, False
+
+    by_table = {}
+    for row in rows:
+        by_table.setdefault(row.table_name, []).append(row.row_id)
+    existing = {name: _existing_keys(name, row_ids) for name, row_ids in by_table.items()}
+
+    deleted = []
+    for row in rows:
+        if row.row_id in existing[row.table_name]:
+            continue
+        model, pk_name = SYNC_TABLES[row.table_name]
+        row_id = int(row.row_id) if isinstance(model.__table__.c[pk_name].type, Integer) else row.row_id
+        deleted.append({'table': row.table_name, 'id': row_id, 'deleted_at': format_datetime(row.deleted_at)})
+    return deleted, rows[-1].id, len(rows) == limit
+
+
+def _check_tombstone_horizon(after_id):
+    """令牌之后的删除记录已被清理时抛出SyncTokenExpired"""
+    oldest = db.session.execute(select(func.min(SyncTombstone.id))).scalar()
+    if oldest is not None and after_id < oldest - 1:
+        raise SyncTokenExpired("同步令牌已过期，请清空本地数据后重新同步")
+
+
+def sync_page(token=None, tables=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    读取一页增量数据
+
+    Args:
+        token: 上次返回的next_token，为空时从头同步
+        tables: 要同步的表名列表，默认全部
+        limit: 本页最多返回的记录数（变化记录加删除记录）
+
+    Returns:
+        dict: changes为{表名: [记录]}（只包含有变化的表），deleted为删除记录列表，
+              has_more为True时应立即用next_token继续请求
+    """
+    tables = tables or list(SYNC_TABLES)
+    if token:
+        cursors, tombstone_id = decode_token(token)
+        _check_tombstone_horizon(tombstone_id)
+    else:
+        # 空客户端不需要删除记录，从当前最后一条开始
+        cursors = {}
+        tombstone_id = db.session.execute(select(func.max(SyncTombstone.id))).scalar() or 0
+
+    changes = {}
+    remaining = limit
+    for table in tables:
+        cursor = cursors.get(table, (None, None))
+        if remaining > 0:
+            rows, cursor = _read_changes(table, cursor, remaining)
+            if rows:
+                changes[table] = rows
+                remaining -= len(rows)
+        cursors[table] = cursor
+
+    deleted, more_tombstones = [], remaining <= 0
+    if remaining > 0:
+        deleted, tombstone_id, more_tombstones = _read_tombstones(tables, tombstone_id, remaining)
+        remaining -= len(deleted)
+
+    has_more = remaining <= 0 or more_tombstones
+    if not has_more:
+        # 本轮已读到最新：最后一条记录还在SYNC_OVERLAP之内时，可能有更早时间的写入尚未提交，
+        # 下次从 当前时间 - SYNC_OVERLAP 开始读取；更早的记录已不会再有迟到的写入，保留精确游标，
+        # 空闲时的重复同步不再反复返回同一段记录
+        horizon = datetime.now() - SYNC_OVERLAP
+        cursors = {
+            table: (horizon, None) if value is not None and key is not None and value >= horizon else (value, key)
+            for table, (value, key) in cursors.items()
+        }
+
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'next_token': encode_token(cursors, tombstone_id),
+        'has_more': has_more,
+    }
@@ -7,6 +7,28 @@ const Logger = require('./logger');
 const logger = new Logger('Request');
 const apiConfig = require('../config/api');
 
+// GET响应的ETag缓存，服务端返回304时直接使用缓存数据
+const ETAG_CACHE_SIZE = 50;
+const etagCache = new Map();
+
+function etagCacheKey(url, data) {
+  return `${url}|${JSON.stringify(data || {})}`;
+}
+
+function saveEtag(key, res) {
+  const etag = res.header && (res.header['ETag'] || res.header['etag']);
+  // 流式响应中途出错时数据不完整（truncated），不能作为304的缓存数据
+  if (!etag || (res.data && res.data.truncated)) {
+    etagCache.delete(key);
+    return;
+  }
+  etagCache.delete(key);
+  etagCache.set(key, { etag, data: res.data });
+  if (etagCache.size > ETAG_CACHE_SIZE) {
+    etagCache.delete(etagCache.keys().next().value);
+  }
+}
+
 /**
  * 发起网络请求
  * @param {Object} options 请求配置
@@ -44,6 +66,13 @@ function request(options) {
     ...header
   };
 
+  // GET请求带上次的ETag做条件请求
+  const cacheKey = method === 'GET' ? etagCacheKey(url, data) : null;
+  const cached = cacheKey && etagCache.get(cacheKey);
+  if (cached) {
+    headers['If-None-Match'] = cached.etag;
+  }
+
   return new Promise((resolve, reject) => {
     logger.info(`${method} ${url}`, data);
 
@@ -62,7 +91,14 @@ function request(options) {
         }
 
         // 处理HTTP状态码
-        if (res.statusCode >= 200 && res.statusCode < 300) {
+        if (res.statusCode === 304 && cached) {
+          // 数据未变化，使用缓存
+          resolve(cached.data);
+        }
+        else if (res.statusCode >= 200 && res.statusCode < 300) {
+          if (cacheKey) {
+            saveEtag(cacheKey, res);
+          }
           resolve(res.data);
         } 
         // 处理重定向状态码
@@ -226,18 +262,92 @@ function del(url, data, options = {}) {
   });
 }
 
+/**
+ * 批量请求：多个子请求合并为一次POST /api/batch
+ * @param {Array<Object>} requests 子请求列表，每项包含path，可选id、method、params、body
+ * @param {Object} [options] 其他选项
+ * @returns {Promise<Array>} 与requests顺序一致的结果，每项包含status和body
+ */
+function batch(requests, options = {}) {
+  return post(apiConfig.getUrl(apiConfig.paths.batch), { requests }, options)
+    .then(res => res.data);
+}
+
+// 后台任务轮询间隔和最长等待时间(毫秒)
+const JOB_POLL_INTERVAL = 1000;
+const JOB_POLL_TIMEOUT = 30 * 60 * 1000;
+
+/**
+ * 等待后台任务结束：导入等接口返回202和job_id后，轮询GET /api/jobs/<id>直到成功或失败
+ * @param {string} jobId 任务ID
+ * @param {Object} [options] 其他选项
+ * @param {Function} [options.onProgress] 每次轮询得到任务状态后回调，参数为任务信息
+ * @param {number} [options.interval] 轮询间隔(毫秒)
+ * @param {number} [options.timeout] 最长等待时间(毫秒)
+ * @returns {Promise<Object>} 成功时返回任务信息（结果在result字段），失败或超时时reject
+ */
+function waitJob(jobId, options = {}) {
+  const {
+    onProgress,
+    interval = JOB_POLL_INTERVAL,
+    timeout = JOB_POLL_TIMEOUT
+  } = options;
+  const url = apiConfig.getUrl(apiConfig.paths.jobs.detail(jobId));
+  const deadline = Date.now() + timeout;
+
+  return new Promise((resolve, reject) => {
+    const poll = () => {
+      get(url, null, { showLoading: false })
+        .then(res => {
+          const job = res.data;
+          if (onProgress) {
+            onProgress(job);
+          }
+          if (job.status === 'succeeded') {
+            resolve(job);
+          } else if (job.status === 'failed') {
+            reject({
+              code: 0,
+              message: (job.errors && job.errors[job.errors.length - 1]) || '后台任务执行失败',
+              data: job
+            });
+          } else if (Date.now() > deadline) {
+            reject({ code: -1, message: '等待后台任务超时', data: job });
+          } else {
+            setTimeout(poll, interval);
+          }
+        })
+        .catch(reject);
+    };
+    poll();
+  });
+}
+
 module.exports = {
   request,
   get,
   post,
   put,
   delete: del,
+  batch,
+  waitJob,
   // 导出API工具函数
   api: {
     // 调用API的便捷方法
     getUrl: apiConfig.getUrl,
     // 常用API路径快捷方式
     customerList: () => get(apiConfig.getUrl(apiConfig.paths.customer.list)),
-    customerDetail: (id) => get(apiConfig.getUrl(apiConfig.paths.customer.detail(id)))
+    customerDetail: (id) => get(apiConfig.getUrl(apiConfig.paths.customer.detail(id))),
+    // 客户详情及健康、消费、服务、沟通记录，一次请求返回
+    customerBundle: (id) => {
+      const paths = apiConfig.paths.customer;
+      return batch([
+        { id: 'detail', path: paths.detail(id), params: { include: '' } },
+        { id: 'health', path: paths.health(id) },
+        { id: 'consumption', path: paths.consumption(id) },
+        { id: 'service', path: paths.service(id) },
+        { id: 'communication', path: paths.communication(id) }
+      ]);
+    }
   }
 };
\ No newline at end of file